@@ -6,8 +6,10 @@ from flask_login import LoginManager
 from flask_socketio import SocketIO
 from flask_migrate import Migrate
 
+from backend.utils.db_routing import session_options
+
 # Initialize extensions
-db = SQLAlchemy()
+db = SQLAlchemy(session_options=session_options())
 login_manager = LoginManager()
 socketio = SocketIO()
 migrate = Migrate()
@@ -24,22 +26,44 @@ def create_app():
     # Load configuration
     app.config.from_object('backend.config.Config')
     
+    # Select the database backend before the engine is created
+    from backend.utils.db_backends import configure_database, install_database_backend
+    configure_database(app)
+    
     # Initialize extensions
     db.init_app(app)
     login_manager.init_app(app)
     socketio.init_app(app)
     migrate.init_app(app, db)
+    install_database_backend(app, db)
+    
+    # Per-endpoint SQL accounting
+    from backend.utils.query_stats import init_query_stats
+    init_query_stats(app, db)
+    from backend.utils.slow_query_log import init_slow_query_log
+    init_slow_query_log(app, db)
+    
+    # Prometheus metrics at /metrics
+    from backend.utils.metrics import init_metrics
+    init_metrics(app, socketio)
+    from backend.utils.handler_profiler import init_handler_profiler
+    init_handler_profiler(app)
+    from backend.utils.flight_recorder import init_flight_recorder
+    init_flight_recorder(app, socketio)
+    from backend.utils.memory_accounting import init_memory_accounting
+    init_memory_accounting(app)
     
     with app.app_context():
         try:
             # Import and register blueprints
-            from backend.routes import auth_bp, game_bp, api_bp
+            from backend.routes import auth_bp, game_bp, api_bp, admin_bp
             
             # Register each blueprint with error handling
             for bp_name, blueprint in [
                 ('auth', auth_bp),
                 ('game', game_bp),
-                ('api', api_bp)
+                ('api', api_bp),
+                ('admin', admin_bp)
             ]:
                 try:
                     app.register_blueprint(blueprint)
@@ -51,7 +75,24 @@ def create_app():
             # Initialize scheduler
             from backend.scheduler import init_scheduler
             init_scheduler(app)
-            
+
+            # Load in-memory game indexes (tables may not exist on first run)
+            try:
+                from backend.game.rank_index import init_rank_index
+                init_rank_index(app)
+            except Exception as e:
+                print(f"Warning: Could not load rank index: {e}")
+            try:
+                from backend.game.lobby_directory import init_lobby_directory
+                init_lobby_directory(app)
+            except Exception as e:
+                print(f"Warning: Could not load lobby directory: {e}")
+            try:
+                from backend.game.catalog import init_catalog
+                init_catalog(app)
+            except Exception as e:
+                print(f"Warning: Could not load catalog: {e}")
+
             # Set up login manager
             @login_manager.user_loader
             def load_user(user_id):
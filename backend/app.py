@@ -2,6 +2,13 @@ from flask import Flask, render_template
 from flask_socketio import SocketIO
 from flask_migrate import Migrate
 from .utils.db_optimizations import optimize_sqlite
+from .utils.db_backends import configure_database
+from .utils.query_stats import init_query_stats
+from .utils.slow_query_log import init_slow_query_log
+from .utils.metrics import init_metrics
+from .utils.handler_profiler import init_handler_profiler
+from .utils.flight_recorder import init_flight_recorder
+from .utils.memory_accounting import init_memory_accounting
 
 try:
     from .config import Config
@@ -23,6 +30,9 @@ def create_app(config_name='default'):
     # Load configuration
     app.config.from_object(Config)
     
+    # Select the database backend before the engine is created
+    configure_database(app)
+    
     # Initialize extensions
     db.init_app(app)
     socketio.init_app(app, cors_allowed_origins="*")
@@ -30,9 +40,19 @@ def create_app(config_name='default'):
     login_manager.init_app(app)
     login_manager.login_view = 'auth.login'
     
-    # Apply SQLite optimizations
+    # Apply backend connection tuning
     optimize_sqlite(app, db)
     
+    # Per-endpoint SQL accounting
+    init_query_stats(app, db)
+    init_slow_query_log(app, db)
+    
+    # Prometheus metrics at /metrics
+    init_metrics(app, socketio)
+    init_handler_profiler(app)
+    init_flight_recorder(app, socketio)
+    init_memory_accounting(app)
+    
     # Initialize CUDA if enabled
     if app.config['CUDA_ENABLED']:
         import cupy as cp
@@ -61,7 +81,24 @@ def create_app(config_name='default'):
             for table in models_data['tables']:
                 if not table.exists(db.engine):
                     table.create(db.engine)
-    
+
+        # Load in-memory game indexes
+        try:
+            from .game.rank_index import init_rank_index
+            init_rank_index(app)
+        except Exception as e:
+            print(f"Warning: Could not load rank index: {e}")
+        try:
+            from .game.lobby_directory import init_lobby_directory
+            init_lobby_directory(app)
+        except Exception as e:
+            print(f"Warning: Could not load lobby directory: {e}")
+        try:
+            from .game.catalog import init_catalog
+            init_catalog(app)
+        except Exception as e:
+            print(f"Warning: Could not load catalog: {e}")
+
     @login_manager.user_loader
     def load_user(user_id):
         from .models.user import User
@@ -70,6 +107,9 @@ def create_app(config_name='default'):
     from .routes import api
     app.register_blueprint(api.bp)
     
+    from .routes import admin
+    app.register_blueprint(admin.bp)
+    
     from . import socket_events
     
     @app.route('/')
@@ -0,0 +1,5 @@
+"""Load tests and benchmarks.
+
+Each suite is runnable on its own with ``python -m backend.benchmarks.<suite>``
+and writes a JSON report.
+"""
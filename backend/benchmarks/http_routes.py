@@ -0,0 +1,269 @@
+"""HTTP route benchmarks with the Flask test client against seeded databases.
+
+For each scale (number of users) a fixture database is generated once with
+the dataset generator and cached under ``benchmarks/fixtures``. Each scale
+then runs in its own process with DATABASE_URL pointing at its fixture, so
+app singletons and caches never leak between scales.
+
+Per route the suite records latency percentiles, queries and DB time per
+request (read from the Server-Timing header added by query stats), and
+Python allocations per request from a separate tracemalloc pass, so the
+tracing overhead does not distort the latencies.
+
+Usage::
+
+    python -m backend.benchmarks.http_routes --scales 1000,100000 --requests 300
+    python manage.py --bench http --bench-scales 1000
+"""
+import argparse
+import json
+import re
+import time
+import tracemalloc
+from collections import Counter
+from pathlib import Path
+from backend.benchmarks.runner import FIXTURE_DIR, environment, run_worker, write_report
+from backend.benchmarks.stats import describe
+
+DEFAULT_SCALES = (1000, 100000, 1000000)
+RACES_PER_USER = 20
+BENCH_PASSWORD = 'password'  # Dataset generator password
+
+# (name, method, path, needs login)
+ROUTES = (
+    ('menu', 'GET', '/menu', True),
+    ('leaderboard', 'GET', '/leaderboard', False),
+    ('api_lobbies', 'GET', '/api/lobbies', True),
+    ('api_timetrial_records', 'GET', '/api/timetrials/records?track_id=1', True),
+    ('api_ships', 'GET', '/api/ships', True),
+    ('api_courses', 'GET', '/api/courses', True),
+    ('auth_login', 'POST', '/auth/login', False),
+)
+
+SERVER_TIMING = re.compile(r'db;dur=([\d.]+);desc="(\d+) queries"')
+
+
+def fixture_path(users, races, seed):
+    return FIXTURE_DIR / f'users_{users}_races_{races}_seed_{seed}.db'
+
+
+# Worker side (one process per scale)
+def ensure_fixture(app, users, races, seed):
+    """Generate the dataset into an empty fixture database"""
+    from backend.models import db
+    from backend.models.user import User
+    from backend.utils.dataset_generator import generate_dataset
+
+    with app.app_context():
+        db.create_all()
+        if User.query.first() is not None:
+            return None
+        print(f"Generating fixture: {users} users, {races} races")
+        result = generate_dataset(users, races, seed=seed,
+                                  progress=lambda message: print(f"  {message}"))
+
+    # The in-memory indexes were loaded from the empty database at startup
+    from backend.game.rank_index import init_rank_index
+    from backend.game.lobby_directory import init_lobby_directory
+    from backend.game.catalog import init_catalog
+    with app.app_context():
+        init_rank_index(app)
+        init_lobby_directory(app)
+        init_catalog(app)
+    return result
+
+
+def bench_user(app):
+    """A logged-in test client for a mid-table user"""
+    from backend.models.user import User
+
+    with app.app_context():
+        count = User.query.count()
+        user = User.query.order_by(User.id).offset(count // 2).first()
+        username = user.username
+    client = app.test_client()
+    response = client.post('/auth/login', json={'username': username, 'password': BENCH_PASSWORD})
+    if response.status_code != 200:
+        raise RuntimeError(f"Could not log in as {username}: {response.status_code}")
+    return client, username
+
+
+def send(app, client, method, path, username):
+    if method == 'POST':
+        # Login is measured from a fresh session each time
+        return app.test_client().post(path, json={'username': username, 'password': BENCH_PASSWORD})
+    return client.get(path)
+
+
+def bench_route(app, client, username, route, requests, warmup, alloc_requests):
+    name, method, path, needs_login = route
+    anonymous = app.test_client()
+    target = client if needs_login else anonymous
+
+    for _ in range(warmup):
+        send(app, target, method, path, username)
+
+    latencies, queries, db_ms = [], [], []
+    statuses = Counter()
+    for _ in range(requests):
+        started = time.perf_counter()
+        response = send(app, target, method, path, username)
+        latencies.append((time.perf_counter() - started) * 1000)
+        statuses[response.status_code] += 1
+        match = SERVER_TIMING.search(response.headers.get('Server-Timing', ''))
+        if match:
+            db_ms.append(float(match.group(1)))
+            queries.append(int(match.group(2)))
+        else:
+            queries.append(0)
+
+    # Allocation pass: peak and retained traced memory per request
+    peaks, retained = [], []
+    tracemalloc.start()
+    try:
+        for _ in range(alloc_requests):
+            before = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            send(app, target, method, path, username)
+            current, peak = tracemalloc.get_traced_memory()
+            peaks.append(peak - before)
+            retained.append(current - before)
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'method': method,
+        'path': path,
+        'latency': describe(latencies),
+        'statuses': {str(code): count for code, count in statuses.items()},
+        'queries_per_request': round(sum(queries) / len(queries), 2) if queries else None,
+        'queries_max': max(queries) if queries else None,
+        'db_ms_mean': round(sum(db_ms) / len(db_ms), 3) if db_ms else None,
+        'alloc_peak_bytes': int(sum(peaks) / len(peaks)) if peaks else None,
+        'alloc_retained_bytes': int(sum(retained) / len(retained)) if retained else None,
+    }
+
+
+def run_scale(options):
+    """Benchmark every route against one fixture (runs in the worker)"""
+    from backend import create_app
+
+    app, _ = create_app()
+    app.config['TESTING'] = True
+    app.config['QUERY_STATS_SERVER_TIMING'] = True
+    generated = ensure_fixture(app, options['scale'], options['races'], options['seed'])
+
+    client, username = bench_user(app)
+    routes = {}
+    for route in ROUTES:
+        if options['routes'] and route[0] not in options['routes']:
+            continue
+        print(f"  {route[0]}...")
+        try:
+            routes[route[0]] = bench_route(
+                app, client, username, route,
+                options['requests'], options['warmup'], options['alloc_requests']
+            )
+        except Exception as e:
+            # TESTING propagates view errors; one broken route must not lose the scale
+            print(f"  {route[0]} failed: {e}")
+            routes[route[0]] = {'method': route[1], 'path': route[2],
+                                'error': f'{type(e).__name__}: {e}'}
+    return {'users': options['scale'], 'races': options['races'], 'generated': generated,
+            'routes': routes}
+
+
+# Parent side
+def run_suite(scales, requests=200, warmup=20, alloc_requests=20, seed=42,
+              races_per_user=RACES_PER_USER, routes=None):
+    """Run each scale in a subprocess and collect the results"""
+    FIXTURE_DIR.mkdir(parents=True, exist_ok=True)
+    results = {}
+    for scale in scales:
+        races = scale * races_per_user
+        path = fixture_path(scale, races, seed)
+        print(f"Scale {scale} users ({path.name})")
+        argv = [
+            '--scale', str(scale), '--races', str(races), '--seed', str(seed),
+            '--requests', str(requests), '--warmup', str(warmup),
+            '--alloc-requests', str(alloc_requests),
+        ]
+        if routes:
+            argv += ['--routes', ','.join(routes)]
+        results[str(scale)] = run_worker('backend.benchmarks.http_routes', argv,
+                                         env={'DATABASE_URL': f'sqlite:///{path}'})
+
+    return {
+        'suite': 'http',
+        **environment(),
+        'settings': {'requests': requests, 'warmup': warmup, 'alloc_requests': alloc_requests,
+                     'seed': seed, 'races_per_user': races_per_user},
+        'scales': results,
+    }
+
+
+def format_results(report):
+    lines = []
+    for scale, result in report['scales'].items():
+        lines.append(f"\n{scale} users")
+        if 'error' in result:
+            lines.append(f"  {result['error']}")
+            continue
+        lines.append(f"  {'route':24s} {'p50 ms':>8s} {'p95 ms':>8s} {'p99 ms':>8s} "
+                     f"{'queries':>8s} {'alloc KB':>9s}")
+        for name, route in result['routes'].items():
+            if 'error' in route:
+                lines.append(f"  {name:24s} failed: {route['error']}")
+                continue
+            latency = route['latency']
+            lines.append(
+                f"  {name:24s} {latency['p50_ms']:8.2f} {latency['p95_ms']:8.2f} "
+                f"{latency['p99_ms']:8.2f} {route['queries_per_request'] or 0:8.1f} "
+                f"{(route['alloc_peak_bytes'] or 0) / 1024:9.1f}"
+            )
+    return '\n'.join(lines)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='HTTP route benchmarks')
+    parser.add_argument('--scales', default=','.join(map(str, DEFAULT_SCALES)),
+                        help='Comma-separated user counts')
+    parser.add_argument('--races-per-user', type=int, default=RACES_PER_USER)
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--warmup', type=int, default=20)
+    parser.add_argument('--alloc-requests', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--routes', default=None, help='Comma-separated route names')
+    parser.add_argument('--report', default=None, help='Output JSON path')
+    # Worker mode (internal)
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--scale', type=int, help=argparse.SUPPRESS)
+    parser.add_argument('--races', type=int, help=argparse.SUPPRESS)
+    parser.add_argument('--output', help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    routes = args.routes.split(',') if args.routes else None
+
+    if args.worker:
+        result = run_scale({
+            'scale': args.scale, 'races': args.races, 'seed': args.seed,
+            'requests': args.requests, 'warmup': args.warmup,
+            'alloc_requests': args.alloc_requests, 'routes': routes,
+        })
+        Path(args.output).write_text(json.dumps(result))
+        return result
+
+    scales = [int(scale) for scale in args.scales.split(',') if scale]
+    report = run_suite(scales, args.requests, args.warmup, args.alloc_requests,
+                       args.seed, args.races_per_user, routes)
+    path = write_report(report, args.report)
+    print(format_results(report))
+    print(f"\nResults written to {path}")
+    return report
+
+
+if __name__ == '__main__':
+    main()
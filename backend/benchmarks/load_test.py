@@ -0,0 +1,558 @@
+"""Socket.IO load test: many synthetic racers and spectators against one server.
+
+Every racer logs in over HTTP, connects with the session cookie and runs the
+real race sequence in a loop::
+
+    join_matchmaking -> match_found -> join_game -> POST /api/game/<id>/ready
+    -> game_update at 20-60 Hz -> race_finished -> race_results
+
+Spectators subscribe to the lobby channel and spectate running games.
+Clients are spread over worker processes (each client is a thread), and the
+parent samples the server's CPU and RSS from /proc. Room sizes come from the
+server's MATCHMAKING_MIN_PLAYERS / MATCHMAKING_MAX_PLAYERS; start it with both
+set to --room-size for fixed rooms.
+
+Latencies use the server timestamp carried in ``player_update`` (same box,
+same clock): uplink is client send -> server receive, downlink is server
+receive -> delivery to each room member, and rtt is send -> own echo.
+
+Usage::
+
+    MATCHMAKING_MIN_PLAYERS=4 MATCHMAKING_MAX_PLAYERS=4 python run.py
+    python -m backend.benchmarks.load_test --clients 400 --processes 4 \\
+        --spectator-ratio 0.25 --duration 120 --report load_test.json
+
+Accounts default to the ones made by ``manage.py --generate-dataset``
+(pilot_0000001 ... with password "password"); --register creates them.
+"""
+import argparse
+import json
+import math
+import multiprocessing
+import os
+import random
+import threading
+import time
+from collections import Counter, defaultdict, deque
+from datetime import datetime
+from pathlib import Path
+from urllib.parse import urlparse
+from backend.benchmarks.stats import LatencyHistogram
+
+# Server timestamps are datetime.utcnow().timestamp(), which is offset by the
+# local UTC offset; the client runs on the same box so it can undo that
+UTC_SKEW = time.time() - datetime.utcnow().timestamp()
+
+MAX_PENDING_ECHOES = 1024
+
+
+class Metrics:
+    """Per-process latency histograms, counters and a per-second timeline"""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.histograms = defaultdict(LatencyHistogram)
+        self.counters = Counter()
+        self.errors = Counter()
+        self.room_sizes = Counter()
+        self.timeline = defaultdict(Counter)
+
+    def latency(self, name, ms):
+        with self.lock:
+            self.histograms[name].record(ms)
+
+    def count(self, name, n=1):
+        with self.lock:
+            self.counters[name] += n
+            self.timeline[int(time.time())][name] += n
+
+    def error(self, name):
+        with self.lock:
+            self.errors[name] += 1
+
+    def to_dict(self):
+        with self.lock:
+            return {
+                'histograms': {name: h.to_dict() for name, h in self.histograms.items()},
+                'counters': dict(self.counters),
+                'errors': dict(self.errors),
+                'room_sizes': dict(self.room_sizes),
+                'timeline': {second: dict(c) for second, c in self.timeline.items()},
+            }
+
+
+class SimulatedClient:
+    """One logged-in Socket.IO client"""
+    def __init__(self, index, options, metrics, games):
+        self.options = options
+        self.metrics = metrics
+        self.games = games  # Shared list of running game ids for spectators
+        self.username = options['username_format'].format(options['first_user'] + index)
+        self.user_id = None
+        self.http = None
+        self.sio = None
+        self.rng = random.Random(options['seed'] * 100003 + index)
+        self.hz = self.rng.uniform(options['min_hz'], options['max_hz'])
+        self.connected = threading.Event()
+        self.matched = threading.Event()
+        self.joined = threading.Event()
+        self.finished = threading.Event()
+        self.game_state = threading.Event()
+        self.match = None
+        self.finish_time = None
+        self.results_seen = Counter()
+        self.pending = deque(maxlen=MAX_PENDING_ECHOES)
+
+    def url(self, path):
+        return self.options['url'].rstrip('/') + path
+
+    # Session setup
+    def login(self):
+        import requests
+
+        self.http = requests.Session()
+        credentials = {'username': self.username, 'password': self.options['password']}
+        started = time.perf_counter()
+        response = self.http.post(self.url('/auth/login'), json=credentials, timeout=30)
+        if response.status_code == 401 and self.options['register']:
+            self.http.post(self.url('/auth/register'), json={
+                **credentials, 'email': f'{self.username}@loadtest.invalid'
+            }, timeout=30)
+            response = self.http.post(self.url('/auth/login'), json=credentials, timeout=30)
+        if response.status_code != 200:
+            raise RuntimeError(f'login failed for {self.username}: {response.status_code}')
+        self.metrics.latency('login', (time.perf_counter() - started) * 1000)
+        self.user_id = response.json()['id']
+
+    def connect(self):
+        import socketio
+
+        self.sio = socketio.Client(reconnection=False)
+        for event, handler in (
+            ('connection_success', self.on_connection_success),
+            ('match_found', self.on_match_found),
+            ('player_joined', self.on_player_joined),
+            ('player_update', self.on_player_update),
+            ('race_results', self.on_race_results),
+            ('game_state', self.on_game_state),
+        ):
+            self.sio.on(event, handler)
+        for event in ('lobbies_snapshot', 'lobbies_diff', 'player_disconnected',
+                      'player_reconnected', 'game_ended_early'):
+            self.sio.on(event, self.on_other)
+
+        cookie = '; '.join(f'{name}={value}' for name, value in self.http.cookies.items())
+        started = time.perf_counter()
+        self.sio.connect(self.options['url'], headers={'Cookie': cookie},
+                         transports=['websocket'], wait_timeout=30)
+        if not self.connected.wait(self.options['timeout']):
+            raise RuntimeError('no connection_success')
+        self.metrics.latency('connect', (time.perf_counter() - started) * 1000)
+
+    def close(self):
+        try:
+            if self.sio is not None:
+                self.sio.disconnect()
+        except Exception:
+            pass
+
+    def emit(self, event, data):
+        self.sio.emit(event, data)
+        self.metrics.count('sent')
+
+    # Handlers
+    def received(self):
+        self.metrics.count('received')
+
+    def on_connection_success(self, data):
+        self.received()
+        self.connected.set()
+
+    def on_match_found(self, data):
+        self.received()
+        self.match = data
+        self.matched.set()
+
+    def on_player_joined(self, data):
+        self.received()
+        if data.get('user_id') == self.user_id:
+            self.joined.set()
+
+    def on_player_update(self, data):
+        now = time.time()
+        self.received()
+        server_ts = data['timestamp'] + UTC_SKEW
+        self.metrics.latency('downlink', (now - server_ts) * 1000)
+        if data.get('user_id') == self.user_id and self.pending:
+            sent = self.pending.popleft()
+            self.metrics.latency('uplink', (server_ts - sent) * 1000)
+            self.metrics.latency('rtt', (now - sent) * 1000)
+
+    def on_race_results(self, data):
+        self.received()
+        game_id = self.match and self.match.get('game_id')
+        self.results_seen[game_id] += 1
+        if self.finish_time is not None and data.get('time') == self.finish_time:
+            self.finished.set()
+
+    def on_game_state(self, data):
+        self.received()
+        self.game_state.set()
+
+    def on_other(self, data=None):
+        self.received()
+
+    # Scenarios
+    def wait(self, event, name, started):
+        if not event.wait(self.options['timeout']):
+            self.metrics.error(f'{name}_timeout')
+            return False
+        self.metrics.latency(name, (time.perf_counter() - started) * 1000)
+        return True
+
+    def race(self):
+        options = self.options
+        for event in (self.matched, self.joined, self.finished):
+            event.clear()
+        self.finish_time = None
+        self.pending.clear()
+
+        started = time.perf_counter()
+        self.emit('join_matchmaking', {'ship_id': options['ship_id'], 'course_id': options['course_id']})
+        if not self.wait(self.matched, 'matchmaking', started):
+            return False
+        game_id = self.match.get('game_id')
+        if game_id is None:
+            self.metrics.error('match_without_game')
+            return False
+        with self.metrics.lock:
+            self.metrics.room_sizes[len(self.match.get('players', [])) + 1] += 1
+
+        started = time.perf_counter()
+        self.emit('join_game', {'game_id': game_id, 'ship_id': options['ship_id']})
+        if not self.wait(self.joined, 'join', started):
+            return False
+
+        started = time.perf_counter()
+        response = self.http.post(self.url(f'/api/game/{game_id}/ready'), timeout=30)
+        if response.status_code != 200:
+            self.metrics.error(f'ready_{response.status_code}')
+            return False
+        self.metrics.latency('ready', (time.perf_counter() - started) * 1000)
+        self.games.append(game_id)
+
+        # Fly a loose circle at this client's update rate
+        interval = 1.0 / self.hz
+        race_started = time.perf_counter()
+        next_send = race_started
+        fuel = 100.0
+        while True:
+            now = time.perf_counter()
+            elapsed = now - race_started
+            if elapsed >= options['race_seconds']:
+                break
+            angle = elapsed * 0.5
+            self.pending.append(time.time())
+            self.emit('game_update', {
+                'game_id': game_id,
+                'position': {'x': 500 + 300 * math.cos(angle), 'y': 500 + 300 * math.sin(angle)},
+                'velocity': {'x': -150 * math.sin(angle), 'y': 150 * math.cos(angle)},
+                'fuel': round(fuel, 2),
+            })
+            self.metrics.count('game_updates')
+            fuel = max(0.0, fuel - 0.01)
+            next_send += interval
+            delay = next_send - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            elif -delay > interval:
+                # Fell a whole tick behind: the generator is saturated
+                self.metrics.count('send_overruns')
+                next_send = time.perf_counter()
+
+        self.finish_time = round(time.perf_counter() - race_started + self.rng.random(), 3)
+        started = time.perf_counter()
+        self.emit('race_finished', {
+            'game_id': game_id,
+            'time': self.finish_time,
+            'position': self.results_seen[game_id] + 1,
+        })
+        ok = self.wait(self.finished, 'race_results', started)
+        try:
+            self.games.remove(game_id)
+        except ValueError:
+            pass
+        if ok:
+            self.metrics.count('races_completed')
+        return ok
+
+    def spectate(self, deadline):
+        started = time.perf_counter()
+        self.game_state.clear()
+        self.emit('subscribe_lobbies', {})
+        while time.time() < deadline:
+            if not self.games:
+                time.sleep(1)
+                continue
+            game_id = self.rng.choice(list(self.games))
+            self.game_state.clear()
+            started = time.perf_counter()
+            self.emit('spectate_game', {'game_id': game_id})
+            self.wait(self.game_state, 'spectate', started)
+            time.sleep(min(self.options['spectate_seconds'], max(0, deadline - time.time())))
+
+    def run(self, role, start_at, deadline):
+        time.sleep(max(0, start_at - time.time()))
+        try:
+            self.login()
+            self.connect()
+            self.metrics.count(f'{role}s_connected')
+            if role == 'spectator':
+                self.spectate(deadline)
+            else:
+                while time.time() + self.options['race_seconds'] < deadline:
+                    if not self.race():
+                        time.sleep(1)
+        except Exception as e:
+            self.metrics.error(type(e).__name__)
+            if self.options['verbose']:
+                print(f"Error in client {self.username}: {e}")
+        finally:
+            self.close()
+
+
+def run_worker(assignments, options, start_at, deadline, results):
+    """Worker process: run this share of clients and report its metrics"""
+    metrics = Metrics()
+    games = []
+    threads = []
+    for index, role, delay in assignments:
+        client = SimulatedClient(index, options, metrics, games)
+        thread = threading.Thread(target=client.run, args=(role, start_at + delay, deadline), daemon=True)
+        thread.start()
+        threads.append(thread)
+    for thread in threads:
+        thread.join(max(0, deadline - time.time()) + options['timeout'] * 2)
+    results.put(metrics.to_dict())
+
+
+# Server sampling
+def find_listening_pid(port):
+    """Pid of the process listening on a local TCP port (Linux /proc)"""
+    inodes = set()
+    for table in ('/proc/net/tcp', '/proc/net/tcp6'):
+        try:
+            with open(table) as f:
+                next(f)
+                for line in f:
+                    fields = line.split()
+                    if fields[3] == '0A' and int(fields[1].rsplit(':', 1)[1], 16) == port:
+                        inodes.add(fields[9])
+        except OSError:
+            continue
+    for pid in filter(str.isdigit, os.listdir('/proc')):
+        try:
+            for fd in os.listdir(f'/proc/{pid}/fd'):
+                link = os.readlink(f'/proc/{pid}/fd/{fd}')
+                if link.startswith('socket:[') and link[8:-1] in inodes:
+                    return int(pid)
+        except OSError:
+            continue
+    return None
+
+
+def read_process(pid):
+    """(cpu seconds, rss bytes) for a pid"""
+    with open(f'/proc/{pid}/stat') as f:
+        fields = f.read().rsplit(')', 1)[1].split()
+    ticks = os.sysconf('SC_CLK_TCK')
+    cpu = (int(fields[11]) + int(fields[12])) / ticks
+    rss = int(fields[21]) * os.sysconf('SC_PAGE_SIZE')
+    return cpu, rss
+
+
+class ProcessSampler(threading.Thread):
+    """Samples CPU% and RSS of a set of processes once per interval"""
+    def __init__(self, pids, interval=1.0):
+        super().__init__(daemon=True)
+        self.pids = pids
+        self.interval = interval
+        self.samples = defaultdict(list)  # {name: [(ts, cpu_percent, rss)]}
+        self.stopped = threading.Event()
+
+    def run(self):
+        previous = {}
+        while not self.stopped.wait(self.interval):
+            now = time.time()
+            for name, pid in list(self.pids.items()):
+                try:
+                    cpu, rss = read_process(pid)
+                except OSError:
+                    continue
+                if name in previous:
+                    last_ts, last_cpu = previous[name]
+                    percent = (cpu - last_cpu) / max(now - last_ts, 1e-6) * 100
+                    self.samples[name].append((int(now), round(percent, 1), rss))
+                previous[name] = (now, cpu)
+
+    def summary(self):
+        result = {}
+        for name, samples in self.samples.items():
+            if not samples:
+                continue
+            cpu = [s[1] for s in samples]
+            result[name] = {
+                'cpu_percent_mean': round(sum(cpu) / len(cpu), 1),
+                'cpu_percent_max': max(cpu),
+                'rss_mb_max': round(max(s[2] for s in samples) / 1024 / 1024, 1),
+            }
+        return result
+
+
+# Orchestration
+def build_report(options, partials, sampler, started, finished):
+    histograms = defaultdict(LatencyHistogram)
+    counters, errors, room_sizes = Counter(), Counter(), Counter()
+    timeline = defaultdict(Counter)
+    for partial in partials:
+        for name, data in partial['histograms'].items():
+            histograms[name].merge(LatencyHistogram.from_dict(data))
+        counters.update(partial['counters'])
+        errors.update(partial['errors'])
+        room_sizes.update({int(k): v for k, v in partial['room_sizes'].items()})
+        for second, values in partial['timeline'].items():
+            timeline[int(second)].update(values)
+
+    server_cpu = {ts: cpu for ts, cpu, _ in sampler.samples.get('server', [])}
+    seconds = sorted(timeline)
+    elapsed = max(finished - started, 1e-6)
+    return {
+        'options': options,
+        'started_at': datetime.utcfromtimestamp(started).isoformat(),
+        'seconds': round(elapsed, 1),
+        'clients': {
+            'racers_connected': counters.get('racers_connected', 0),
+            'spectators_connected': counters.get('spectators_connected', 0),
+        },
+        'totals': dict(counters),
+        'rates': {
+            'sent_per_second': round(counters.get('sent', 0) / elapsed, 1),
+            'received_per_second': round(counters.get('received', 0) / elapsed, 1),
+            'races_per_minute': round(counters.get('races_completed', 0) / elapsed * 60, 1),
+        },
+        'latency': {name: histogram.summary() for name, histogram in sorted(histograms.items())},
+        'room_sizes': dict(sorted(room_sizes.items())),
+        'errors': dict(errors),
+        'processes': sampler.summary(),
+        'timeline': [
+            {
+                'ts': second,
+                'sent': timeline[second].get('sent', 0),
+                'received': timeline[second].get('received', 0),
+                'server_cpu_percent': server_cpu.get(second),
+            }
+            for second in seconds
+        ],
+    }
+
+
+def run_load_test(options):
+    """Run the configured load and return the report dict"""
+    racers = options['clients']
+    spectators = int(round(racers * options['spectator_ratio']))
+    roles = ['racer'] * racers + ['spectator'] * spectators
+    processes = max(1, options['processes'])
+    total = len(roles)
+
+    # Spread connects over the ramp-up, round-robin across workers
+    assignments = [[] for _ in range(processes)]
+    for index, role in enumerate(roles):
+        delay = options['ramp_seconds'] * index / max(total, 1)
+        assignments[index % processes].append((index, role, delay))
+
+    pids = {}
+    server_pid = options['server_pid'] or find_listening_pid(options['port'])
+    if server_pid:
+        pids['server'] = server_pid
+    else:
+        print(f"Warning: Could not find the server process on port {options['port']}; "
+              "pass --server-pid to sample its CPU")
+
+    started = time.time()
+    start_at = started + 1
+    deadline = start_at + options['ramp_seconds'] + options['duration']
+    results = multiprocessing.Queue()
+    workers = [
+        multiprocessing.Process(target=run_worker, args=(share, options, start_at, deadline, results))
+        for share in assignments if share
+    ]
+    for number, worker in enumerate(workers):
+        worker.start()
+        pids[f'loadgen_{number}'] = worker.pid
+
+    sampler = ProcessSampler(pids)
+    sampler.start()
+    partials = [results.get() for _ in workers]
+    for worker in workers:
+        worker.join()
+    sampler.stopped.set()
+    finished = time.time()
+    return build_report(options, partials, sampler, started, finished)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Socket.IO load test')
+    parser.add_argument('--url', default='http://127.0.0.1:5000')
+    parser.add_argument('--clients', type=int, default=100, help='Racing clients')
+    parser.add_argument('--spectator-ratio', type=float, default=0.0,
+                        help='Spectators per racer')
+    parser.add_argument('--room-size', type=int, default=None,
+                        help='Expected room size (set the server MATCHMAKING_* to match)')
+    parser.add_argument('--processes', type=int, default=max(1, (os.cpu_count() or 2) // 2))
+    parser.add_argument('--duration', type=float, default=60, help='Seconds after ramp-up')
+    parser.add_argument('--ramp-seconds', type=float, default=10)
+    parser.add_argument('--race-seconds', type=float, default=20)
+    parser.add_argument('--spectate-seconds', type=float, default=10)
+    parser.add_argument('--min-hz', type=float, default=20)
+    parser.add_argument('--max-hz', type=float, default=60)
+    parser.add_argument('--course-id', type=int, default=1)
+    parser.add_argument('--ship-id', type=int, default=1)
+    parser.add_argument('--username-format', default='pilot_{:07d}')
+    parser.add_argument('--first-user', type=int, default=1)
+    parser.add_argument('--password', default='password')
+    parser.add_argument('--register', action='store_true', help='Create missing accounts')
+    parser.add_argument('--timeout', type=float, default=15, help='Seconds to wait for a reply')
+    parser.add_argument('--server-pid', type=int, default=None)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--report', default='load_test_report.json')
+    parser.add_argument('--verbose', action='store_true')
+    args = parser.parse_args(argv)
+    options = vars(args)
+    options['port'] = urlparse(args.url).port or 80
+    return options
+
+
+def main(argv=None):
+    options = parse_args(argv)
+    print(f"Load test: {options['clients']} racers, spectator ratio {options['spectator_ratio']}, "
+          f"{options['processes']} processes, {options['duration']}s")
+    report = run_load_test(options)
+    Path(options['report']).write_text(json.dumps(report, indent=2))
+
+    for name, summary in report['latency'].items():
+        if summary['count']:
+            print(f"  {name:14s} p50 {summary['p50_ms']:8.2f}ms  p99 {summary['p99_ms']:8.2f}ms  "
+                  f"(n={summary['count']})")
+    print(f"  sent {report['rates']['sent_per_second']}/s, "
+          f"received {report['rates']['received_per_second']}/s, "
+          f"races {report['rates']['races_per_minute']}/min")
+    if 'server' in report['processes']:
+        server = report['processes']['server']
+        print(f"  server CPU mean {server['cpu_percent_mean']}%, max {server['cpu_percent_max']}%, "
+              f"RSS {server['rss_mb_max']} MB")
+    if report['errors']:
+        print(f"  errors: {report['errors']}")
+    print(f"Report written to {options['report']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,498 @@
+"""Physics and geometry microbenchmarks.
+
+Reference kernels for one simulation tick, each in three variants:
+
+* python: idiomatic pure Python over a list of per-ship lists
+* numpy: vectorised over struct-of-arrays float64 columns
+* numba: the same array loops compiled with numba.njit (skipped when
+  numba is not installed)
+
+Kernels:
+
+* gravity: acceleration from the course gravity wells
+  (``Course.gravity_wells``: x, y, strength), softened inverse square
+* integrate: turn, thrust/boost, drag and fuel from ``GameConfig.PHYSICS``
+  and the ship stats, speed clamped to max_speed
+* checkpoint: does the ship's movement this tick cross its next gate
+* race_order: positions by checkpoint progress, then distance to the
+  next checkpoint
+
+Reports ns/ship/tick for ship counts from 1 to 100k plus an effective
+memory bandwidth from the bytes each kernel touches, and the ships one core
+could simulate at 60 Hz. The variants are checked against each other before
+timing.
+
+Usage::
+
+    python -m backend.benchmarks.physics --ships 1,100,10000,100000
+    python manage.py --bench physics
+"""
+import argparse
+import math
+import time
+import numpy as np
+from backend.benchmarks.runner import environment, write_report
+from backend.game.config import GameConfig
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+DEFAULT_SHIP_COUNTS = (1, 10, 100, 1000, 10000, 100000)
+VARIANTS = ('python', 'numpy', 'numba')
+KERNELS = ('gravity', 'integrate', 'checkpoint', 'race_order')
+DT = 1.0 / 60.0
+THRUST_SCALE = 100.0
+GRAVITY_SOFTENING = 400.0
+CHECKPOINTS = 16
+TRACK_RADIUS = 4000.0
+GATE_HALF_WIDTH = 250.0
+WELLS = 8
+
+# Estimated 8-byte columns read + written per ship (gathers count once)
+BYTES_PER_SHIP = {
+    'gravity': 4 * 8,        # x, y -> ax, ay
+    'integrate': 22 * 8,     # 8 inputs, 6 updated in place, prev x/y
+    'checkpoint': 10 * 8,    # prev/new position, gate endpoints, next_cp
+    'race_order': 8 * 8,     # next_cp, position, target, keys, order
+}
+
+PHYSICS = GameConfig.PHYSICS
+
+
+# Scenario
+def make_course(seed):
+    rng = np.random.default_rng(seed)
+    angles = np.linspace(0, 2 * np.pi, CHECKPOINTS, endpoint=False)
+    cp_x = TRACK_RADIUS * np.cos(angles)
+    cp_y = TRACK_RADIUS * np.sin(angles)
+    # Gates are radial segments through each checkpoint
+    gates = np.stack([
+        cp_x - GATE_HALF_WIDTH * np.cos(angles), cp_y - GATE_HALF_WIDTH * np.sin(angles),
+        cp_x + GATE_HALF_WIDTH * np.cos(angles), cp_y + GATE_HALF_WIDTH * np.sin(angles),
+    ], axis=1)
+    wells = np.stack([
+        rng.uniform(-TRACK_RADIUS, TRACK_RADIUS, WELLS),
+        rng.uniform(-TRACK_RADIUS, TRACK_RADIUS, WELLS),
+        rng.uniform(5e4, 5e5, WELLS),
+    ], axis=1)
+    return {'cp_x': cp_x, 'cp_y': cp_y, 'gates': gates, 'wells': wells}
+
+
+def make_ships(n, seed):
+    """Struct-of-arrays ship state, controls and stats"""
+    rng = np.random.default_rng(seed + n)
+    ship_stats = list(GameConfig.SHIPS.values())
+    kinds = rng.integers(0, len(ship_stats), n)
+    start = rng.uniform(0, 2 * np.pi, n)
+    return {
+        'x': TRACK_RADIUS * np.cos(start) + rng.normal(0, 50, n),
+        'y': TRACK_RADIUS * np.sin(start) + rng.normal(0, 50, n),
+        'vx': -np.sin(start) * 200.0,
+        'vy': np.cos(start) * 200.0,
+        'angle': start + np.pi / 2,
+        'fuel': np.array([ship_stats[k]['fuel_capacity'] for k in kinds], dtype=float),
+        'px': np.zeros(n),
+        'py': np.zeros(n),
+        'ax': np.zeros(n),
+        'ay': np.zeros(n),
+        'next_cp': ((start / (2 * np.pi) * CHECKPOINTS).astype(np.int64) + 1) % CHECKPOINTS,
+        'position': np.zeros(n, dtype=np.int64),
+        'turn': rng.uniform(-1, 1, n),
+        'thrust': (rng.random(n) < 0.8).astype(float),
+        'boost': (rng.random(n) < 0.1).astype(float),
+        'acceleration': np.array([ship_stats[k]['acceleration'] for k in kinds]),
+        'max_speed': np.array([ship_stats[k]['max_speed'] for k in kinds], dtype=float),
+        'handling': np.array([ship_stats[k]['handling'] for k in kinds]),
+    }
+
+
+def copy_ships(ships):
+    return {name: column.copy() for name, column in ships.items()}
+
+
+# NumPy variant
+def gravity_numpy(s, course):
+    wells = course['wells']
+    dx = wells[:, 0][None, :] - s['x'][:, None]
+    dy = wells[:, 1][None, :] - s['y'][:, None]
+    inv = wells[:, 2][None, :] * PHYSICS['base_gravity'] / (dx * dx + dy * dy + GRAVITY_SOFTENING) ** 1.5
+    s['ax'][:] = (dx * inv).sum(axis=1)
+    s['ay'][:] = (dy * inv).sum(axis=1)
+
+
+def integrate_numpy(s, course):
+    s['angle'] += s['turn'] * PHYSICS['angular_velocity'] * s['handling'] * DT
+    boost = 1.0 + s['boost'] * (PHYSICS['boost_multiplier'] - 1.0)
+    burning = s['thrust'] * (s['fuel'] > 0) * boost
+    power = burning * s['acceleration'] * THRUST_SCALE
+    drag = 1.0 - PHYSICS['drag_coefficient'] * DT
+    vx = (s['vx'] + (np.cos(s['angle']) * power + s['ax']) * DT) * drag
+    vy = (s['vy'] + (np.sin(s['angle']) * power + s['ay']) * DT) * drag
+    speed = np.hypot(vx, vy)
+    scale = np.minimum(1.0, s['max_speed'] / np.maximum(speed, 1e-12))
+    s['vx'][:] = vx * scale
+    s['vy'][:] = vy * scale
+    s['fuel'][:] = np.maximum(0.0, s['fuel'] - PHYSICS['fuel_consumption_rate'] * burning * DT)
+    s['px'][:] = s['x']
+    s['py'][:] = s['y']
+    s['x'] += s['vx'] * DT
+    s['y'] += s['vy'] * DT
+
+
+def checkpoint_numpy(s, course):
+    gate = course['gates'][s['next_cp'] % CHECKPOINTS]
+    ax, ay, bx, by = gate[:, 0], gate[:, 1], gate[:, 2], gate[:, 3]
+    px, py, qx, qy = s['px'], s['py'], s['x'], s['y']
+    d1 = (bx - ax) * (py - ay) - (by - ay) * (px - ax)
+    d2 = (bx - ax) * (qy - ay) - (by - ay) * (qx - ax)
+    d3 = (qx - px) * (ay - py) - (qy - py) * (ax - px)
+    d4 = (qx - px) * (by - py) - (qy - py) * (bx - px)
+    crossed = (d1 * d2 < 0) & (d3 * d4 < 0)
+    s['next_cp'] += crossed
+
+
+def race_order_numpy(s, course):
+    target = s['next_cp'] % CHECKPOINTS
+    distance = np.hypot(course['cp_x'][target] - s['x'], course['cp_y'][target] - s['y'])
+    order = np.lexsort((distance, -s['next_cp']))
+    s['position'][order] = np.arange(1, len(order) + 1)
+
+
+# Numba variant: explicit loops over the same columns
+def _gravity_loops(x, y, ax, ay, wells, g):
+    for i in range(x.shape[0]):
+        sx = 0.0
+        sy = 0.0
+        for w in range(wells.shape[0]):
+            dx = wells[w, 0] - x[i]
+            dy = wells[w, 1] - y[i]
+            inv = wells[w, 2] * g / (dx * dx + dy * dy + GRAVITY_SOFTENING) ** 1.5
+            sx += dx * inv
+            sy += dy * inv
+        ax[i] = sx
+        ay[i] = sy
+
+
+def _integrate_loops(x, y, vx, vy, angle, fuel, px, py, ax, ay, turn, thrust, boost,
+                     acceleration, max_speed, handling, angular, boost_multiplier,
+                     drag_coefficient, fuel_rate):
+    drag = 1.0 - drag_coefficient * DT
+    for i in range(x.shape[0]):
+        angle[i] += turn[i] * angular * handling[i] * DT
+        burning = thrust[i] * (1.0 if fuel[i] > 0 else 0.0) * (1.0 + boost[i] * (boost_multiplier - 1.0))
+        power = burning * acceleration[i] * THRUST_SCALE
+        nvx = (vx[i] + (math.cos(angle[i]) * power + ax[i]) * DT) * drag
+        nvy = (vy[i] + (math.sin(angle[i]) * power + ay[i]) * DT) * drag
+        speed = math.hypot(nvx, nvy)
+        scale = min(1.0, max_speed[i] / max(speed, 1e-12))
+        vx[i] = nvx * scale
+        vy[i] = nvy * scale
+        fuel[i] = max(0.0, fuel[i] - fuel_rate * burning * DT)
+        px[i] = x[i]
+        py[i] = y[i]
+        x[i] += vx[i] * DT
+        y[i] += vy[i] * DT
+
+
+def _checkpoint_loops(px, py, x, y, next_cp, gates):
+    for i in range(x.shape[0]):
+        g = next_cp[i] % gates.shape[0]
+        ax, ay, bx, by = gates[g, 0], gates[g, 1], gates[g, 2], gates[g, 3]
+        d1 = (bx - ax) * (py[i] - ay) - (by - ay) * (px[i] - ax)
+        d2 = (bx - ax) * (y[i] - ay) - (by - ay) * (x[i] - ax)
+        d3 = (x[i] - px[i]) * (ay - py[i]) - (y[i] - py[i]) * (ax - px[i])
+        d4 = (x[i] - px[i]) * (by - py[i]) - (y[i] - py[i]) * (bx - px[i])
+        if d1 * d2 < 0 and d3 * d4 < 0:
+            next_cp[i] += 1
+
+
+def _race_order_loops(next_cp, x, y, cp_x, cp_y, position):
+    n = x.shape[0]
+    keys = np.empty(n)
+    for i in range(n):
+        t = next_cp[i] % cp_x.shape[0]
+        # Progress dominates; distance (< 1e9) breaks ties
+        keys[i] = -next_cp[i] * 1e9 + math.hypot(cp_x[t] - x[i], cp_y[t] - y[i])
+    order = np.argsort(keys)
+    for rank in range(n):
+        position[order[rank]] = rank + 1
+
+
+if numba is not None:
+    _gravity_loops = numba.njit(cache=True)(_gravity_loops)
+    _integrate_loops = numba.njit(cache=True)(_integrate_loops)
+    _checkpoint_loops = numba.njit(cache=True)(_checkpoint_loops)
+    _race_order_loops = numba.njit(cache=True)(_race_order_loops)
+
+
+def gravity_numba(s, course):
+    _gravity_loops(s['x'], s['y'], s['ax'], s['ay'], course['wells'], PHYSICS['base_gravity'])
+
+
+def integrate_numba(s, course):
+    _integrate_loops(
+        s['x'], s['y'], s['vx'], s['vy'], s['angle'], s['fuel'], s['px'], s['py'],
+        s['ax'], s['ay'], s['turn'], s['thrust'], s['boost'],
+        s['acceleration'], s['max_speed'], s['handling'],
+        PHYSICS['angular_velocity'], PHYSICS['boost_multiplier'],
+        PHYSICS['drag_coefficient'], PHYSICS['fuel_consumption_rate']
+    )
+
+
+def checkpoint_numba(s, course):
+    _checkpoint_loops(s['px'], s['py'], s['x'], s['y'], s['next_cp'], course['gates'])
+
+
+def race_order_numba(s, course):
+    _race_order_loops(s['next_cp'], s['x'], s['y'], course['cp_x'], course['cp_y'], s['position'])
+
+
+# Pure Python variant: one list per ship
+FIELDS = ('x', 'y', 'vx', 'vy', 'angle', 'fuel', 'px', 'py', 'ax', 'ay', 'next_cp', 'position',
+          'turn', 'thrust', 'boost', 'acceleration', 'max_speed', 'handling')
+X, Y, VX, VY, ANGLE, FUEL, PX, PY, AX, AY, NEXT_CP, POSITION, TURN, THRUST, BOOST, ACCEL, MAX_SPEED, HANDLING = range(len(FIELDS))
+
+
+def to_python(ships, course):
+    rows = [list(values) for values in zip(*(ships[name].tolist() for name in FIELDS))]
+    plain_course = {
+        'cp': list(zip(course['cp_x'].tolist(), course['cp_y'].tolist())),
+        'gates': [tuple(gate) for gate in course['gates'].tolist()],
+        'wells': [tuple(well) for well in course['wells'].tolist()],
+    }
+    return rows, plain_course
+
+
+def from_python(rows):
+    columns = list(zip(*rows))
+    return {name: np.array(columns[i]) for i, name in enumerate(FIELDS)}
+
+
+def gravity_python(ships, course):
+    g = PHYSICS['base_gravity']
+    wells = course['wells']
+    for ship in ships:
+        x, y = ship[X], ship[Y]
+        sx = sy = 0.0
+        for wx, wy, strength in wells:
+            dx, dy = wx - x, wy - y
+            inv = strength * g / (dx * dx + dy * dy + GRAVITY_SOFTENING) ** 1.5
+            sx += dx * inv
+            sy += dy * inv
+        ship[AX] = sx
+        ship[AY] = sy
+
+
+def integrate_python(ships, course):
+    angular = PHYSICS['angular_velocity']
+    boost_extra = PHYSICS['boost_multiplier'] - 1.0
+    drag = 1.0 - PHYSICS['drag_coefficient'] * DT
+    fuel_rate = PHYSICS['fuel_consumption_rate']
+    for ship in ships:
+        ship[ANGLE] += ship[TURN] * angular * ship[HANDLING] * DT
+        burning = ship[THRUST] * (1.0 if ship[FUEL] > 0 else 0.0) * (1.0 + ship[BOOST] * boost_extra)
+        power = burning * ship[ACCEL] * THRUST_SCALE
+        vx = (ship[VX] + (math.cos(ship[ANGLE]) * power + ship[AX]) * DT) * drag
+        vy = (ship[VY] + (math.sin(ship[ANGLE]) * power + ship[AY]) * DT) * drag
+        scale = min(1.0, ship[MAX_SPEED] / max(math.hypot(vx, vy), 1e-12))
+        ship[VX] = vx * scale
+        ship[VY] = vy * scale
+        ship[FUEL] = max(0.0, ship[FUEL] - fuel_rate * burning * DT)
+        ship[PX] = ship[X]
+        ship[PY] = ship[Y]
+        ship[X] += ship[VX] * DT
+        ship[Y] += ship[VY] * DT
+
+
+def checkpoint_python(ships, course):
+    gates = course['gates']
+    for ship in ships:
+        ax, ay, bx, by = gates[ship[NEXT_CP] % len(gates)]
+        px, py, qx, qy = ship[PX], ship[PY], ship[X], ship[Y]
+        d1 = (bx - ax) * (py - ay) - (by - ay) * (px - ax)
+        d2 = (bx - ax) * (qy - ay) - (by - ay) * (qx - ax)
+        d3 = (qx - px) * (ay - py) - (qy - py) * (ax - px)
+        d4 = (qx - px) * (by - py) - (qy - py) * (bx - px)
+        if d1 * d2 < 0 and d3 * d4 < 0:
+            ship[NEXT_CP] += 1
+
+
+def race_order_python(ships, course):
+    checkpoints = course['cp']
+    count = len(checkpoints)
+
+    def key(ship):
+        cx, cy = checkpoints[ship[NEXT_CP] % count]
+        return (-ship[NEXT_CP], math.hypot(cx - ship[X], cy - ship[Y]))
+
+    for rank, ship in enumerate(sorted(ships, key=key), 1):
+        ship[POSITION] = rank
+
+
+IMPLEMENTATIONS = {
+    'python': {
+        'gravity': gravity_python, 'integrate': integrate_python,
+        'checkpoint': checkpoint_python, 'race_order': race_order_python,
+    },
+    'numpy': {
+        'gravity': gravity_numpy, 'integrate': integrate_numpy,
+        'checkpoint': checkpoint_numpy, 'race_order': race_order_numpy,
+    },
+    'numba': {
+        'gravity': gravity_numba, 'integrate': integrate_numba,
+        'checkpoint': checkpoint_numba, 'race_order': race_order_numba,
+    },
+}
+
+
+def available_variants(requested):
+    return [variant for variant in requested if variant != 'numba' or numba is not None]
+
+
+def prepare(variant, ships, course):
+    if variant == 'python':
+        return to_python(ships, course)
+    return copy_ships(ships), course
+
+
+def step(variant, state, course):
+    for kernel in KERNELS:
+        IMPLEMENTATIONS[variant][kernel](state, course)
+
+
+# Verification
+def verify(variants, n=1000, ticks=30, seed=7):
+    """Run every variant from the same state and compare the results"""
+    course = make_course(seed)
+    ships = make_ships(n, seed)
+    results = {}
+    for variant in variants:
+        state, variant_course = prepare(variant, ships, course)
+        for _ in range(ticks):
+            step(variant, state, variant_course)
+        results[variant] = from_python(state) if variant == 'python' else state
+
+    reference = results[variants[0]]
+    report = {}
+    for variant in variants[1:]:
+        other = results[variant]
+        report[variant] = {
+            'max_abs_diff_x': float(np.max(np.abs(other['x'] - reference['x']))),
+            'checkpoints_match': bool(np.array_equal(other['next_cp'], reference['next_cp'])),
+            'positions_match': bool(np.array_equal(other['position'], reference['position'])),
+        }
+    return report
+
+
+# Timing
+def time_kernel(variant, kernel, ships, course, min_seconds, max_ticks, min_ticks=3):
+    """Median ns per ship per tick over repeated ticks"""
+    state, variant_course = prepare(variant, ships, course)
+    function = IMPLEMENTATIONS[variant][kernel]
+    step(variant, state, variant_course)  # Warm up (and compile numba)
+    samples = []
+    started = time.perf_counter()
+    while len(samples) < max_ticks and (
+        len(samples) < min_ticks or time.perf_counter() - started < min_seconds
+    ):
+        if kernel != 'gravity':
+            # Keep inputs realistic: later kernels depend on the earlier ones
+            for earlier in KERNELS[:KERNELS.index(kernel)]:
+                IMPLEMENTATIONS[variant][earlier](state, variant_course)
+        tick_started = time.perf_counter_ns()
+        function(state, variant_course)
+        samples.append(time.perf_counter_ns() - tick_started)
+    samples.sort()
+    return samples[len(samples) // 2], len(samples)
+
+
+def run_suite(ship_counts=DEFAULT_SHIP_COUNTS, variants=VARIANTS, min_seconds=0.2,
+              max_ticks=2000, max_python_ships=100000, seed=1):
+    variants = available_variants(variants)
+    course = make_course(seed)
+    results = {}
+    for n in ship_counts:
+        ships = make_ships(n, seed)
+        results[str(n)] = {}
+        for variant in variants:
+            if variant == 'python' and n > max_python_ships:
+                continue
+            kernels = {}
+            total_ns = 0
+            for kernel in KERNELS:
+                median_ns, ticks = time_kernel(variant, kernel, ships, course, min_seconds, max_ticks)
+                total_ns += median_ns
+                kernels[kernel] = {
+                    'ns_per_ship_tick': round(median_ns / n, 2),
+                    'gb_per_s': round(BYTES_PER_SHIP[kernel] * n / median_ns, 3),
+                    'ticks': ticks,
+                }
+            results[str(n)][variant] = {
+                'kernels': kernels,
+                'tick_ns_per_ship': round(total_ns / n, 2),
+                'tick_ms': round(total_ns / 1e6, 4),
+                # One core, all four kernels, 60 ticks a second
+                'ships_per_core_60hz': int(n * 1e9 / 60 / total_ns) if total_ns else None,
+            }
+            print(f"  {n:>7d} ships {variant:6s} {total_ns / n:10.1f} ns/ship/tick")
+
+    return {
+        'suite': 'physics',
+        **environment(),
+        'numba': getattr(numba, '__version__', None),
+        'numpy': np.__version__,
+        'settings': {'ship_counts': list(ship_counts), 'variants': variants,
+                     'min_seconds': min_seconds, 'dt': DT, 'wells': WELLS,
+                     'checkpoints': CHECKPOINTS},
+        'verification': verify(variants),
+        'results': results,
+    }
+
+
+def format_results(report):
+    variants = report['settings']['variants']
+    lines = [f"{'ships':>8s} " + ' '.join(f"{variant + ' ns':>14s}" for variant in variants)
+             + f" {'best ships/core@60Hz':>22s}"]
+    for n, by_variant in report['results'].items():
+        cells = []
+        for variant in variants:
+            result = by_variant.get(variant)
+            cells.append(f"{result['tick_ns_per_ship']:14.1f}" if result else f"{'-':>14s}")
+        best = max((r['ships_per_core_60hz'] or 0) for r in by_variant.values())
+        lines.append(f"{n:>8s} " + ' '.join(cells) + f" {best:22d}")
+    for variant, check in report['verification'].items():
+        lines.append(f"verify {variant}: max |dx| {check['max_abs_diff_x']:.2e}, "
+                     f"checkpoints {'ok' if check['checkpoints_match'] else 'DIFFER'}, "
+                     f"order {'ok' if check['positions_match'] else 'DIFFER'}")
+    return '\n'.join(lines)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Physics microbenchmarks')
+    parser.add_argument('--ships', default=','.join(map(str, DEFAULT_SHIP_COUNTS)))
+    parser.add_argument('--variants', default=','.join(VARIANTS))
+    parser.add_argument('--min-seconds', type=float, default=0.2, help='Per kernel and size')
+    parser.add_argument('--max-python-ships', type=int, default=100000)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--report', default=None)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    ship_counts = [int(n) for n in args.ships.split(',') if n]
+    variants = [variant for variant in args.variants.split(',') if variant]
+    if 'numba' in variants and numba is None:
+        print("Warning: numba is not installed; skipping the numba variant")
+    report = run_suite(ship_counts, variants, args.min_seconds,
+                       max_python_ships=args.max_python_ships, seed=args.seed)
+    path = write_report(report, args.report)
+    print(format_results(report))
+    print(f"\nResults written to {path}")
+    return report
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,365 @@
+"""Performance regression gate against the baselines stored in the repo.
+
+Reruns the benchmark suites several times and compares every metric with
+``baselines.json``:
+
+* timing metrics (route latencies, socket tick time, packet encode cost,
+  physics ns/ship/tick)
+  regress when the median slows by more than the threshold AND a one-sided
+  Mann-Whitney U test says the slowdown is significant AND the bootstrap
+  95% CI of the median ratio lies above 1. Requiring all three keeps
+  run-to-run noise from failing the gate.
+* count metrics (queries per request) are deterministic and regress on
+  any increase.
+
+A suite run that reports an error (a crashed worker, a failing route), a
+baseline metric the current run no longer produces, and a suite with no
+baseline metrics at all each fail the gate.
+
+Exits non-zero with a diff table when anything regresses. Baselines are
+machine specific; regenerate them on the machine that runs the gate::
+
+    python -m backend.benchmarks.regression --update-baseline
+    python -m backend.benchmarks.regression            # check
+    python manage.py --bench check
+"""
+import argparse
+import json
+import statistics
+import sys
+from pathlib import Path
+from backend.benchmarks import http_routes, physics, socket_paths
+from backend.benchmarks.runner import BENCH_DIR, environment, write_report
+
+BASELINE_PATH = BENCH_DIR / 'baselines.json'
+BASELINE_VERSION = 1
+DEFAULT_REPEATS = 5  # Mann-Whitney needs 4+ per side to reach p < 0.05
+DEFAULT_THRESHOLD = 0.10
+DEFAULT_ALPHA = 0.05
+BOOTSTRAP_RESAMPLES = 2000
+
+
+# Suites: run once and flatten into {metric: (kind, unit, value)}
+def run_http(options):
+    scales = [int(scale) for scale in options['http_scales'].split(',')]
+    return http_routes.run_suite(scales, requests=options['http_requests'])
+
+
+def extract_http(report):
+    metrics = {}
+    for scale, result in report['scales'].items():
+        if 'error' in result:
+            raise RuntimeError(f"http scale {scale}: {result['error']}")
+        for route, values in result['routes'].items():
+            if 'error' in values:
+                raise RuntimeError(f"http scale {scale} route {route}: {values['error']}")
+            prefix = f'http.{scale}.{route}'
+            latency = values['latency']
+            if latency.get('count'):
+                metrics[f'{prefix}.p50'] = ('timing', 'ms', latency['p50_ms'])
+                metrics[f'{prefix}.p95'] = ('timing', 'ms', latency['p95_ms'])
+            if values.get('queries_per_request') is not None:
+                metrics[f'{prefix}.queries'] = ('count', 'queries', values['queries_per_request'])
+    return metrics
+
+
+def run_socket(options):
+    return socket_paths.run_suite()
+
+
+def extract_socket(report):
+    metrics = {}
+    results = report['results']
+    if 'error' in results:
+        raise RuntimeError(f"socket: {results['error']}")
+    for name, summary in results['tick'].items():
+        if summary.get('count'):
+            metrics[f'socket.tick.{name}.p50'] = ('timing', 'ms', summary['p50_ms'])
+            metrics[f'socket.tick.{name}.p95'] = ('timing', 'ms', summary['p95_ms'])
+    for name, summary in results['encode'].items():
+        if summary.get('count'):
+            metrics[f'socket.encode.{name}.p50'] = ('timing', 'us', summary['p50_us'])
+    return metrics
+
+
+def run_physics(options):
+    return physics.run_suite(ship_counts=(100, 10000), variants=('numpy', 'numba'))
+
+
+def extract_physics(report):
+    metrics = {}
+    for n, by_variant in report['results'].items():
+        for variant, result in by_variant.items():
+            metrics[f'physics.{n}.{variant}.tick'] = ('timing', 'ns/ship', result['tick_ns_per_ship'])
+    return metrics
+
+
+SUITES = {
+    'http': (run_http, extract_http),
+    'socket': (run_socket, extract_socket),
+    'physics': (run_physics, extract_physics),
+}
+
+
+def collect(suites, repeats, options):
+    """Run each suite ``repeats`` times.
+
+    Returns ({metric: {kind, unit, samples}}, [failure messages]).
+    """
+    collected = {}
+    failures = []
+    for suite in suites:
+        run, extract = SUITES[suite]
+        for attempt in range(repeats):
+            print(f"[{suite}] run {attempt + 1}/{repeats}")
+            try:
+                extracted = extract(run(options))
+            except RuntimeError as e:
+                print(f"[{suite}] run {attempt + 1} failed: {e}")
+                failures.append(str(e))
+                continue
+            for name, (kind, unit, value) in extracted.items():
+                entry = collected.setdefault(name, {'kind': kind, 'unit': unit, 'samples': []})
+                entry['samples'].append(value)
+    return collected, failures
+
+
+def suite_prefixes(suite, options):
+    """Baseline metric prefixes a run of one suite with these options must reproduce"""
+    if suite == 'http':
+        return tuple(f'http.{int(scale)}.' for scale in options['http_scales'].split(','))
+    return (f'{suite}.',)
+
+
+def expected_prefixes(suites, options):
+    """Baseline metric prefixes a run with these options must reproduce"""
+    return tuple(prefix for suite in suites for prefix in suite_prefixes(suite, options))
+
+
+def suites_without_baseline(baseline_metrics, suites, options):
+    """Suites the baseline has no metrics for; checking them would pass vacuously"""
+    return [suite for suite in suites
+            if not any(name.startswith(suite_prefixes(suite, options)) for name in baseline_metrics)]
+
+
+# Statistics
+def mann_whitney_greater(current, baseline):
+    """One-sided p-value that current tends to be larger than baseline"""
+    from scipy.stats import mannwhitneyu
+
+    if len(set(current) | set(baseline)) == 1:
+        return 1.0
+    return float(mannwhitneyu(current, baseline, alternative='greater').pvalue)
+
+
+def bootstrap_ratio_ci(baseline, current, resamples=BOOTSTRAP_RESAMPLES, seed=0):
+    """95% CI of median(current) / median(baseline)"""
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    base = np.asarray(baseline, dtype=float)
+    cur = np.asarray(current, dtype=float)
+    base_medians = np.median(rng.choice(base, (resamples, len(base))), axis=1)
+    cur_medians = np.median(rng.choice(cur, (resamples, len(cur))), axis=1)
+    ratios = cur_medians / np.maximum(base_medians, 1e-12)
+    low, high = np.percentile(ratios, [2.5, 97.5])
+    return float(low), float(high)
+
+
+def compare_metric(baseline, current, threshold, alpha):
+    base_samples, cur_samples = baseline['samples'], current['samples']
+    base_median = statistics.median(base_samples)
+    cur_median = statistics.median(cur_samples)
+    change = (cur_median - base_median) / base_median if base_median else 0.0
+    result = {
+        'baseline': base_median,
+        'current': cur_median,
+        'change': change,
+        'p_value': None,
+        'ci': None,
+        'status': 'ok',
+    }
+
+    if current['kind'] == 'count':
+        if cur_median > max(base_samples) + 1e-9:
+            result['status'] = 'REGRESSED'
+        elif cur_median < min(base_samples) - 1e-9:
+            result['status'] = 'improved'
+        return result
+
+    if len(base_samples) < 2 or len(cur_samples) < 2:
+        result['status'] = 'too few runs'
+        return result
+    p_value = mann_whitney_greater(cur_samples, base_samples)
+    low, high = bootstrap_ratio_ci(base_samples, cur_samples)
+    result.update({'p_value': p_value, 'ci': (low, high)})
+    if change > threshold and p_value < alpha and low > 1.0:
+        result['status'] = 'REGRESSED'
+    elif change < -threshold and high < 1.0:
+        result['status'] = 'improved'
+    return result
+
+
+def compare(baseline_metrics, current_metrics, threshold, alpha):
+    """Rows of (name, current, result); result is None for a new metric and
+    current is None for a baseline metric the run did not produce"""
+    rows = []
+    for name in sorted(set(baseline_metrics) | set(current_metrics)):
+        if name not in baseline_metrics:
+            rows.append((name, current_metrics[name], None))
+        elif name not in current_metrics:
+            base_samples = baseline_metrics[name]['samples']
+            rows.append((name, None, {
+                'baseline': statistics.median(base_samples), 'current': None, 'change': None,
+                'p_value': None, 'ci': None, 'status': 'MISSING',
+            }))
+        else:
+            rows.append((name, current_metrics[name],
+                         compare_metric(baseline_metrics[name], current_metrics[name], threshold, alpha)))
+    return rows
+
+
+def format_table(rows):
+    header = (f"{'metric':48s} {'baseline':>10s} {'current':>10s} {'change':>8s} "
+              f"{'p':>7s} {'95% CI (ratio)':>15s}  status")
+    lines = [header, '-' * len(header)]
+    for name, current, result in rows:
+        if result is None:
+            lines.append(f"{name:48s} {'-':>10s} {statistics.median(current['samples']):10.3f} "
+                         f"{'':>8s} {'':>7s} {'':>15s}  new ({current['unit']})")
+            continue
+        if current is None:
+            lines.append(f"{name:48s} {result['baseline']:10.3f} {'-':>10s} "
+                         f"{'':>8s} {'':>7s} {'':>15s}  {result['status']}")
+            continue
+        p_value = f"{result['p_value']:.3f}" if result['p_value'] is not None else ''
+        ci = f"{result['ci'][0]:.2f}-{result['ci'][1]:.2f}" if result['ci'] else ''
+        lines.append(
+            f"{name:48s} {result['baseline']:10.3f} {result['current']:10.3f} "
+            f"{result['change'] * 100:+7.1f}% {p_value:>7s} {ci:>15s}  {result['status']}"
+        )
+    return '\n'.join(lines)
+
+
+# Baseline file
+def load_baseline(path=BASELINE_PATH):
+    path = Path(path)
+    if not path.exists():
+        return {'version': BASELINE_VERSION, 'environment': None, 'metrics': {}}
+    data = json.loads(path.read_text())
+    if data.get('version') != BASELINE_VERSION:
+        raise ValueError(f"Unsupported baseline version {data.get('version')} in {path}")
+    return data
+
+
+def save_baseline(metrics, suites, repeats, path=BASELINE_PATH):
+    """Replace the baselines for the suites that were run"""
+    data = load_baseline(path)
+    prefixes = tuple(f'{suite}.' for suite in suites)
+    kept = {name: value for name, value in data['metrics'].items() if not name.startswith(prefixes)}
+    kept.update(metrics)
+    data.update({
+        'version': BASELINE_VERSION,
+        'environment': environment(),
+        'repeats': repeats,
+        'metrics': dict(sorted(kept.items())),
+    })
+    Path(path).write_text(json.dumps(data, indent=2) + '\n')
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Performance regression gate')
+    parser.add_argument('--suites', default=','.join(SUITES))
+    parser.add_argument('--repeats', type=int, default=DEFAULT_REPEATS)
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help='Relative slowdown that counts as a regression')
+    parser.add_argument('--alpha', type=float, default=DEFAULT_ALPHA)
+    parser.add_argument('--http-scales', default='1000')
+    parser.add_argument('--http-requests', type=int, default=200)
+    parser.add_argument('--baseline', default=str(BASELINE_PATH))
+    parser.add_argument('--update-baseline', action='store_true')
+    parser.add_argument('--report', default=None,
+                        help='Also write the collected metrics and comparison as JSON')
+    return parser.parse_args(argv)
+
+
+def build_report(suites, repeats, current, failures, rows=None):
+    report = {
+        'suite': 'regression',
+        **environment(),
+        'suites': suites,
+        'repeats': repeats,
+        'failures': failures,
+        'metrics': current,
+    }
+    if rows is not None:
+        report['comparison'] = [
+            {'metric': name, 'status': 'new'} if result is None else {'metric': name, **result}
+            for name, _, result in rows
+        ]
+    return report
+
+
+def main(argv=None):
+    """Returns the process exit code: 1 when anything regressed"""
+    args = parse_args(argv)
+    suites = [suite for suite in args.suites.split(',') if suite]
+    unknown = set(suites) - set(SUITES)
+    if unknown:
+        raise ValueError(f"Unknown suites: {', '.join(sorted(unknown))}")
+    options = vars(args)
+
+    baseline = load_baseline(args.baseline)
+    unbaselined = suites_without_baseline(baseline['metrics'], suites, options)
+    if unbaselined and not args.update_baseline:
+        # Every metric would read as new and the gate would always pass
+        print(f"Error: {args.baseline} has no baseline metrics for {', '.join(unbaselined)}; "
+              "record them on this machine with --update-baseline before checking")
+        return 1
+
+    current, failures = collect(suites, args.repeats, options)
+    if args.report and (failures or args.update_baseline):
+        write_report(build_report(suites, args.repeats, current, failures), args.report)
+    if failures:
+        print(f"\n{len(failures)} benchmark run(s) failed:")
+        for failure in failures:
+            print(f"  {failure}")
+        if args.update_baseline:
+            print("Baseline not updated")
+        return 1
+    if args.update_baseline:
+        save_baseline(current, suites, args.repeats, args.baseline)
+        print(f"Baseline for {', '.join(suites)} written to {args.baseline} ({len(current)} metrics)")
+        return 0
+
+    recorded = baseline.get('environment') or {}
+    here = environment()
+    if recorded and (recorded.get('node'), recorded.get('machine')) != (here['node'], here['machine']):
+        print(f"Warning: baseline was recorded on {recorded.get('node')} ({recorded.get('machine')}); "
+              "timings from other machines are not comparable")
+
+    prefixes = expected_prefixes(suites, options)
+    expected = {name: value for name, value in baseline['metrics'].items() if name.startswith(prefixes)}
+    rows = compare(expected, current, args.threshold, args.alpha)
+    print()
+    print(format_table(rows))
+    if args.report:
+        path = write_report(build_report(suites, args.repeats, current, failures, rows), args.report)
+        print(f"\nComparison written to {path}")
+    regressed = [name for name, _, result in rows if result and result['status'] == 'REGRESSED']
+    missing = [name for name, _, result in rows if result and result['status'] == 'MISSING']
+    new = [name for name, _, result in rows if result is None]
+    if new:
+        print(f"\n{len(new)} metrics have no baseline; record them with --update-baseline")
+    if missing:
+        print(f"\n{len(missing)} baseline metric(s) missing from this run: {', '.join(missing)}")
+    if regressed:
+        print(f"\n{len(regressed)} regression(s): {', '.join(regressed)}")
+    if missing or regressed:
+        return 1
+    print("\nNo regressions")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
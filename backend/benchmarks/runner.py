@@ -0,0 +1,65 @@
+"""Helpers shared by the benchmark suites"""
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+from datetime import datetime
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+PROJECT_ROOT = BENCH_DIR.parent.parent
+FIXTURE_DIR = BENCH_DIR / 'fixtures'
+RESULTS_DIR = BENCH_DIR / 'results'
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=PROJECT_ROOT,
+            stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def environment():
+    """Where a result was measured; baselines only compare like with like"""
+    return {
+        'commit': git_commit(),
+        'timestamp': datetime.utcnow().isoformat(),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'node': platform.node(),
+        'cpus': os.cpu_count(),
+    }
+
+
+def run_worker(module, argv, env=None):
+    """Run ``python -m module --worker ... --output tmp`` and load its JSON.
+
+    Suites that need the Flask app run each configuration in a fresh
+    process, so singletons and caches never carry over between runs.
+    """
+    with tempfile.NamedTemporaryFile(suffix='.json', delete=False) as output:
+        output_path = Path(output.name)
+    command = [sys.executable, '-m', module, '--worker', *argv, '--output', str(output_path)]
+    try:
+        subprocess.run(command, cwd=PROJECT_ROOT, env=dict(os.environ, **(env or {})), check=True)
+        return json.loads(output_path.read_text())
+    except subprocess.CalledProcessError as e:
+        return {'error': f'worker exited with {e.returncode}'}
+    finally:
+        output_path.unlink(missing_ok=True)
+
+
+def write_report(report, path=None, suite=None):
+    """Write a report; defaults to results/<suite>-<commit>-<time>.json"""
+    if path is None:
+        stamp = report['timestamp'][:19].replace(':', '')
+        path = RESULTS_DIR / f"{suite or report['suite']}-{report['commit']}-{stamp}.json"
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(report, indent=2))
+    return path
@@ -0,0 +1,234 @@
+"""Benchmarks for the socket_events.py hot paths.
+
+* tick: one ``game_update`` from every player in a room, handled by the
+  real event handler and fanned out to every member (Flask-SocketIO test
+  clients), in ms per tick.
+* encode: Socket.IO packet encoding of the ``player_update`` fan-out message
+  and the ``game_state`` snapshot sent to spectators, in us per packet.
+
+Runs in a worker process against a throwaway SQLite database.
+
+Usage::
+
+    python -m backend.benchmarks.socket_paths --room-sizes 2,4,8 --ticks 300
+    python manage.py --bench socket
+"""
+import argparse
+import json
+import shutil
+import tempfile
+import time
+from pathlib import Path
+from backend.benchmarks.runner import environment, run_worker, write_report
+from backend.benchmarks.stats import describe
+
+DEFAULT_ROOM_SIZES = (2, 4, 8)
+BENCH_PASSWORD = 'bench-password'
+
+
+def player_state(index, tick):
+    angle = (tick + index) * 0.05
+    return {
+        'position': {'x': 500.0 + 3 * tick + index, 'y': 500.0 + angle},
+        'velocity': {'x': 120.5 - index, 'y': 3.25 * index},
+        'fuel': 100.0 - tick * 0.01,
+    }
+
+
+def game_state_payload(room_size):
+    """A spectator snapshot shaped like handle_spectate's"""
+    return {
+        'id': 1,
+        'track_id': 1,
+        'status': 'in_progress',
+        'players': [{
+            'user_id': index + 1,
+            'username': f'bench_{index:03d}',
+            'ship_id': 1,
+            'is_ready': True,
+            'position': None,
+            'finish_time': None,
+            'state': dict(player_state(index, 100), timestamp=1700000000.0 + index),
+        } for index in range(room_size)]
+    }
+
+
+def bench_encode(payload, event, iterations, batches=20):
+    """Microseconds per encoded packet, one sample per batch"""
+    from socketio import packet
+
+    samples = []
+    per_batch = max(1, iterations // batches)
+    for _ in range(batches):
+        started = time.perf_counter()
+        for _ in range(per_batch):
+            packet.Packet(packet.EVENT, data=[event, payload]).encode()
+        samples.append((time.perf_counter() - started) / per_batch * 1e6)
+    return samples
+
+
+def seed_catalog(app):
+    """A ship and a course for the bench games; returns their ids"""
+    from backend import db
+    from backend.game.catalog import init_catalog
+    from backend.models.course import Course
+    from backend.models.ship import Ship
+
+    with app.app_context():
+        db.create_all()
+        init_catalog(app)  # Seeds the default ships
+        if Course.query.first() is None:
+            db.session.add(Course(name='Bench Track', difficulty='easy', par_time=60.0,
+                                  checkpoints=[{'x': 100.0, 'y': 100.0}]))
+            db.session.commit()
+        return Course.query.first().id, Ship.query.first().id
+
+
+def create_room(app, room_size, run_index, course_id, ship_id):
+    """Users, a waiting game with their sessions, and connected clients"""
+    from backend import db, socketio
+    from backend.models.game import Game
+    from backend.models.game_session import GameSession
+    from backend.models.user import User
+
+    with app.app_context():
+        users = []
+        for index in range(room_size):
+            user = User(username=f'bench_{run_index}_{index}',
+                        email=f'bench_{run_index}_{index}@bench.invalid')
+            user.set_password(BENCH_PASSWORD)
+            db.session.add(user)
+            users.append(user)
+        game = Game(track_id=course_id, status='waiting', max_players=room_size)
+        db.session.add(game)
+        db.session.flush()
+        for user in users:
+            db.session.add(GameSession(game_id=game.id, user_id=user.id, ship_id=ship_id))
+        db.session.commit()
+        game_id = game.id
+        usernames = [user.username for user in users]
+
+    clients = []
+    for username in usernames:
+        http = app.test_client()
+        response = http.post('/auth/login', json={'username': username, 'password': BENCH_PASSWORD})
+        if response.status_code != 200:
+            raise RuntimeError(f"Could not log in as {username}")
+        client = socketio.test_client(app, flask_test_client=http)
+        client.emit('join_game', {'game_id': game_id, 'ship_id': ship_id})
+        client.get_received()
+        clients.append(client)
+    return game_id, clients
+
+
+def bench_ticks(clients, game_id, ticks, warmup):
+    samples = []
+    for tick in range(warmup + ticks):
+        started = time.perf_counter()
+        for index, client in enumerate(clients):
+            client.emit('game_update', dict(player_state(index, tick), game_id=game_id))
+        elapsed = (time.perf_counter() - started) * 1000
+        for client in clients:
+            client.get_received()
+        if tick >= warmup:
+            samples.append(elapsed)
+    return samples
+
+
+def run_paths(options):
+    """Benchmark every room size (runs in the worker)"""
+    from backend import create_app
+
+    app, _ = create_app()
+    app.config['TESTING'] = True
+    course_id, ship_id = seed_catalog(app)
+
+    update = dict(player_state(0, 1), user_id=1, timestamp=1700000000.0)
+    results = {'tick': {}, 'encode': {
+        'player_update': describe(
+            bench_encode(update, 'player_update', options['encode_iterations']), unit='us'
+        )
+    }}
+    for run_index, room_size in enumerate(options['room_sizes']):
+        print(f"  room of {room_size}...")
+        game_id, clients = create_room(app, room_size, run_index, course_id, ship_id)
+        try:
+            results['tick'][f'room_{room_size}'] = describe(
+                bench_ticks(clients, game_id, options['ticks'], options['warmup'])
+            )
+        finally:
+            for client in clients:
+                client.disconnect()
+
+        results['encode'][f'game_state_room_{room_size}'] = describe(
+            bench_encode(game_state_payload(room_size), 'game_state', options['encode_iterations']),
+            unit='us'
+        )
+    return results
+
+
+def run_suite(room_sizes=DEFAULT_ROOM_SIZES, ticks=300, warmup=30, encode_iterations=20000):
+    scratch = Path(tempfile.mkdtemp(prefix='socket_bench_'))
+    try:
+        argv = [
+            '--room-sizes', ','.join(map(str, room_sizes)), '--ticks', str(ticks),
+            '--warmup', str(warmup), '--encode-iterations', str(encode_iterations),
+        ]
+        results = run_worker('backend.benchmarks.socket_paths', argv,
+                             env={'DATABASE_URL': f"sqlite:///{scratch / 'bench.db'}"})
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+    return {
+        'suite': 'socket',
+        **environment(),
+        'settings': {'room_sizes': list(room_sizes), 'ticks': ticks, 'warmup': warmup,
+                     'encode_iterations': encode_iterations},
+        'results': results,
+    }
+
+
+def format_results(report):
+    results = report['results']
+    if 'error' in results:
+        return results['error']
+    lines = [f"  {'path':28s} {'p50':>9s} {'p95':>9s} {'p99':>9s}"]
+    for group, unit in (('tick', 'ms'), ('encode', 'us')):
+        for name, summary in results[group].items():
+            lines.append(f"  {group + '.' + name:28s} {summary[f'p50_{unit}']:9.3f} "
+                         f"{summary[f'p95_{unit}']:9.3f} {summary[f'p99_{unit}']:9.3f} {unit}")
+    return '\n'.join(lines)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Socket hot path benchmarks')
+    parser.add_argument('--room-sizes', default=','.join(map(str, DEFAULT_ROOM_SIZES)))
+    parser.add_argument('--ticks', type=int, default=300)
+    parser.add_argument('--warmup', type=int, default=30)
+    parser.add_argument('--encode-iterations', type=int, default=20000)
+    parser.add_argument('--report', default=None)
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--output', help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    room_sizes = [int(size) for size in args.room_sizes.split(',') if size]
+
+    if args.worker:
+        result = run_paths({
+            'room_sizes': room_sizes, 'ticks': args.ticks, 'warmup': args.warmup,
+            'encode_iterations': args.encode_iterations,
+        })
+        Path(args.output).write_text(json.dumps(result))
+        return result
+
+    report = run_suite(room_sizes, args.ticks, args.warmup, args.encode_iterations)
+    path = write_report(report, args.report)
+    print(format_results(report))
+    print(f"\nResults written to {path}")
+    return report
+
+
+if __name__ == '__main__':
+    main()
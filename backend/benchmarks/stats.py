@@ -0,0 +1,103 @@
+"""Shared measurement helpers for the benchmark suites"""
+import math
+from collections import Counter
+
+
+class LatencyHistogram:
+    """Log-bucketed latency histogram (2% resolution) that merges exactly.
+
+    Keeps a count per bucket instead of samples, so recorders in separate
+    processes can be combined without losing percentile accuracy.
+    """
+    BASE_MS = 0.001
+    GROWTH = 1.02
+
+    def __init__(self):
+        self.buckets = Counter()
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, ms):
+        ms = max(ms, 0.0)
+        index = int(math.log(max(ms, self.BASE_MS) / self.BASE_MS) / math.log(self.GROWTH))
+        self.buckets[index] += 1
+        self.count += 1
+        self.total += ms
+        if ms > self.max:
+            self.max = ms
+
+    def merge(self, other):
+        self.buckets.update(other.buckets)
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+        return self
+
+    def percentile(self, q):
+        if not self.count:
+            return None
+        target = q / 100.0 * self.count
+        seen = 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen >= target:
+                # Upper edge of the bucket, capped at the true maximum
+                return min(self.BASE_MS * self.GROWTH ** (index + 1), self.max)
+        return self.max
+
+    def summary(self):
+        if not self.count:
+            return {'count': 0}
+        return {
+            'count': self.count,
+            'mean_ms': round(self.total / self.count, 3),
+            'p50_ms': round(self.percentile(50), 3),
+            'p90_ms': round(self.percentile(90), 3),
+            'p95_ms': round(self.percentile(95), 3),
+            'p99_ms': round(self.percentile(99), 3),
+            'max_ms': round(self.max, 3),
+        }
+
+    def to_dict(self):
+        return {
+            'buckets': dict(self.buckets),
+            'count': self.count,
+            'total': self.total,
+            'max': self.max,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        histogram = cls()
+        histogram.buckets = Counter({int(k): v for k, v in data['buckets'].items()})
+        histogram.count = data['count']
+        histogram.total = data['total']
+        histogram.max = data['max']
+        return histogram
+
+
+def percentile(samples, q):
+    """Percentile of a list of samples (linear interpolation)"""
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    position = (len(ordered) - 1) * q / 100.0
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def describe(samples, unit='ms'):
+    """Percentile summary of raw samples; keys carry the unit (p50_ms)"""
+    if not samples:
+        return {'count': 0}
+    return {
+        'count': len(samples),
+        f'mean_{unit}': round(sum(samples) / len(samples), 3),
+        f'p50_{unit}': round(percentile(samples, 50), 3),
+        f'p90_{unit}': round(percentile(samples, 90), 3),
+        f'p95_{unit}': round(percentile(samples, 95), 3),
+        f'p99_{unit}': round(percentile(samples, 99), 3),
+        f'max_{unit}': round(max(samples), 3),
+    }
@@ -6,11 +6,38 @@ class Config:
     # Get the directory containing this file
     BASE_DIR = Path(__file__).parent
 
+    # Database backend: 'sqlite' or 'postgresql'. When unset it is taken
+    # from DATABASE_URL, falling back to SQLite.
+    DATABASE_BACKEND = os.getenv('DATABASE_BACKEND')
+    DATABASE_URL = os.getenv('DATABASE_URL')
+    
     # SQLite configuration
     DB_PATH = BASE_DIR / 'database' / 'space_racing.db'
     SQLALCHEMY_DATABASE_URI = f'sqlite:///{DB_PATH}'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     
+    # PostgreSQL configuration
+    DB_USER = os.getenv('DB_USER', 'postgres')
+    DB_PASSWORD = os.getenv('DB_PASSWORD', 'postgres')
+    DB_HOST = os.getenv('DB_HOST', 'localhost')
+    DB_PORT = os.getenv('DB_PORT', '5432')
+    DB_NAME = os.getenv('DB_NAME', 'space_racing')
+    
+    # Connection pool (defaults depend on the backend when unset)
+    DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 0)) or None
+    DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', 0)) or None
+    DB_POOL_RECYCLE = 1800  # seconds
+    DB_POOL_PRE_PING = True
+    
+    # Read/write split: read-intent queries use their own pool
+    # (mode=ro connections on SQLite, DATABASE_READ_URL on PostgreSQL).
+    # Opt in: on SQLite it also caps writers at DB_WRITER_POOL_SIZE
+    # connections, so a session held by a long job blocks other writes
+    DB_READ_SPLIT = os.getenv('DB_READ_SPLIT', '0') == '1'
+    DATABASE_READ_URL = os.getenv('DATABASE_READ_URL')
+    DB_READ_POOL_SIZE = 8
+    DB_WRITER_POOL_SIZE = 1
+    
     # Flask
     SECRET_KEY = os.getenv('SECRET_KEY', 'dev-secret-key')
     FLASK_APP = os.getenv('FLASK_APP', 'backend/app.py')
@@ -31,3 +58,71 @@ class Config:
     PHYSICS_UPDATE_RATE = 60  # Hz
     NETWORK_UPDATE_RATE = 20  # Hz
     MAX_PREDICTION_FRAMES = 10
+
+    # Rank index (ratings outside this range share the end slots)
+    RANK_INDEX_MIN_RATING = 0
+    RANK_INDEX_MAX_RATING = 5000
+    RANK_INDEX_RELOAD_SECONDS = 300  # Per-process index; reload to see other workers' changes
+
+    # Ship/course catalog: reload to see edits from other workers or manage.py
+    CATALOG_TTL_SECONDS = 60
+
+    # SQL instrumentation (per endpoint / socket event, see /admin/query-stats)
+    QUERY_STATS_ENABLED = True
+    QUERY_STATS_SERVER_TIMING = os.getenv('QUERY_STATS_SERVER_TIMING', '0') == '1'
+
+    # Admin endpoints: X-Admin-Token header or a listed username
+    ADMIN_TOKEN = os.getenv('ADMIN_TOKEN')
+    ADMIN_USERNAMES = tuple(filter(None, os.getenv('ADMIN_USERNAMES', '').split(',')))
+
+    # Slow-query log (report with: manage.py --slow-query-report)
+    SLOW_QUERY_LOG_ENABLED = True
+    SLOW_QUERY_THRESHOLD_MS = float(os.getenv('SLOW_QUERY_THRESHOLD_MS', 50))
+    SLOW_QUERY_LOG_PATH = BASE_DIR / 'logs' / 'slow_queries.jsonl'
+    SLOW_QUERY_LOG_MAX_BYTES = 5 * 1024 * 1024
+    SLOW_QUERY_LOG_BACKUPS = 5
+    SLOW_QUERY_WATCH_TABLES = ('game_sessions', 'race_history', 'users')
+
+    # Incremental SQLite maintenance on the background scheduler
+    DB_MAINTENANCE_ENABLED = True
+    DB_MAINTENANCE_INTERVAL = 300  # seconds between passes
+    DB_MAINTENANCE_BUDGET_SECONDS = 2.0  # per pass
+    DB_MAINTENANCE_MAX_QPS = 20.0  # heavier steps only run below this load
+    DB_MAINTENANCE_WAL_TRUNCATE_BYTES = 64 * 1024 * 1024
+    DB_MAINTENANCE_ANALYZE_DRIFT = 0.2  # re-ANALYZE after 20% row count change
+
+    # Socket matchmaking: a match starts once MIN players queue, up to MAX
+    MATCHMAKING_MIN_PLAYERS = int(os.getenv('MATCHMAKING_MIN_PLAYERS', 2))
+    MATCHMAKING_MAX_PLAYERS = int(os.getenv('MATCHMAKING_MAX_PLAYERS', 4))
+
+    # Prometheus metrics at /metrics; scrapers send "Authorization: Bearer <token>" when set
+    METRICS_ENABLED = os.getenv('METRICS_ENABLED', '1') == '1'
+    METRICS_TOKEN = os.getenv('METRICS_TOKEN')
+
+    # Optional StatsD export of the same metrics, batched per worker
+    STATSD_ENABLED = os.getenv('STATSD_ENABLED', '0') == '1'
+    STATSD_HOST = os.getenv('STATSD_HOST', 'localhost')
+    STATSD_PORT = int(os.getenv('STATSD_PORT', 8125))
+    STATSD_PREFIX = os.getenv('STATSD_PREFIX', 'halo')
+    STATSD_WORKER_ID = os.getenv('STATSD_WORKER_ID')  # Defaults to <hostname>_<pid>
+    STATSD_FLUSH_INTERVAL = float(os.getenv('STATSD_FLUSH_INTERVAL', 5))
+    STATSD_MAX_UDP_SIZE = 1432  # Fits one Ethernet frame
+    STATSD_RESERVOIR = 64  # Timer samples kept per metric and interval
+
+    # Admin-triggered cProfile captures of socket handlers (see /admin/profile)
+    HANDLER_PROFILE_DIR = BASE_DIR / 'logs' / 'profiles'
+    HANDLER_PROFILE_MAX_INVOCATIONS = 1000
+    HANDLER_PROFILE_MAX_SECONDS = 300
+
+    # Flight recorder ring buffer (decode with: manage.py --decode-flight-recording)
+    FLIGHT_RECORDER_ENABLED = True
+    FLIGHT_RECORDER_CAPACITY = 65536  # Records of 36 bytes
+    FLIGHT_RECORDER_DIR = BASE_DIR / 'logs' / 'flight'
+    FLIGHT_RECORDER_SLOW_HANDLER_MS = 250  # Slower handlers trigger a dump
+    FLIGHT_RECORDER_DUMP_COOLDOWN = 60  # seconds between automatic dumps
+
+    # Memory accounting (see /admin/memory); tracemalloc only runs when started
+    MEMORY_SNAPSHOT_DIR = BASE_DIR / 'logs' / 'memory'
+    MEMORY_TRACEMALLOC_AT_START = os.getenv('MEMORY_TRACEMALLOC_AT_START', '0') == '1'
+    MEMORY_TRACEMALLOC_FRAMES = 10
+    MEMORY_MAX_SNAPSHOTS = 10
@@ -0,0 +1,219 @@
+import hashlib
+import json
+import time
+from bisect import bisect_right
+from threading import Lock
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import event
+from sqlalchemy.orm import object_session
+from backend import db
+from backend.models.ship import Ship
+from backend.models.course import Course
+from backend.utils.db_utils import run_after_commit
+
+# Ships seeded into an empty catalog
+DEFAULT_SHIPS = [
+    {
+        'name': "Starfighter",
+        'description': "Balanced starter ship with good all-round capabilities",
+        'sprite_key': "starfighter.png",
+        'max_speed': 60,
+        'acceleration': 55,
+        'handling': 65,
+        'shield_strength': 50,
+        'energy_capacity': 50,
+        'required_rating': 0
+    },
+    {
+        'name': "Interceptor",
+        'description': "Fast but fragile ship designed for experienced pilots",
+        'sprite_key': "interceptor.png",
+        'max_speed': 80,
+        'acceleration': 70,
+        'handling': 75,
+        'shield_strength': 30,
+        'energy_capacity': 40,
+        'required_rating': 1200
+    },
+    {
+        'name': "Juggernaut",
+        'description': "Heavy ship with strong shields but poor maneuverability",
+        'sprite_key': "juggernaut.png",
+        'max_speed': 40,
+        'acceleration': 35,
+        'handling': 30,
+        'shield_strength': 85,
+        'energy_capacity': 70,
+        'required_rating': 1500
+    },
+    {
+        'name': "Default Ship",
+        'description': "Basic starter ship",
+        'sprite_key': "default_ship.png",
+        'max_speed': 50,
+        'acceleration': 50,
+        'handling': 50,
+        'shield_strength': 50,
+        'energy_capacity': 50,
+        'required_rating': 0
+    }
+]
+
+
+class Catalog:
+    """Versioned in-memory catalog of ships and courses.
+
+    Ships and courses are loaded once and pre-serialized. Changes made
+    through this process's ORM bump ``version`` after commit and the catalog
+    reloads on the next read; changes from other workers or manage.py are
+    picked up when the loaded copy is older than ``ttl`` seconds. Unlock
+    filtering bisects thresholds sorted by required rating, and the JSON
+    body for each distinct unlocked set is cached with its ETag.
+    """
+    def __init__(self, ttl: float = 60.0):
+        self.lock = Lock()
+        self.ttl = ttl
+        self.version = 0
+        self.loaded_version = None
+        self.loaded_at = 0.0
+        self.ships: List[dict] = []
+        self.ships_by_id: Dict[int, dict] = {}
+        self.courses: List[dict] = []
+        self._ship_thresholds: List[int] = []  # required_rating, ascending
+        self._ship_requirements: List[Tuple[int, int, dict]] = []  # (rating, wins, api dict)
+        self._course_thresholds: List[int] = []
+        self._course_entries: List[dict] = []
+        self._responses: Dict[tuple, Tuple[str, bytes]] = {}  # {key: (etag, body)}
+
+    def invalidate(self):
+        """Mark the catalog stale; the next read reloads it"""
+        with self.lock:
+            self.version += 1
+
+    def load(self, seed: bool = False):
+        """Load ships and courses, seeding default ships into an empty table"""
+        version = self.version
+        loaded_at = time.monotonic()
+        ships = Ship.query.all()
+        if not ships and seed:
+            for ship_data in DEFAULT_SHIPS:
+                db.session.add(Ship(**ship_data))
+            db.session.commit()
+            ships = Ship.query.all()
+            version = self.version
+        courses = Course.query.all()
+        # Sorted here, not in SQL: the bisects treat a NULL requirement as 0,
+        # and PostgreSQL would sort NULLs last
+        ships.sort(key=lambda ship: (ship.required_rating or 0, ship.id))
+        courses.sort(key=lambda course: (course.required_rating or 0, course.id))
+
+        ship_dicts = [ship.to_dict() for ship in ships]
+        requirements = [
+            (ship.required_rating or 0, ship.required_wins or 0, {
+                'id': ship.id,
+                'name': ship.name,
+                'description': ship.description,
+                'required_rating': ship.required_rating,
+                'stats': {
+                    'acceleration': ship.acceleration,
+                    'max_speed': ship.max_speed,
+                    'handling': ship.handling,
+                    'shield_strength': ship.shield_strength,
+                    'energy_capacity': ship.energy_capacity
+                },
+                'sprite_key': ship.sprite_key
+            })
+            for ship in ships
+        ]
+        course_entries = [{
+            'id': course.id,
+            'name': course.name,
+            'description': course.description,
+            'difficulty': course.difficulty,
+            'par_time': course.par_time,
+            'thumbnail_key': course.thumbnail_key
+        } for course in courses]
+
+        with self.lock:
+            self.ships = ship_dicts
+            self.ships_by_id = {ship['id']: ship for ship in ship_dicts}
+            self._ship_requirements = requirements
+            self._ship_thresholds = [rating for rating, _, _ in requirements]
+            self._course_entries = course_entries
+            self._course_thresholds = [course.required_rating or 0 for course in courses]
+            self._responses = {}
+            self.loaded_version = version
+            self.loaded_at = loaded_at
+        return len(ship_dicts), len(course_entries)
+
+    def _ensure_loaded(self):
+        expired = self.ttl and time.monotonic() - self.loaded_at > self.ttl
+        if self.loaded_version != self.version or expired:
+            self.load()
+
+    def _response(self, key, payload_fn) -> Tuple[str, bytes]:
+        cached = self._responses.get(key)
+        if cached is None:
+            body = json.dumps(payload_fn(), separators=(',', ':')).encode('utf-8')
+            etag = hashlib.sha1(body).hexdigest()[:16]
+            cached = (f'{key[0]}-{self.loaded_version}-{etag}', body)
+            self._responses[key] = cached
+        return cached
+
+    def ships_for(self, rating: int, wins: int) -> List[dict]:
+        """All ships with an ``unlocked`` flag for this player"""
+        self._ensure_loaded()
+        return [
+            dict(ship, unlocked=rating >= req_rating and wins >= req_wins)
+            for ship, (req_rating, req_wins, _) in zip(self.ships, self._ship_requirements)
+        ]
+
+    def unlocked_ships(self, rating: int, wins: int) -> Tuple[str, bytes]:
+        """(etag, JSON body) of the ships this player has unlocked"""
+        self._ensure_loaded()
+        candidates = self._ship_requirements[:bisect_right(self._ship_thresholds, rating)]
+        unlocked = [entry for _, req_wins, entry in candidates if wins >= req_wins]
+        key = ('ships',) + tuple(entry['id'] for entry in unlocked)
+        return self._response(key, lambda: unlocked)
+
+    def unlocked_courses(self, rating: int) -> Tuple[str, bytes]:
+        """(etag, JSON body) of the courses this player has unlocked"""
+        self._ensure_loaded()
+        count = bisect_right(self._course_thresholds, rating)
+        return self._response(('courses', count), lambda: self._course_entries[:count])
+
+    def get_ship(self, ship_id) -> Optional[dict]:
+        self._ensure_loaded()
+        try:
+            return self.ships_by_id.get(int(ship_id))
+        except (TypeError, ValueError):
+            return None
+
+    def default_ship(self) -> Optional[dict]:
+        """First ship that needs no rating"""
+        self._ensure_loaded()
+        for ship in self.ships:
+            if not ship['required_rating']:
+                return ship
+        return None
+
+
+# Global catalog instance
+catalog = Catalog()
+
+
+def _invalidate_on_commit(mapper, connection, target):
+    run_after_commit(catalog.invalidate, session=object_session(target))
+
+
+for _model in (Ship, Course):
+    for _event_name in ('after_insert', 'after_update', 'after_delete'):
+        event.listen(_model, _event_name, _invalidate_on_commit)
+
+
+def init_catalog(app):
+    """Load the ship and course catalog"""
+    catalog.ttl = app.config.get('CATALOG_TTL_SECONDS', 60)
+    ship_count, course_count = catalog.load(seed=True)
+    print(f"Catalog loaded with {ship_count} ships and {course_count} courses")
+    return catalog
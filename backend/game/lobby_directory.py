@@ -0,0 +1,201 @@
+import json
+from threading import Lock
+from typing import Dict, List, Optional, Set, Tuple
+from sqlalchemy.orm import selectinload
+from backend.models.game import Game
+from backend.models.game_session import GameSession
+
+
+class LobbyDirectory:
+    """In-memory snapshot of open (``waiting``) lobbies.
+
+    Write paths call ``touch(game_id)`` after committing a change to a game
+    or its sessions. Touched games are re-read in one eager-loaded query the
+    next time the directory is read, so serving ``/api/lobbies`` costs no
+    queries in steady state. Every change bumps ``version``, which doubles
+    as the ETag of the pre-serialized full listing.
+
+    Applied changes are also queued in an outbox that the ``lobbies``
+    Socket.IO channel drains to push diffs to subscribed clients.
+    """
+    def __init__(self):
+        self.lock = Lock()
+        self.lobbies: Dict[int, dict] = {}  # {game_id: lobby dict}
+        self.version = 0
+        self.loaded = False
+        self._dirty: Set[int] = set()
+        self._serialized: Optional[Tuple[int, bytes]] = None  # (version, body)
+        self._outbox: Dict[int, Tuple[str, Optional[dict]]] = {}  # {game_id: (kind, lobby)}
+        self._outbox_version = 0  # Version at the last drain
+
+    @staticmethod
+    def _eager_query():
+        return Game.query.options(
+            selectinload(Game.sessions).joinedload(GameSession.user)
+        )
+
+    @staticmethod
+    def serialize_game(game) -> dict:
+        return {
+            'id': game.id,
+            'track_id': game.track_id,
+            'status': game.status,
+            'player_count': len(game.sessions),
+            'max_players': game.max_players,
+            'free_slots': max(0, game.max_players - len(game.sessions)),
+            'created_at': game.created_at.isoformat() if game.created_at else None,
+            'players': [{
+                'user_id': session.user_id,
+                'username': session.user.username,
+                'ship_id': session.ship_id,
+                'is_ready': session.is_ready
+            } for session in game.sessions]
+        }
+
+    def load(self) -> int:
+        """Rebuild the snapshot from the database"""
+        # Changes touched after this point are re-applied on the next read
+        with self.lock:
+            self._dirty.clear()
+        games = self._eager_query().filter(Game.status == 'waiting').all()
+        with self.lock:
+            self.lobbies = {game.id: self.serialize_game(game) for game in games}
+            self.version += 1
+            # Subscribers resync from a snapshot after a full reload
+            self._outbox.clear()
+            self._outbox_version = self.version
+            self.loaded = True
+        return len(self.lobbies)
+
+    def touch(self, *game_ids) -> None:
+        """Mark games as changed; call after the change is committed"""
+        with self.lock:
+            self._dirty.update(gid for gid in game_ids if gid is not None)
+
+    def apply_pending(self) -> List[Tuple[str, int, Optional[dict]]]:
+        """Re-read touched games and fold them into the snapshot.
+
+        Returns the resulting changes as (kind, game_id, lobby) tuples, where
+        kind is one of created, updated, started or removed.
+        """
+        if not self.loaded:
+            self.load()
+            return []
+        with self.lock:
+            if not self._dirty:
+                return []
+            dirty, self._dirty = self._dirty, set()
+
+        games = self._eager_query().filter(Game.id.in_(dirty)).all()
+        fresh = {
+            game.id: self.serialize_game(game)
+            for game in games if game.status == 'waiting'
+        }
+        started = {game.id for game in games if game.status == 'in_progress'}
+
+        changes = []
+        with self.lock:
+            for game_id in dirty:
+                lobby = fresh.get(game_id)
+                previous = self.lobbies.get(game_id)
+                if lobby is None:
+                    if previous is not None:
+                        del self.lobbies[game_id]
+                        kind = 'started' if game_id in started else 'removed'
+                        changes.append((kind, game_id, None))
+                elif previous is None:
+                    self.lobbies[game_id] = lobby
+                    changes.append(('created', game_id, lobby))
+                elif previous != lobby:
+                    self.lobbies[game_id] = lobby
+                    changes.append(('updated', game_id, lobby))
+            if changes:
+                self.version += 1
+                for kind, game_id, lobby in changes:
+                    self._queue_change(kind, game_id, lobby)
+        return changes
+
+    def _queue_change(self, kind, game_id, lobby):
+        """Coalesce a change into the outbox (caller holds the lock)"""
+        queued = self._outbox.get(game_id)
+        if queued and queued[0] == 'created':
+            if kind == 'updated':
+                kind = 'created'
+            elif kind in ('started', 'removed'):
+                # Never announced; subscribers do not need to hear about it
+                del self._outbox[game_id]
+                return
+        self._outbox[game_id] = (kind, lobby)
+
+    def outbox_size(self) -> int:
+        return len(self._outbox)
+
+    def drain_changes(self) -> Optional[dict]:
+        """Apply pending touches and take the queued diff, if any.
+
+        The diff covers versions (from_version, version]. Changes are
+        idempotent upserts/deletes, so clients holding a snapshot at any
+        version in that range can apply it.
+        """
+        self.apply_pending()
+        with self.lock:
+            if not self._outbox:
+                return None
+            outbox, self._outbox = self._outbox, {}
+            diff = {
+                'from_version': self._outbox_version,
+                'version': self.version,
+                'changes': [
+                    {'op': kind, 'id': game_id, 'lobby': lobby}
+                    if lobby is not None else {'op': kind, 'id': game_id}
+                    for game_id, (kind, lobby) in outbox.items()
+                ]
+            }
+            self._outbox_version = self.version
+        return diff
+
+    def snapshot(self) -> Tuple[int, List[dict]]:
+        """Current (version, lobbies) ordered oldest first"""
+        self.apply_pending()
+        with self.lock:
+            lobbies = sorted(
+                self.lobbies.values(),
+                key=lambda lobby: (lobby['created_at'] or '', lobby['id'])
+            )
+            return self.version, lobbies
+
+    def serialized(self) -> Tuple[int, bytes]:
+        """Current (version, JSON body) of the full listing"""
+        self.apply_pending()
+        cached = self._serialized
+        if cached and cached[0] == self.version:
+            return cached
+        version, lobbies = self.snapshot()
+        cached = (version, json.dumps(lobbies, separators=(',', ':')).encode('utf-8'))
+        self._serialized = cached
+        return cached
+
+    def query(self, track_id: Optional[int] = None, min_free_slots: int = 0,
+              page: int = 1, per_page: Optional[int] = None) -> Tuple[int, int, List[dict]]:
+        """Filtered page of lobbies as (version, total, lobbies)"""
+        version, lobbies = self.snapshot()
+        if track_id is not None:
+            lobbies = [l for l in lobbies if l['track_id'] == track_id]
+        if min_free_slots:
+            lobbies = [l for l in lobbies if l['free_slots'] >= min_free_slots]
+        total = len(lobbies)
+        if per_page:
+            start = (max(page, 1) - 1) * per_page
+            lobbies = lobbies[start:start + per_page]
+        return version, total, lobbies
+
+
+# Global lobby directory instance
+lobby_directory = LobbyDirectory()
+
+
+def init_lobby_directory(app):
+    """Load the open lobby snapshot"""
+    count = lobby_directory.load()
+    print(f"Lobby directory loaded with {count} open lobbies")
+    return lobby_directory
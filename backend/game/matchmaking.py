@@ -10,6 +10,8 @@ from statistics import mean
 from dataclasses import dataclass, field
 from typing import List, Optional, Dict, Any
 from backend.models.game import Game
+from backend.game.lobby_directory import lobby_directory
+from backend.utils.metrics import record_matchmaking_wait
 
 @dataclass
 class Party:
@@ -262,8 +264,10 @@ class MatchmakingQueue:
             
             # Update player entry with matched session
             entry.matched_session = game.id
+            record_matchmaking_wait('party', (datetime.utcnow() - entry.join_time).total_seconds())
         
         db.session.commit()
+        lobby_directory.touch(game.id)
         
         # Notify all players
         for user_id in all_players:
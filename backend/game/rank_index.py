@@ -0,0 +1,230 @@
+from bisect import bisect_left, insort
+from threading import Lock
+from typing import Dict, List, Optional, Tuple
+
+
+class FenwickTree:
+    """Binary indexed tree of counts supporting prefix sums and k-th lookups"""
+    def __init__(self, size: int):
+        self.size = size
+        self.tree = [0] * (size + 1)
+        # Highest power of two <= size, used by find_kth
+        self.top_bit = 1 << (size.bit_length() - 1) if size else 0
+
+    @classmethod
+    def from_counts(cls, counts: List[int]) -> 'FenwickTree':
+        """Build a tree from per-slot counts in O(n)"""
+        tree = cls(len(counts))
+        for i, count in enumerate(counts, start=1):
+            tree.tree[i] += count
+            parent = i + (i & -i)
+            if parent <= tree.size:
+                tree.tree[parent] += tree.tree[i]
+        return tree
+
+    def add(self, index: int, delta: int) -> None:
+        """Add delta to slot index (0-based)"""
+        i = index + 1
+        while i <= self.size:
+            self.tree[i] += delta
+            i += i & -i
+
+    def prefix_sum(self, index: int) -> int:
+        """Sum of slots [0, index] (0-based, inclusive)"""
+        total = 0
+        i = index + 1
+        while i > 0:
+            total += self.tree[i]
+            i -= i & -i
+        return total
+
+    def find_kth(self, k: int) -> int:
+        """Return the 0-based slot holding the k-th item (1-based k)"""
+        pos = 0
+        bit = self.top_bit
+        while bit:
+            nxt = pos + bit
+            if nxt <= self.size and self.tree[nxt] < k:
+                pos = nxt
+                k -= self.tree[nxt]
+            bit >>= 1
+        return pos
+
+
+class RatingRankIndex:
+    """In-memory order-statistic index over user ratings.
+
+    Ratings are counted in a Fenwick tree with one slot per rating point.
+    Slots are stored highest rating first so prefix sums give "number of
+    players rated at least r", which makes rank lookups, top-N and
+    neighbourhood queries O(log n) without touching the database.
+
+    Ranks follow the same rules as the old COUNT(*) query: a player's rank
+    is one plus the number of players with a strictly higher rating.
+    Ratings outside [min_rating, max_rating] are clamped into the end slots.
+
+    The index lives in one process. Rating changes made by other workers
+    (or by manage.py) only show up after the next ``load``, which the
+    scheduler repeats every RANK_INDEX_RELOAD_SECONDS. Until the first load
+    succeeds ``loaded`` is False, updates are ignored (the load reads them
+    from the database) and callers should rank with SQL instead.
+    """
+    def __init__(self, min_rating: int = 0, max_rating: int = 5000):
+        self.min_rating = min_rating
+        self.max_rating = max_rating
+        self.lock = Lock()
+        self._reset()
+
+    def _reset(self):
+        self.loaded = False
+        size = self.max_rating - self.min_rating + 1
+        self.tree = FenwickTree(size)
+        self.ratings: Dict[int, int] = {}  # {user_id: rating}
+        self.buckets: Dict[int, List[int]] = {}  # {slot: sorted [user_ids]}
+
+    def _slot(self, rating: int) -> int:
+        rating = min(max(rating, self.min_rating), self.max_rating)
+        return self.max_rating - rating
+
+    def load(self, rows) -> int:
+        """Rebuild the index from (user_id, rating) rows"""
+        counts = [0] * (self.max_rating - self.min_rating + 1)
+        ratings = {}
+        buckets = {}
+        for user_id, rating in rows:
+            rating = rating if rating is not None else 1000
+            slot = self._slot(rating)
+            ratings[user_id] = rating
+            counts[slot] += 1
+            buckets.setdefault(slot, []).append(user_id)
+        for members in buckets.values():
+            members.sort()
+
+        with self.lock:
+            self.tree = FenwickTree.from_counts(counts)
+            self.ratings = ratings
+            self.buckets = buckets
+            self.loaded = True
+        return len(ratings)
+
+    def __len__(self):
+        return len(self.ratings)
+
+    def __contains__(self, user_id):
+        return user_id in self.ratings
+
+    def _insert(self, user_id: int, rating: int):
+        slot = self._slot(rating)
+        self.ratings[user_id] = rating
+        insort(self.buckets.setdefault(slot, []), user_id)
+        self.tree.add(slot, 1)
+
+    def _remove(self, user_id: int):
+        rating = self.ratings.pop(user_id)
+        slot = self._slot(rating)
+        members = self.buckets[slot]
+        del members[bisect_left(members, user_id)]
+        if not members:
+            del self.buckets[slot]
+        self.tree.add(slot, -1)
+
+    def update(self, user_id: int, rating: int) -> None:
+        """Insert a user or move them to a new rating"""
+        with self.lock:
+            if not self.loaded:
+                return
+            current = self.ratings.get(user_id)
+            if current is not None:
+                if self._slot(current) == self._slot(rating):
+                    self.ratings[user_id] = rating
+                    return
+                self._remove(user_id)
+            self._insert(user_id, rating)
+
+    def remove(self, user_id: int) -> bool:
+        with self.lock:
+            if user_id not in self.ratings:
+                return False
+            self._remove(user_id)
+            return True
+
+    def rank_of(self, user_id: int) -> Optional[int]:
+        """1-based rank of a user, or None if the user is not indexed"""
+        with self.lock:
+            rating = self.ratings.get(user_id)
+            if rating is None:
+                return None
+            slot = self._slot(rating)
+            return (self.tree.prefix_sum(slot - 1) if slot else 0) + 1
+
+    def rank_for_rating(self, rating: int) -> int:
+        """Rank a player with this rating would have"""
+        with self.lock:
+            slot = self._slot(rating)
+            return (self.tree.prefix_sum(slot - 1) if slot else 0) + 1
+
+    def _entries_from(self, position: int, count: int) -> List[Tuple[int, int, int]]:
+        """Entries at list positions [position, position + count) (1-based).
+
+        Players sharing a rating are listed by user id but share a rank.
+        """
+        entries = []
+        total = len(self.ratings)
+        while count > 0 and position <= total:
+            slot = self.tree.find_kth(position)
+            before = self.tree.prefix_sum(slot - 1) if slot else 0
+            members = self.buckets[slot]
+            offset = position - before - 1
+            for user_id in members[offset:offset + count]:
+                entries.append((before + 1, user_id, self.ratings[user_id]))
+            taken = min(count, len(members) - offset)
+            position += taken
+            count -= taken
+        return entries
+
+    def top(self, n: int) -> List[Tuple[int, int, int]]:
+        """Top n players as (rank, user_id, rating) tuples"""
+        with self.lock:
+            return self._entries_from(1, n)
+
+    def around_rank(self, rank: int, radius: int = 5) -> List[Tuple[int, int, int]]:
+        """Players listed around a rank as (rank, user_id, rating) tuples"""
+        with self.lock:
+            start = max(1, rank - radius)
+            return self._entries_from(start, rank + radius - start + 1)
+
+    def around_user(self, user_id: int, radius: int = 5) -> List[Tuple[int, int, int]]:
+        """Players listed around a user's own position"""
+        with self.lock:
+            rating = self.ratings.get(user_id)
+            if rating is None:
+                return []
+            slot = self._slot(rating)
+            before = self.tree.prefix_sum(slot - 1) if slot else 0
+            members = self.buckets[slot]
+            position = before + bisect_left(members, user_id) + 1
+            start = max(1, position - radius)
+            return self._entries_from(start, position + radius - start + 1)
+
+
+# Global rank index instance, loaded by init_rank_index at startup
+rank_index = RatingRankIndex()
+
+
+def init_rank_index(app):
+    """Load the rank index from the users table"""
+    rank_index.min_rating = app.config.get('RANK_INDEX_MIN_RATING', 0)
+    rank_index.max_rating = app.config.get('RANK_INDEX_MAX_RATING', 5000)
+    rank_index._reset()
+    count = reload_rank_index()
+    print(f"Rank index loaded with {count} users")
+    return rank_index
+
+
+def reload_rank_index() -> int:
+    """Rebuild the index from the users table; readers keep the old one until done"""
+    from backend import db
+    from backend.models.user import User
+
+    rows = db.session.query(User.id, User.rating).yield_per(10000)
+    return rank_index.load(rows)
@@ -0,0 +1,183 @@
+from datetime import datetime
+from threading import Lock
+from typing import Any, Dict, List, Optional, Tuple
+from sqlalchemy.orm import joinedload
+from backend import db
+from backend.models.leaderboard import Leaderboard
+from backend.models.course_record import CourseRecord
+from backend.utils.db_utils import run_after_commit
+
+ALL_TRACKS = None  # Cache key for the cross-track records list
+
+
+class TrackLeaderboards:
+    """Maintains per-track leaderboard rows and cached top-K lists.
+
+    Race results are folded into ``Leaderboard`` and ``CourseRecord`` rows
+    inside the caller's transaction. Each track has a version number that is
+    bumped by an after-commit callback whenever the result could change that
+    track's top-K (a new personal best near the top, or any race by a listed
+    player); the decision is made against the cache as it stands at commit.
+    Cached lists carry the version they were built from and are rebuilt
+    lazily on the next read, so steady-state reads are O(K) list copies.
+    """
+    def __init__(self, top_k: int = 10):
+        self.top_k = top_k
+        self.lock = Lock()
+        self.versions: Dict[Any, int] = {}  # {track_id: version}
+        self.cache: Dict[Any, Tuple[int, List[dict]]] = {}  # {track_id: (version, entries)}
+
+    def version(self, track_id=ALL_TRACKS) -> int:
+        return self.versions.get(track_id, 0)
+
+    def record_result(self, game, session, replay_data=None) -> Optional[Leaderboard]:
+        """Fold a finished session into the track's leaderboard rows.
+
+        Does not commit; the rows are written with the race result.
+        """
+        if session.finish_time is None and not session.position:
+            return None
+
+        entry = Leaderboard.query.filter_by(
+            user_id=session.user_id,
+            track_id=game.track_id
+        ).first()
+        if not entry:
+            entry = Leaderboard(
+                user_id=session.user_id,
+                track_id=game.track_id,
+                ship_id=session.ship_id,
+                total_races=0,
+                wins=0
+            )
+            db.session.add(entry)
+
+        finish_time = None if session.dnf else session.finish_time
+        improved = entry.update_stats(
+            session.ship_id,
+            finish_time,
+            session.position,
+            replay_data
+        )
+
+        if finish_time is not None:
+            # Course records are per ship, so a slower personal best can
+            # still set the record for the ship it was flown in
+            self._update_course_record(game.track_id, session, finish_time, replay_data)
+
+        track_id, user_id = game.track_id, session.user_id
+        new_best = finish_time if improved else None
+        run_after_commit(lambda: self._publish_result(track_id, user_id, new_best))
+
+        return entry
+
+    def revoke_win(self, game, session):
+        """Take back a win credited to a session that has been placed lower"""
+        entry = Leaderboard.query.filter_by(
+            user_id=session.user_id,
+            track_id=game.track_id
+        ).first()
+        if not entry or not entry.wins:
+            return
+        entry.wins -= 1
+        track_id, user_id = game.track_id, session.user_id
+        run_after_commit(lambda: self._publish_result(track_id, user_id, None))
+
+    def _update_course_record(self, track_id, session, finish_time, replay_data):
+        record = CourseRecord.query.filter_by(
+            track_id=track_id,
+            ship_id=session.ship_id
+        ).first()
+        if record and record.best_time <= finish_time:
+            return
+        if not record:
+            record = CourseRecord(track_id=track_id, ship_id=session.ship_id)
+            db.session.add(record)
+        record.user_id = session.user_id
+        record.best_time = finish_time
+        record.date_achieved = datetime.utcnow()
+        record.replay_data = replay_data
+
+    def _publish_result(self, track_id, user_id, new_best):
+        """Bump the track's version after commit if cached lists may be stale.
+
+        Runs under the lock that guards publishing in ``top()``, so a list
+        loaded before the commit is either checked here or rejected there.
+        """
+        with self.lock:
+            if self._listed(track_id, user_id) or (
+                    new_best is not None and self._affects_top_k(track_id, new_best)):
+                self._bump(track_id)
+
+    def _affects_top_k(self, track_id, finish_time) -> bool:
+        """Whether a new personal best could change cached top-K lists"""
+        for key in (track_id, ALL_TRACKS):
+            cached = self.cache.get(key)
+            if not cached or cached[0] != self.version(key):
+                # A reader may be loading this list from before the commit
+                return True
+            entries = cached[1]
+            if len(entries) < self.top_k or finish_time < entries[-1]['finish_time']:
+                return True
+        return False
+
+    def _listed(self, track_id, user_id) -> bool:
+        """Whether the player's entry for this track is in a cached top-K list.
+
+        Cached entries carry wins and total_races, which every race changes.
+        """
+        for key in (track_id, ALL_TRACKS):
+            cached = self.cache.get(key)
+            if cached and any(
+                    e['user_id'] == user_id and e['track_id'] == track_id for e in cached[1]):
+                return True
+        return False
+
+    def invalidate(self, track_id=ALL_TRACKS):
+        """Bump the version of a track (and the cross-track list)"""
+        with self.lock:
+            self._bump(track_id)
+
+    def _bump(self, track_id):
+        self.versions[track_id] = self.version(track_id) + 1
+        if track_id is not ALL_TRACKS:
+            self.versions[ALL_TRACKS] = self.version(ALL_TRACKS) + 1
+
+    def top(self, track_id=ALL_TRACKS, limit: Optional[int] = None) -> List[dict]:
+        """Best times for a track (or across all tracks), fastest first"""
+        limit = min(limit or self.top_k, self.top_k)
+        version = self.version(track_id)
+        cached = self.cache.get(track_id)
+        if cached and cached[0] == version:
+            return cached[1][:limit]
+
+        entries = self._load(track_id)
+        with self.lock:
+            # Only publish if nothing was invalidated while loading
+            if self.version(track_id) == version:
+                self.cache[track_id] = (version, entries)
+        return entries[:limit]
+
+    def _load(self, track_id) -> List[dict]:
+        query = Leaderboard.query.options(
+            joinedload(Leaderboard.user)
+        ).filter(Leaderboard.best_time.isnot(None))
+        if track_id is not ALL_TRACKS:
+            query = query.filter(Leaderboard.track_id == track_id)
+        rows = query.order_by(Leaderboard.best_time).limit(self.top_k).all()
+
+        return [{
+            'rank': i + 1,
+            'user_id': row.user_id,
+            'username': row.user.username,
+            'finish_time': row.best_time,
+            'ship_id': row.ship_id,
+            'track_id': row.track_id,
+            'wins': row.wins,
+            'total_races': row.total_races,
+            'date': row.date_achieved.isoformat() if row.date_achieved else None
+        } for i, row in enumerate(rows)]
+
+
+# Global leaderboard maintainer instance
+track_leaderboards = TrackLeaderboards()
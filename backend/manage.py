@@ -190,13 +190,15 @@ class GameServerManager:
         from config import Config
         
         try:
-            from sqlalchemy import create_engine, inspect
+            from sqlalchemy import inspect
+            from utils.db_backends import get_backend
             
             # Ensure database directory exists
-            Config.DB_PATH.parent.mkdir(exist_ok=True)
+            backend = get_backend(Config)
+            backend.prepare()
             
             # Create engine and test connection
-            engine = create_engine(Config.SQLALCHEMY_DATABASE_URI)
+            engine = backend.create_engine()
             inspector = inspect(engine)
             tables = inspector.get_table_names()
             
@@ -270,9 +272,10 @@ class GameServerManager:
             # Verify tables exist and have correct schema
             sys.path.insert(0, str(self.backend_dir))
             from config import Config
-            from sqlalchemy import create_engine, inspect
+            from sqlalchemy import inspect
+            from utils.db_backends import get_backend
             
-            engine = create_engine(Config.SQLALCHEMY_DATABASE_URI)
+            engine = get_backend(Config).create_engine()
             inspector = inspect(engine)
             
             # Add your verification logic here
@@ -352,32 +355,45 @@ class GameServerManager:
         except UnicodeEncodeError:
             print(f"\n[SUCCESS] {message}")
 
-    def optimize_database(self):
+    def optimize_database(self, full_vacuum=False):
         """Run database optimization tasks"""
         self.print_status("Optimizing database...", end="")
         
         try:
-            from sqlalchemy import create_engine, text
+            from sqlalchemy import text
             from config import Config
+            from utils.db_backends import get_backend
             
-            engine = create_engine(Config.SQLALCHEMY_DATABASE_URI)
-            with engine.connect() as conn:
-                # Run VACUUM to reclaim space and defragment
-                conn.execute(text('VACUUM'))
-                
-                # Analyze tables for query optimization
-                conn.execute(text('ANALYZE'))
-                
-                # Optimize indexes
-                conn.execute(text('PRAGMA optimize'))
-                
+            backend = get_backend(Config)
+            if backend.name == 'postgresql':
+                engine = backend.create_engine()
+                # VACUUM cannot run inside a transaction block
+                with engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+                    conn.execute(text('VACUUM ANALYZE'))
+                self.print_status("", "OK")
+                return
+            
+            from utils.db_maintenance import DatabaseMaintenance
+            
+            maintenance = DatabaseMaintenance()
+            maintenance.configure(backend.db_path)
+            if full_vacuum:
+                # Rewrites the whole file and blocks writers; also switches the
+                # database to incremental auto-vacuum for later passes
+                maintenance.full_vacuum()
+            
+            # Same steps the scheduler runs, without a time budget
+            report = maintenance.run(budget_seconds=0, force=True)
             self.print_status("", "OK")
+            if report:
+                for step, result in report['steps'].items():
+                    print(f"  {step}: {result}")
             
         except Exception as e:
             self.print_status("", "FAIL")
             raise RuntimeError(f"Database optimization failed: {str(e)}")
 
-    def backup_database(self, note=None):
+    def backup_database(self, note=None, mode='pages', new_base=False):
         """Create a database backup"""
         self.print_status("Creating database backup...", end="")
         
@@ -387,12 +403,27 @@ class GameServerManager:
             
             backup_dir = Config.DB_PATH.parent / 'backups'
             backup = DatabaseBackup(Config.DB_PATH, backup_dir)
-            backup_path, metadata = backup.create_backup(note)
+            def show_progress(copied, total):
+                if total:
+                    print(f"\r  {copied}/{total} pages ({100 * copied // total}%)", end="")
+                    sys.stdout.flush()
+            
+            if mode == 'incremental':
+                backup_path, metadata = backup.create_incremental_backup(
+                    note, full=new_base, progress=show_progress
+                )
+            else:
+                backup_path, metadata = backup.create_backup(note, mode=mode, progress=show_progress)
             
             self.print_status("", "OK")
             print(f"\nBackup created: {backup_path}")
             print(f"Tables backed up: {', '.join(metadata['tables'].keys())}")
-            print(f"Total size: {metadata['size'] / 1024 / 1024:.2f} MB")
+            print(f"Total size: {metadata['size'] / 1024 / 1024:.2f} MB "
+                  f"({metadata['compressed_size'] / 1024 / 1024:.2f} MB compressed)")
+            print(f"Took {metadata['seconds']:.1f}s ({metadata['throughput_mb_s']} MB/s)")
+            if metadata['format'] == 'chunks':
+                print(f"{metadata['kind'].capitalize()} backup: {metadata['changed_chunks']}/"
+                      f"{metadata['chunk_count']} chunks changed, {metadata['new_chunks']} stored")
             if note:
                 print(f"Note: {note}")
             
@@ -400,9 +431,9 @@ class GameServerManager:
             self.print_status("", "FAIL")
             raise RuntimeError(f"Backup failed: {str(e)}")
 
-    def restore_database(self, backup_name):
-        """Restore database from backup"""
-        self.print_status(f"Restoring database from {backup_name}...", end="")
+    def restore_database(self, backup_name=None, restore_at=None):
+        """Restore database from a backup, or the latest one taken before restore_at"""
+        self.print_status(f"Restoring database from {backup_name or restore_at}...", end="")
         
         try:
             from utils.backup import DatabaseBackup
@@ -411,11 +442,21 @@ class GameServerManager:
             backup_dir = Config.DB_PATH.parent / 'backups'
             backup = DatabaseBackup(Config.DB_PATH, backup_dir)
             
+            if restore_at:
+                backup_name = backup.find_backup_at(datetime.fromisoformat(restore_at))
+                if backup_name is None:
+                    raise FileNotFoundError(f"No backup taken before {restore_at}")
+                print(f"\n  Using {backup_name}")
+            
             backup_path = backup_dir / backup_name
-            backup.restore_backup(backup_path)
+            report = backup.restore_backup(backup_path)
             
             self.print_status("", "OK")
             print("\nDatabase restored successfully!")
+            print(f"Restored {report['size'] / 1024 / 1024:.2f} MB from a {report['format']} backup "
+                  f"in {report['seconds']:.1f}s ({report['throughput_mb_s']} MB/s)")
+            if report.get('rollback_path'):
+                print(f"Previous database saved to {report['rollback_path']}")
             
         except Exception as e:
             self.print_status("", "FAIL")
@@ -440,6 +481,9 @@ class GameServerManager:
                 meta = b['metadata']
                 print(f"\n{b['file']}")
                 print(f"  Created: {meta['timestamp']}")
+                print(f"  Format: {meta.get('format', 'sql')}")
+                if b.get('chain'):
+                    print(f"  Chain: {' <- '.join(name.split('.')[0] for name in b['chain'])}")
                 print(f"  Size: {meta['size'] / 1024 / 1024:.2f} MB")
                 print(f"  Tables: {', '.join(meta['tables'].keys())}")
                 if meta['note']:
@@ -448,6 +492,196 @@ class GameServerManager:
         except Exception as e:
             raise RuntimeError(f"Failed to list backups: {str(e)}")
 
+    def prune_backups(self, keep_chains):
+        """Delete old incremental backup chains and unreferenced chunks"""
+        self.print_status(f"Pruning backups (keeping {keep_chains} chains)...", end="")
+        
+        try:
+            from utils.backup import DatabaseBackup
+            from config import Config
+            
+            backup_dir = Config.DB_PATH.parent / 'backups'
+            backup = DatabaseBackup(Config.DB_PATH, backup_dir)
+            report = backup.prune_backups(keep_chains)
+            
+            self.print_status("", "OK")
+            print(f"\nRemoved {len(report['removed_backups'])} backups and "
+                  f"{report['removed_chunks']} chunks ({report['freed_bytes'] / 1024 / 1024:.2f} MB)")
+            
+        except Exception as e:
+            self.print_status("", "FAIL")
+            raise RuntimeError(f"Prune failed: {str(e)}")
+
+    def slow_query_report(self, limit=20):
+        """Summarize the slow-query log grouped by statement fingerprint"""
+        try:
+            sys.path.insert(0, str(self.backend_dir))
+            from config import Config
+            from utils.slow_query_log import load_entries, summarize, format_report
+            
+            log_path = getattr(Config, 'SLOW_QUERY_LOG_PATH', self.backend_dir / 'logs' / 'slow_queries.jsonl')
+            summaries = summarize(load_entries(log_path))
+            if not summaries:
+                print(f"\nNo slow queries recorded in {log_path}")
+                return
+            
+            # Compare plans against the indexes that actually exist
+            declared_indexes = {}
+            try:
+                from sqlalchemy import inspect
+                from utils.db_backends import get_backend
+                
+                inspector = inspect(get_backend(Config).create_engine())
+                for table in inspector.get_table_names():
+                    for index in inspector.get_indexes(table):
+                        declared_indexes[index['name']] = table
+            except Exception as e:
+                print(f"Warning: Could not read declared indexes: {e}")
+            
+            print(f"\nSlow queries ({len(summaries)} fingerprints, top {limit} by total time):\n")
+            print(format_report(summaries, declared_indexes, limit=limit))
+            
+        except Exception as e:
+            raise RuntimeError(f"Failed to build slow query report: {str(e)}")
+
+    def advise_indexes(self, max_indexes=10):
+        """Recommend indexes for the workload captured in the slow-query log"""
+        self.print_status("Evaluating candidate indexes...", end="")
+        
+        try:
+            sys.path.insert(0, str(self.backend_dir))
+            from config import Config
+            from utils.db_backends import get_backend
+            from utils.slow_query_log import load_entries, summarize
+            from utils.index_advisor import advise_indexes, format_advice
+            
+            backend = get_backend(Config)
+            if backend.name != 'sqlite':
+                self.print_status("", "WARN")
+                print("\nThe index advisor replays plans on a SQLite scratch copy; "
+                      "on PostgreSQL use --slow-query-report and EXPLAIN directly.")
+                return
+            
+            log_path = getattr(Config, 'SLOW_QUERY_LOG_PATH', self.backend_dir / 'logs' / 'slow_queries.jsonl')
+            summaries = summarize(load_entries(log_path))
+            if not summaries:
+                self.print_status("", "WARN")
+                print(f"\nNo captured queries in {log_path}. Run the server with "
+                      "SLOW_QUERY_THRESHOLD_MS=0 for a while to record a workload.")
+                return
+            
+            result = advise_indexes(backend.db_path, summaries, max_indexes=max_indexes)
+            self.print_status("", "OK")
+            print()
+            print(format_advice(result))
+            
+        except Exception as e:
+            self.print_status("", "FAIL")
+            raise RuntimeError(f"Index advice failed: {str(e)}")
+
+    def decode_flight_recording(self, path, game_id=None, event=None, last=None):
+        """Print the records of a flight recorder dump"""
+        try:
+            sys.path.insert(0, str(self.backend_dir))
+            from utils.flight_recorder import load_dump, filter_records, format_records
+            
+            header, records = load_dump(path)
+            print(format_records(header, filter_records(records, game_id=game_id, event=event, last=last)))
+            
+        except Exception as e:
+            raise RuntimeError(f"Failed to decode flight recording: {str(e)}")
+
+    def memory_report(self, url):
+        """Per-subsystem memory of a running server (uses ADMIN_TOKEN)"""
+        try:
+            sys.path.insert(0, str(self.backend_dir))
+            from config import Config
+            from utils.memory_accounting import fetch_report, format_report
+            
+            print(format_report(fetch_report(url, os.getenv('ADMIN_TOKEN') or getattr(Config, 'ADMIN_TOKEN', None))))
+            
+        except Exception as e:
+            raise RuntimeError(f"Failed to fetch memory report: {str(e)}")
+
+    def memory_diff(self, old_path, new_path=None, limit=20):
+        """Top allocation sites in a tracemalloc snapshot, or growth between two"""
+        try:
+            sys.path.insert(0, str(self.backend_dir))
+            import tracemalloc
+            from utils.memory_accounting import compare_snapshots, top_stats, format_stats
+            
+            old = tracemalloc.Snapshot.load(old_path)
+            if new_path:
+                rows = compare_snapshots(old, tracemalloc.Snapshot.load(new_path), limit=limit)
+            else:
+                rows = top_stats(old, limit=limit)
+            print(format_stats(rows))
+            
+        except Exception as e:
+            raise RuntimeError(f"Failed to read memory snapshots: {str(e)}")
+
+    def generate_dataset(self, users, races, seed=42, replay_fraction=0.02):
+        """Load a deterministic synthetic dataset for benchmarks"""
+        print(f"\nGenerating {users} users and {races} races (seed {seed})")
+        
+        try:
+            # The generator uses the models, so it runs inside the app
+            sys.path.insert(0, str(self.project_root))
+            from backend import create_app
+            from backend.models import db
+            from backend.utils.dataset_generator import generate_dataset
+            
+            app, _ = create_app()
+            with app.app_context():
+                db.create_all()
+                results = generate_dataset(
+                    users, races, seed=seed, replay_fraction=replay_fraction,
+                    progress=lambda message: print(f"  {message}")
+                )
+            
+            print("\nDataset generated:")
+            for table, stats in results.items():
+                if isinstance(stats, dict):
+                    print(f"  {table}: {stats['rows']} rows in {stats['seconds']}s")
+            print(f"  Total: {results['total_seconds']}s")
+            
+        except Exception as e:
+            raise RuntimeError(f"Dataset generation failed: {str(e)}")
+
+    def run_benchmarks(self, suite, scales=None, report=None):
+        """Run a benchmark suite and write its JSON results"""
+        print(f"\n=== Running {suite} benchmarks ===\n")
+        
+        try:
+            # Suites live in the backend package and run from the project root
+            argv = ['--report', str(Path(report).resolve())] if report else []
+            sys.path.insert(0, str(self.project_root))
+            os.chdir(self.project_root)
+            
+            if suite == 'http':
+                from backend.benchmarks import http_routes
+                if scales:
+                    argv += ['--scales', scales]
+                http_routes.main(argv)
+            elif suite == 'socket':
+                from backend.benchmarks import socket_paths
+                socket_paths.main(argv)
+            elif suite == 'physics':
+                from backend.benchmarks import physics
+                physics.main(argv)
+            elif suite in ('check', 'baseline'):
+                from backend.benchmarks import regression
+                argv += ['--update-baseline'] if suite == 'baseline' else []
+                if scales:
+                    argv += ['--http-scales', scales]
+                regressed = regression.main(argv)
+            
+        except Exception as e:
+            raise RuntimeError(f"Benchmarks failed: {str(e)}")
+        
+        if suite == 'check' and regressed:
+            raise RuntimeError("Performance regressions detected")
+
 def main():
     parser = argparse.ArgumentParser(description='Game Server Management Script')
     parser.add_argument('--no-debug', action='store_true', help='Run in production mode')
@@ -455,14 +689,62 @@ def main():
     parser.add_argument('--force-migrate', action='store_true', help='Force database migration')
     parser.add_argument('--optimize-db', action='store_true', 
                        help='Run database optimizations')
+    parser.add_argument('--full-vacuum', action='store_true',
+                       help='With --optimize-db, also run a blocking full VACUUM')
     parser.add_argument('--backup', action='store_true',
                        help='Create a database backup')
+    parser.add_argument('--backup-mode', choices=['pages', 'sql', 'incremental'], default='pages',
+                       help='Page-level online backup (default), SQL text dump, or '
+                            'incremental chunks on top of the previous backup')
+    parser.add_argument('--new-base', action='store_true',
+                       help='With --backup-mode incremental, start a new base backup')
     parser.add_argument('--backup-note',
                        help='Add a note to the backup')
     parser.add_argument('--restore',
                        help='Restore database from backup file')
+    parser.add_argument('--restore-at',
+                       help='Restore the latest backup taken at or before this ISO time')
     parser.add_argument('--list-backups', action='store_true',
                        help='List available backups')
+    parser.add_argument('--prune-backups', type=int, metavar='CHAINS',
+                       help='Keep only the newest CHAINS incremental backup chains and '
+                            'delete chunks nothing refers to')
+    parser.add_argument('--slow-query-report', action='store_true',
+                       help='Summarize the slow-query log by fingerprint')
+    parser.add_argument('--advise-indexes', action='store_true',
+                       help='Recommend indexes for the captured query workload')
+    parser.add_argument('--report-limit', type=int, default=20,
+                       help='Number of fingerprints to show in reports')
+    parser.add_argument('--decode-flight-recording', metavar='PATH',
+                       help='Print a flight recorder dump')
+    parser.add_argument('--flight-game', type=int,
+                       help='With --decode-flight-recording, only this game id')
+    parser.add_argument('--flight-event',
+                       help='With --decode-flight-recording, only this event type')
+    parser.add_argument('--flight-last', type=int,
+                       help='With --decode-flight-recording, only the last N records')
+    parser.add_argument('--memory-report', metavar='URL',
+                       help='Per-subsystem memory of a running server, e.g. http://localhost:5000')
+    parser.add_argument('--memory-diff', nargs='+', metavar='SNAPSHOT',
+                       help='Top allocation sites in a tracemalloc snapshot, or the growth '
+                            'between two (OLD NEW)')
+    parser.add_argument('--generate-dataset', action='store_true',
+                       help='Load a deterministic synthetic dataset')
+    parser.add_argument('--users', type=int, default=10000,
+                       help='Users to generate with --generate-dataset')
+    parser.add_argument('--races', type=int, default=200000,
+                       help='Race results to generate with --generate-dataset')
+    parser.add_argument('--seed', type=int, default=42,
+                       help='Random seed for --generate-dataset')
+    parser.add_argument('--replay-fraction', type=float, default=0.02,
+                       help='Fraction of generated races that carry replay data')
+    parser.add_argument('--bench', choices=['http', 'socket', 'physics', 'check', 'baseline'],
+                       help='Run a benchmark suite, check for regressions against '
+                            'the stored baselines, or record new baselines')
+    parser.add_argument('--bench-scales',
+                       help='Comma-separated user counts for --bench http')
+    parser.add_argument('--bench-report',
+                       help='Output path for benchmark results')
     args = parser.parse_args()
 
     try:
@@ -472,11 +754,29 @@ def main():
             manager.state['needs_migration'] = True
         
         if args.backup:
-            manager.backup_database(args.backup_note)
-        elif args.restore:
-            manager.restore_database(args.restore)
+            manager.backup_database(args.backup_note, args.backup_mode, args.new_base)
+        elif args.restore or args.restore_at:
+            manager.restore_database(args.restore, args.restore_at)
         elif args.list_backups:
             manager.list_backups()
+        elif args.prune_backups:
+            manager.prune_backups(args.prune_backups)
+        elif args.slow_query_report:
+            manager.slow_query_report(args.report_limit)
+        elif args.advise_indexes:
+            manager.advise_indexes()
+        elif args.decode_flight_recording:
+            manager.decode_flight_recording(args.decode_flight_recording, args.flight_game,
+                                            args.flight_event, args.flight_last)
+        elif args.memory_report:
+            manager.memory_report(args.memory_report)
+        elif args.memory_diff:
+            manager.memory_diff(args.memory_diff[0], args.memory_diff[1] if len(args.memory_diff) > 1 else None,
+                                args.report_limit)
+        elif args.generate_dataset:
+            manager.generate_dataset(args.users, args.races, args.seed, args.replay_fraction)
+        elif args.bench:
+            manager.run_benchmarks(args.bench, args.bench_scales, args.bench_report)
         elif args.check_only:
             print("\n=== Running System Checks ===\n")
             manager.check_python_version()
@@ -487,7 +787,7 @@ def main():
             manager.print_success("All checks passed successfully!")
         else:
             if args.optimize_db:
-                manager.optimize_database()
+                manager.optimize_database(full_vacuum=args.full_vacuum)
             manager.setup_and_run(debug=not args.no_debug)
             
     except Exception as e:
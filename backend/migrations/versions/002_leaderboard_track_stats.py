@@ -0,0 +1,42 @@
+"""Per-track leaderboard stats
+
+Revision ID: 002
+Revises: 001
+Create Date: 2024-03-04 12:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers
+revision = '002'
+down_revision = '001'
+
+def _new_columns():
+    return [
+        sa.Column('total_races', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('wins', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('last_updated', sa.DateTime(), server_default=sa.text('CURRENT_TIMESTAMP')),
+    ]
+
+def _existing(table):
+    inspector = sa.inspect(op.get_bind())
+    columns = {column['name'] for column in inspector.get_columns(table)}
+    indexes = {index['name'] for index in inspector.get_indexes(table)}
+    return columns, indexes
+
+def upgrade():
+    # Databases built by create_all before these columns existed lack them;
+    # ones built from 001 already have some, so only add what is missing
+    columns, indexes = _existing('leaderboards')
+    with op.batch_alter_table('leaderboards') as batch_op:
+        for column in _new_columns():
+            if column.name not in columns:
+                batch_op.add_column(column)
+    if 'idx_leaderboard_track_time' not in indexes:
+        op.create_index('idx_leaderboard_track_time', 'leaderboards', ['track_id', 'best_time'])
+
+def downgrade():
+    # The columns stay: 001 already defines them
+    _, indexes = _existing('leaderboards')
+    if 'idx_leaderboard_track_time' in indexes:
+        op.drop_index('idx_leaderboard_track_time', table_name='leaderboards')
@@ -1,5 +1,6 @@
 from datetime import datetime
 from backend import db
+from backend.utils.db_backends import JSONType
 
 class Course(db.Model):
     __tablename__ = 'courses'
@@ -10,15 +11,15 @@ class Course(db.Model):
     difficulty = db.Column(db.String(20), nullable=False)
     
     # Course data
-    checkpoints = db.Column(db.JSON)  # [{x: float, y: float}, ...]
-    gravity_wells = db.Column(db.JSON)  # [{x: float, y: float, strength: float}, ...]
-    obstacles = db.Column(db.JSON)  # [{type: str, x: float, y: float, ...}, ...]
+    checkpoints = db.Column(JSONType)  # [{x: float, y: float}, ...]
+    gravity_wells = db.Column(JSONType)  # [{x: float, y: float, strength: float}, ...]
+    obstacles = db.Column(JSONType)  # [{type: str, x: float, y: float, ...}, ...]
     
     # Course properties
     length = db.Column(db.Float)
     par_time = db.Column(db.Float, nullable=False)
     required_rating = db.Column(db.Integer, default=0)
-    required_courses = db.Column(db.JSON)  # [course_id, ...]
+    required_courses = db.Column(JSONType)  # [course_id, ...]
     
     # Assets
     background_key = db.Column(db.String(50))
@@ -1,5 +1,6 @@
 from datetime import datetime
 from backend import db
+from backend.utils.db_backends import JSONType
 
 class CourseRecord(db.Model):
     __tablename__ = 'course_records'
@@ -10,7 +11,7 @@ class CourseRecord(db.Model):
     ship_id = db.Column(db.Integer, db.ForeignKey('ships.id'), nullable=False)
     best_time = db.Column(db.Float, nullable=False)
     date_achieved = db.Column(db.DateTime, default=datetime.utcnow)
-    replay_data = db.Column(db.JSON)
+    replay_data = db.Column(JSONType)
     
     # Relationships
     user = db.relationship('User', back_populates='course_records')
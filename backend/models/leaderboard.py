@@ -1,5 +1,6 @@
 from datetime import datetime
 from backend import db
+from backend.utils.db_backends import JSONType
 
 class Leaderboard(db.Model):
     __tablename__ = 'leaderboards'
@@ -10,7 +11,12 @@ class Leaderboard(db.Model):
     best_time = db.Column(db.Float)
     ship_id = db.Column(db.Integer, db.ForeignKey('ships.id'), nullable=False)
     date_achieved = db.Column(db.DateTime, default=datetime.utcnow)
-    replay_data = db.Column(db.JSON)
+    replay_data = db.Column(JSONType)
+    
+    # Per-track stats, maintained by TrackLeaderboards
+    total_races = db.Column(db.Integer, default=0, nullable=False)
+    wins = db.Column(db.Integer, default=0, nullable=False)
+    last_updated = db.Column(db.DateTime, default=datetime.utcnow)
     
     # Relationships
     user = db.relationship('User', back_populates='leaderboard_entries')
@@ -21,24 +27,34 @@ class Leaderboard(db.Model):
         db.UniqueConstraint('user_id', 'track_id', name='unique_user_track'),
         db.Index('idx_leaderboard_track', 'track_id'),
         db.Index('idx_leaderboard_user', 'user_id'),
+        db.Index('idx_leaderboard_track_time', 'track_id', 'best_time'),
         {'extend_existing': True}
     )
 
     def __repr__(self):
         return f'<Leaderboard {self.id} (User: {self.user_id}, Track: {self.track_id})>'
 
-    def update_stats(self, race_result):
-        self.total_races += 1
-        if race_result.position == 1:
-            self.wins += 1
+    def update_stats(self, ship_id, finish_time, position, replay_data=None):
+        """Fold one race result into this entry.
+
+        Returns True if the result set a new personal best.
+        """
+        now = datetime.utcnow()
+        self.total_races = (self.total_races or 0) + 1
+        if position == 1:
+            self.wins = (self.wins or 0) + 1
+        self.last_updated = now
         
         # Update best time if applicable
-        course_id = str(race_result.course_id)
-        if course_id not in self.best_times or race_result.finish_time < self.best_times[course_id]:
-            self.best_times[course_id] = race_result.finish_time
-        
-        self.last_updated = datetime.utcnow()
-
+        if finish_time is None:
+            return False
+        if self.best_time is None or finish_time < self.best_time:
+            self.best_time = finish_time
+            self.ship_id = ship_id
+            self.date_achieved = now
+            self.replay_data = replay_data
+            return True
+        return False
 
 # Move CourseRecord to its own file
 # backend/models/course_record.py is now the source of truth for this model 
\ No newline at end of file
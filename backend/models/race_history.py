@@ -1,5 +1,6 @@
 from datetime import datetime
 from backend import db
+from backend.utils.db_backends import JSONType
 
 class RaceHistory(db.Model):
     __tablename__ = 'race_history'
@@ -14,7 +15,7 @@ class RaceHistory(db.Model):
     date = db.Column(db.DateTime, default=datetime.utcnow)
     rating_change = db.Column(db.Integer)
     experience_gained = db.Column(db.Integer)
-    replay_data = db.Column(db.JSON)
+    replay_data = db.Column(JSONType)
     
     # Relationships
     user = db.relationship('User', back_populates='race_history')
@@ -1,5 +1,6 @@
 from datetime import datetime
 from backend import db
+from backend.utils.db_backends import JSONType
 
 class Ship(db.Model):
     __tablename__ = 'ships'
@@ -31,8 +32,8 @@ class Ship(db.Model):
     course_records = db.relationship('CourseRecord', back_populates='ship')
     
     # Asset info
-    engine_position = db.Column(db.JSON)  # {x: float, y: float}
-    collision_bounds = db.Column(db.JSON)  # {width: float, height: float}
+    engine_position = db.Column(JSONType)  # {x: float, y: float}
+    collision_bounds = db.Column(JSONType)  # {width: float, height: float}
     
     __table_args__ = (
         db.Index('idx_ship_rating', 'required_rating'),
@@ -29,6 +29,7 @@ try:
     auth = debug_import('.auth', 'backend.routes')
     game = debug_import('.game', 'backend.routes')
     api = debug_import('.api', 'backend.routes')
+    admin = debug_import('.admin', 'backend.routes')
     
     print("\nDebug: Getting blueprint objects")
     # Get the blueprints
@@ -41,6 +42,9 @@ try:
     api_bp = getattr(api, 'bp', None)
     if api_bp is None:
         print(f"Warning: 'bp' not found in api module. Available attributes: {dir(api)}")
+    admin_bp = getattr(admin, 'bp', None)
+    if admin_bp is None:
+        print(f"Warning: 'bp' not found in admin module. Available attributes: {dir(admin)}")
     
     print("\nDebug: Blueprint imports complete")
     
@@ -51,4 +55,4 @@ except ImportError as e:
     raise
 
 # Export the blueprint names
-__all__ = ['auth_bp', 'game_bp', 'api_bp']
+__all__ = ['auth_bp', 'game_bp', 'api_bp', 'admin_bp']
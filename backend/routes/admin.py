@@ -0,0 +1,229 @@
+import os
+from functools import wraps
+from hmac import compare_digest
+from flask import Blueprint, jsonify, request, current_app
+from flask_login import current_user
+from backend.utils.query_stats import query_stats
+from backend.utils.db_maintenance import db_maintenance
+from backend.utils.flight_recorder import flight_recorder
+from backend.utils.handler_profiler import handler_profiler
+from backend.utils.memory_accounting import (
+    compare_snapshots, memory_tracker, process_memory, subsystem_report, top_stats
+)
+
+bp = Blueprint('admin', __name__, url_prefix='/admin')
+
+
+def is_admin():
+    """Token holders and users listed in ADMIN_USERNAMES are admins"""
+    token = current_app.config.get('ADMIN_TOKEN')
+    supplied = request.headers.get('X-Admin-Token')
+    if token and supplied and compare_digest(token, supplied):
+        return True
+    return (
+        current_user.is_authenticated
+        and current_user.username in current_app.config.get('ADMIN_USERNAMES', ())
+    )
+
+
+def admin_required(f):
+    @wraps(f)
+    def wrapper(*args, **kwargs):
+        if not is_admin():
+            return jsonify({'error': 'Forbidden'}), 403
+        return f(*args, **kwargs)
+    return wrapper
+
+
+@bp.route('/query-stats')
+@admin_required
+def get_query_stats():
+    """Rolling per-endpoint and per-socket-event SQL statistics"""
+    return jsonify(query_stats.snapshot())
+
+
+@bp.route('/query-stats/reset', methods=['POST'])
+@admin_required
+def reset_query_stats():
+    query_stats.reset()
+    return jsonify({'status': 'reset'})
+
+
+@bp.route('/db-maintenance')
+@admin_required
+def get_db_maintenance():
+    """WAL size, checkpoint lag and the last maintenance pass"""
+    if db_maintenance.db_path is None:
+        return jsonify({'error': 'Maintenance is not enabled for this backend'}), 404
+    return jsonify(db_maintenance.snapshot())
+
+
+@bp.route('/db-maintenance/run', methods=['POST'])
+@admin_required
+def run_db_maintenance():
+    if db_maintenance.db_path is None:
+        return jsonify({'error': 'Maintenance is not enabled for this backend'}), 404
+    report = db_maintenance.run(force=request.args.get('force') == '1')
+    if report is None:
+        return jsonify({'error': 'Maintenance pass already running'}), 409
+    return jsonify(report)
+
+
+@bp.route('/handler-stats')
+@admin_required
+def get_handler_stats():
+    """Wall and CPU time per Socket.IO event, plus profile capture status"""
+    return jsonify(handler_profiler.snapshot())
+
+
+@bp.route('/handler-stats/reset', methods=['POST'])
+@admin_required
+def reset_handler_stats():
+    handler_profiler.reset()
+    return jsonify({'status': 'reset'})
+
+
+@bp.route('/profile', methods=['POST'])
+@admin_required
+def start_profile():
+    """Profile the next N calls of an event, or N seconds of a server loop.
+
+    Body: {"event": "race_finished", "invocations": 20}
+       or {"loop": "lobby_broadcast", "seconds": 10}
+    """
+    data = request.get_json(silent=True) or {}
+    max_invocations = current_app.config.get('HANDLER_PROFILE_MAX_INVOCATIONS', 1000)
+    max_seconds = current_app.config.get('HANDLER_PROFILE_MAX_SECONDS', 300)
+    try:
+        if data.get('event'):
+            target, kind = data['event'], 'event'
+            invocations = int(data.get('invocations', 10))
+            seconds = None
+        elif data.get('loop'):
+            target, kind = data['loop'], 'loop'
+            invocations = None
+            seconds = float(data.get('seconds', 10))
+        else:
+            return jsonify({'error': 'Give an event or a loop to profile'}), 400
+    except (TypeError, ValueError):
+        return jsonify({'error': 'invocations and seconds must be numbers'}), 400
+    if (invocations is not None and not 0 < invocations <= max_invocations) or \
+            (seconds is not None and not 0 < seconds <= max_seconds):
+        return jsonify({'error': f'Limit is {max_invocations} invocations or {max_seconds} seconds'}), 400
+
+    capture = handler_profiler.start_capture(target, kind, invocations, seconds)
+    if capture is None:
+        return jsonify({'error': 'A profile capture is already running'}), 409
+    return jsonify(capture.status()), 202
+
+
+@bp.route('/profile', methods=['GET'])
+@admin_required
+def get_profile():
+    capture = handler_profiler.capture or handler_profiler.last_capture
+    if capture is None:
+        return jsonify({'error': 'No profile captured yet'}), 404
+    return jsonify(capture.status())
+
+
+@bp.route('/profile/stop', methods=['POST'])
+@admin_required
+def stop_profile():
+    """Finish the running capture early and write what it has"""
+    capture = handler_profiler.finish_capture()
+    if capture is None:
+        return jsonify({'error': 'No profile capture is running'}), 404
+    return jsonify(capture.status())
+
+
+@bp.route('/flight-recorder')
+@admin_required
+def get_flight_recorder():
+    """Ring buffer fill and the dumps this worker has written"""
+    return jsonify(flight_recorder.status())
+
+
+@bp.route('/flight-recorder/dump', methods=['POST'])
+@admin_required
+def dump_flight_recorder():
+    path = flight_recorder.dump('manual')
+    if path is None:
+        return jsonify({'error': 'Could not write the flight recording'}), 500
+    return jsonify({'path': path})
+
+
+@bp.route('/memory')
+@admin_required
+def get_memory():
+    """Approximate size of each long-lived structure in this worker"""
+    return jsonify({
+        'pid': os.getpid(),
+        'process': process_memory(),
+        'subsystems': subsystem_report(),
+        'tracemalloc': memory_tracker.status(),
+    })
+
+
+@bp.route('/memory/tracing', methods=['POST'])
+@admin_required
+def start_memory_tracing():
+    data = request.get_json(silent=True) or {}
+    memory_tracker.start(int(data['frames']) if data.get('frames') else None)
+    return jsonify(memory_tracker.status())
+
+
+@bp.route('/memory/tracing/stop', methods=['POST'])
+@admin_required
+def stop_memory_tracing():
+    memory_tracker.stop()
+    return jsonify(memory_tracker.status())
+
+
+@bp.route('/memory/snapshots', methods=['GET'])
+@admin_required
+def list_memory_snapshots():
+    return jsonify(memory_tracker.list_snapshots())
+
+
+@bp.route('/memory/snapshots', methods=['POST'])
+@admin_required
+def take_memory_snapshot():
+    data = request.get_json(silent=True) or {}
+    snapshot = memory_tracker.take_snapshot(data.get('label'))
+    if snapshot is None:
+        return jsonify({'error': 'tracemalloc is not tracing; POST /admin/memory/tracing first'}), 409
+    return jsonify(snapshot), 201
+
+
+def _stats_options():
+    group_by = request.args.get('group_by', 'lineno')
+    if group_by not in ('lineno', 'filename', 'traceback'):
+        return None, None
+    return group_by, request.args.get('limit', 25, type=int)
+
+
+@bp.route('/memory/snapshots/<int:snapshot_id>/top')
+@admin_required
+def memory_snapshot_top(snapshot_id):
+    """Largest allocation sites in one snapshot"""
+    snapshot = memory_tracker.get(snapshot_id)
+    if snapshot is None:
+        return jsonify({'error': 'Unknown snapshot'}), 404
+    group_by, limit = _stats_options()
+    if group_by is None:
+        return jsonify({'error': 'group_by must be lineno, filename or traceback'}), 400
+    return jsonify(top_stats(snapshot, group_by, limit))
+
+
+@bp.route('/memory/diff')
+@admin_required
+def memory_diff():
+    """Allocation sites that grew between two snapshots (?from=1&to=2)"""
+    old = memory_tracker.get(request.args.get('from', type=int))
+    new = memory_tracker.get(request.args.get('to', type=int))
+    if old is None or new is None:
+        return jsonify({'error': 'Unknown snapshot'}), 404
+    group_by, limit = _stats_options()
+    if group_by is None:
+        return jsonify({'error': 'group_by must be lineno, filename or traceback'}), 400
+    return jsonify(compare_snapshots(old, new, group_by, limit))
@@ -4,8 +4,10 @@ from datetime import datetime
 from backend.app import db
 from backend.models.game_session import GameSession
 from backend.models.game import Game
-from backend.models.leaderboard import Leaderboard
 from backend.game.matchmaking import MatchmakingQueue
+from backend.game.track_leaderboards import track_leaderboards
+from backend.game.lobby_directory import lobby_directory
+from backend.utils.db_routing import read_only
 import os
 from werkzeug.utils import secure_filename
 import time
@@ -20,7 +22,7 @@ def create_game():
     data = request.get_json()
     
     # Create game first
-    game = GameSession(
+    game = Game(
         track_id=data['courseId'],
         status='waiting',
         max_players=data.get('maxPlayers', 8)
@@ -37,6 +39,7 @@ def create_game():
     )
     db.session.add(session)
     db.session.commit()
+    lobby_directory.touch(game.id)
     
     return jsonify(session.to_dict())
 
@@ -44,7 +47,7 @@ def create_game():
 @login_required
 def join_game(game_id):
     data = request.get_json()
-    game = GameSession.query.get_or_404(game_id)
+    game = Game.query.get_or_404(game_id)
     
     if game.status != 'waiting':
         return jsonify({'error': 'Game already in progress'}), 400
@@ -56,6 +59,7 @@ def join_game(game_id):
     )
     db.session.add(session)
     db.session.commit()
+    lobby_directory.touch(game_id)
     
     return jsonify(session.to_dict())
 
@@ -81,47 +85,47 @@ def cancel_matchmaking():
 
 # Lobby Management
 @bp.route('/lobbies', methods=['GET'])
+@read_only
 @login_required
 def list_lobbies():
-    games = Game.query.filter_by(
-        status='waiting'
-    ).all()
-    return jsonify([{
-        'id': game.id,
-        'track_id': game.track_id,
-        'status': game.status,
-        'player_count': len(game.sessions),
-        'max_players': game.max_players,
-        'created_at': game.created_at.isoformat(),
-        'players': [{
-            'user_id': session.user_id,
-            'username': session.user.username,
-            'ship_id': session.ship_id,
-            'is_ready': session.is_ready
-        } for session in game.sessions]
-    } for game in games])
+    """List open lobbies from the in-memory lobby directory.
+
+    Supports ``track_id``, ``min_free_slots``, ``page`` and ``per_page``
+    filters; responses carry an ETag derived from the directory version.
+    """
+    track_id = request.args.get('track_id', type=int)
+    min_free_slots = request.args.get('min_free_slots', 0, type=int)
+    page = request.args.get('page', 1, type=int)
+    per_page = request.args.get('per_page', type=int)
+    
+    if track_id is None and not min_free_slots and not per_page:
+        # Unfiltered listing is served pre-serialized
+        version, body = lobby_directory.serialized()
+        response = current_app.response_class(body, mimetype='application/json')
+        response.headers['X-Lobby-Version'] = str(version)
+        response.set_etag(f'lobbies-{version}')
+        return response.make_conditional(request)
+    
+    per_page = min(per_page, 100) if per_page else None
+    version, total, lobbies = lobby_directory.query(
+        track_id=track_id,
+        min_free_slots=min_free_slots,
+        page=page,
+        per_page=per_page
+    )
+    response = jsonify(lobbies)
+    response.headers['X-Total-Count'] = str(total)
+    response.headers['X-Lobby-Version'] = str(version)
+    response.set_etag(f'lobbies-{version}-{track_id}-{min_free_slots}-{page}-{per_page}')
+    return response.make_conditional(request)
 
 # Time Trials
 @bp.route('/timetrials/records', methods=['GET'])
+@read_only
 @login_required
 def time_trial_records():
-    track_id = request.args.get('track_id')
-    query = GameSession.query.join(Game).filter(
-        Game.status == 'completed'
-    ).order_by(GameSession.finish_time)
-    
-    if track_id:
-        query = query.filter(Game.track_id == track_id)
-    
-    records = query.limit(10).all()
-    return jsonify([{
-        'user_id': record.user_id,
-        'username': record.user.username,
-        'finish_time': record.finish_time,
-        'ship_id': record.ship_id,
-        'track_id': record.game.track_id,
-        'date': record.game.end_time.isoformat()
-    } for record in records])
+    track_id = request.args.get('track_id', type=int)
+    return jsonify(track_leaderboards.top(track_id))
 
 # Game Progress Updates
 @bp.route('/game/<int:game_id>/ready', methods=['POST'])
@@ -136,40 +140,70 @@ def player_ready(game_id):
     db.session.commit()
     
     # Check if all players are ready
-    game = GameSession.query.get(game_id)
+    game = Game.query.get(game_id)
     all_ready = all(s.is_ready for s in game.sessions)
     
     if all_ready:
         game.status = 'in_progress'
         game.start_time = datetime.utcnow()
         db.session.commit()
+    lobby_directory.touch(game_id)
     
     return jsonify(session.to_dict())
 
+def _place_finisher(game, session):
+    """Derive a finisher's position from the recorded finish times.
+
+    Results can arrive out of order, so slower finishers already placed
+    move down one place (and a displaced winner loses the win).
+    """
+    finished = [s for s in game.sessions
+                if s.id != session.id and s.finish_time is not None and s.position]
+    session.position = 1 + sum(1 for s in finished if s.finish_time <= session.finish_time)
+    for other in finished:
+        if other.finish_time > session.finish_time:
+            if other.position == 1:
+                track_leaderboards.revoke_win(game, other)
+            other.position += 1
+
 @bp.route('/game/<int:session_id>/finish', methods=['POST'])
 @login_required
 def finish_race(session_id):
     data = request.get_json()
-    session = GameSession.query.get(session_id)
-    if session:
-        session.completion_time = data['completionTime']
-        session.fuel_remaining = data['fuelRemaining']
-        session.position = data['position']
-        
-        if all(s.position for s in session.sessions):
-            session.status = 'completed'
-            session.completed_at = datetime.utcnow()
-            
-            # Update leaderboard
-            leaderboard = Leaderboard.query.filter_by(user_id=current_user.id).first()
-            if leaderboard:
-                leaderboard.total_races += 1
-                if session.position == 1:
-                    leaderboard.wins += 1
-                if not leaderboard.best_time or session.completion_time < leaderboard.best_time:
-                    leaderboard.best_time = session.completion_time
-        
-        db.session.commit()
+    session = GameSession.query.get_or_404(session_id)
+    if session.user_id != current_user.id:
+        return jsonify({'error': 'Not your session'}), 403
+    
+    try:
+        completion_time = float(data['completionTime'])
+    except (KeyError, TypeError, ValueError):
+        return jsonify({'error': 'Invalid completion time'}), 400
+    if completion_time <= 0:
+        return jsonify({'error': 'Invalid completion time'}), 400
+    
+    game = session.game
+    if game.end_time is not None:
+        return jsonify({'error': 'Race already completed'}), 409
+    
+    # Claim the result with a conditional update so a retried or
+    # concurrent submission cannot count the same race twice
+    claimed = GameSession.query.filter(
+        GameSession.id == session.id,
+        GameSession.finish_time.is_(None)
+    ).update({'finish_time': completion_time}, synchronize_session='fetch')
+    if not claimed:
+        db.session.rollback()
+        return jsonify({'error': 'Result already recorded'}), 409
+    _place_finisher(game, session)
+    
+    # Update leaderboard in the same transaction as the result
+    track_leaderboards.record_result(game, session, data.get('replayData'))
+    
+    if all(s.position for s in game.sessions):
+        game.status = 'completed'
+        game.end_time = datetime.utcnow()
+    
+    db.session.commit()
     return jsonify(session.to_dict())
 
 @bp.route('/upload/gif', methods=['POST'])
@@ -2,6 +2,7 @@ from flask import Blueprint, request, jsonify, render_template, redirect, url_fo
 from flask_login import login_user, logout_user, login_required, current_user
 from backend.models.user import User
 from backend import db
+from backend.game.rank_index import rank_index
 from werkzeug.security import generate_password_hash
 
 print("\nDebug: Creating auth blueprint")
@@ -45,6 +46,7 @@ def register():
     try:
         db.session.add(user)
         db.session.commit()
+        rank_index.update(user.id, user.rating)
         return jsonify({'message': 'User created successfully'})
     except Exception as e:
         db.session.rollback()
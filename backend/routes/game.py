@@ -1,9 +1,9 @@
-from flask import Blueprint, render_template, jsonify, request
+from flask import Blueprint, render_template, jsonify, request, current_app
 from flask_login import login_required, current_user
-from backend.models.ship import Ship
-from backend.models.course import Course
-from backend.models.leaderboard import Leaderboard
 from backend.game.matchmaking import GameConfig, matchmaking_queue
+from backend.game.rank_index import rank_index
+from backend.game.catalog import catalog
+from backend.utils.db_routing import read_only
 from backend.models import db
 from backend.models.user import User
 import uuid
@@ -17,72 +17,24 @@ def index():
     return render_template('index.html')
 
 @bp.route('/menu')
+@read_only
 @login_required
 def menu():
     """Game menu"""
-    try:
-        global_ranking = db.session.query(User).filter(
-            User.rating > current_user.rating
-        ).count() + 1
-    except Exception:
-        global_ranking = 0
+    global_ranking = rank_index.rank_of(current_user.id) if rank_index.loaded else None
+    if global_ranking is None:
+        # Index not loaded yet (or user missing from it): rank with SQL
+        try:
+            global_ranking = db.session.query(User).filter(
+                User.rating > current_user.rating
+            ).count() + 1
+            rank_index.update(current_user.id, current_user.rating)
+        except Exception:
+            global_ranking = 0
     
     # Get available ships
     try:
-        ships = Ship.query.all()
-        if not ships:  # If no ships exist, create default ones
-            ships = [
-                Ship(
-                    name="Starfighter",
-                    description="Balanced starter ship with good all-round capabilities",
-                    sprite_key="starfighter.png",
-                    max_speed=60,
-                    acceleration=55,
-                    handling=65,
-                    shield_strength=50,
-                    energy_capacity=50,
-                    required_rating=0
-                ),
-                Ship(
-                    name="Interceptor",
-                    description="Fast but fragile ship designed for experienced pilots",
-                    sprite_key="interceptor.png",
-                    max_speed=80,
-                    acceleration=70,
-                    handling=75,
-                    shield_strength=30,
-                    energy_capacity=40,
-                    required_rating=1200
-                ),
-                Ship(
-                    name="Juggernaut",
-                    description="Heavy ship with strong shields but poor maneuverability",
-                    sprite_key="juggernaut.png",
-                    max_speed=40,
-                    acceleration=35,
-                    handling=30,
-                    shield_strength=85,
-                    energy_capacity=70,
-                    required_rating=1500
-                ),
-                Ship(
-                    name="Default Ship",
-                    description="Basic starter ship",
-                    sprite_key="default_ship.png",
-                    max_speed=50,
-                    acceleration=50,
-                    handling=50,
-                    shield_strength=50,
-                    energy_capacity=50,
-                    required_rating=0
-                )
-            ]
-            for ship in ships:
-                db.session.add(ship)
-            db.session.commit()
-        
-        ships = [ship.to_dict() for ship in ships]
-        
+        ships = catalog.ships_for(current_user.rating or 0, current_user.wins or 0)
     except Exception as e:
         print(f"Error loading ships: {e}")
         ships = [{
@@ -106,17 +58,79 @@ def menu():
                          global_ranking=global_ranking,
                          ships=ships)
 
+def _top_entries(limit):
+    """Top players from the rank index, or from SQL until it has loaded"""
+    if rank_index.loaded:
+        return rank_index.top(limit)
+    rows = db.session.query(User.id, User.rating).order_by(
+        User.rating.desc(), User.id
+    ).limit(limit).all()
+    entries = []
+    for i, (user_id, rating) in enumerate(rows):
+        # Players sharing a rating share a rank, as in the index
+        rank = entries[-1][0] if entries and entries[-1][2] == rating else i + 1
+        entries.append((rank, user_id, rating))
+    return entries
+
 @bp.route('/leaderboard')
+@read_only
 def leaderboard():
     """Global leaderboard"""
-    leaderboard_entries = Leaderboard.query.order_by(
-        Leaderboard.rating.desc()
-    ).limit(100).all()
+    top_entries = _top_entries(100)
+    
+    # Resolve usernames for just the listed players
+    user_ids = [user_id for _, user_id, _ in top_entries]
+    usernames = dict(
+        db.session.query(User.id, User.username).filter(User.id.in_(user_ids))
+    ) if user_ids else {}
+    
+    leaderboard_entries = [{
+        'rank': rank,
+        'user_id': user_id,
+        'username': usernames.get(user_id),
+        'rating': rating
+    } for rank, user_id, rating in top_entries]
     
     return render_template('game/leaderboard.html',
                          entries=leaderboard_entries)
 
+@bp.route('/api/leaderboard')
+@read_only
+@login_required
+def get_leaderboard():
+    """Get a slice of the global rating leaderboard.
+
+    Defaults to the top players; ``?rank=R`` centres the slice on a rank and
+    ``?around=me`` centres it on the current user.
+    """
+    limit = min(request.args.get('limit', 20, type=int), 100)
+    radius = min(request.args.get('radius', 5, type=int), 50)
+    
+    around = request.args.get('around') == 'me' or request.args.get('rank', type=int)
+    if around and not rank_index.loaded:
+        return jsonify({'error': 'Leaderboard is still loading'}), 503
+    
+    if request.args.get('around') == 'me':
+        entries = rank_index.around_user(current_user.id, radius)
+    elif request.args.get('rank', type=int):
+        entries = rank_index.around_rank(request.args.get('rank', type=int), radius)
+    else:
+        entries = _top_entries(limit)
+    
+    user_ids = [user_id for _, user_id, _ in entries]
+    usernames = dict(
+        db.session.query(User.id, User.username).filter(User.id.in_(user_ids))
+    ) if user_ids else {}
+    
+    return jsonify([{
+        'rank': rank,
+        'user_id': user_id,
+        'username': usernames.get(user_id),
+        'rating': rating
+    } for rank, user_id, rating in entries])
+
 @bp.route('/play')
+@read_only
 @login_required
 def play():
     """Main game view"""
@@ -124,65 +138,34 @@ def play():
     ship_id = request.args.get('ship_id')
     
     # Get selected ship or default
-    if ship_id:
-        ship = Ship.query.get(ship_id)
-    else:
-        ship = Ship.query.filter_by(required_rating=0).first()
-    
-    # Convert ship to dict for template
-    ship_data = ship.to_dict() if ship else None
+    ship_data = catalog.get_ship(ship_id) if ship_id else catalog.default_ship()
     
     return render_template('game/play.html',
                          user=current_user,
                          ship=ship_data,
                          game_mode=game_mode)
 
+def _catalog_response(etag, body):
+    """JSON response for a pre-serialized catalog body, honouring If-None-Match"""
+    response = current_app.response_class(body, mimetype='application/json')
+    response.set_etag(etag)
+    return response.make_conditional(request)
+
 @bp.route('/api/ships')
+@read_only
 @login_required
 def get_ships():
     """Get available ships for current user"""
-    ships = Ship.query.all()
-    available_ships = []
-    
-    for ship in ships:
-        if (current_user.rating >= ship.required_rating and 
-            current_user.wins >= ship.required_wins):
-            available_ships.append({
-                'id': ship.id,
-                'name': ship.name,
-                'description': ship.description,
-                'required_rating': ship.required_rating,
-                'stats': {
-                    'acceleration': ship.acceleration,
-                    'max_speed': ship.max_speed,
-                    'handling': ship.handling,
-                    'shield_strength': ship.shield_strength,
-                    'energy_capacity': ship.energy_capacity
-                },
-                'sprite_key': ship.sprite_key
-            })
-    
-    return jsonify(available_ships)
+    etag, body = catalog.unlocked_ships(current_user.rating or 0, current_user.wins or 0)
+    return _catalog_response(etag, body)
 
 @bp.route('/api/courses')
+@read_only
 @login_required
 def get_courses():
     """Get available courses for current user"""
-    courses = Course.query.all()
-    available_courses = []
-    
-    for course in courses:
-        if current_user.rating >= course.required_rating:
-            available_courses.append({
-                'id': course.id,
-                'name': course.name,
-                'description': course.description,
-                'difficulty': course.difficulty,
-                'par_time': course.par_time,
-                'thumbnail_key': course.thumbnail_key
-            })
-    
-    return jsonify(available_courses)
+    etag, body = catalog.unlocked_courses(current_user.rating or 0)
+    return _catalog_response(etag, body)
 
 @bp.route('/api/matchmaking/join', methods=['POST'])
 @login_required
@@ -202,6 +185,7 @@ def join_matchmaking():
     return jsonify({'status': 'queued'})
 
 @bp.route('/api/matchmaking/status')
+@read_only
 @login_required
 def matchmaking_status():
     """Get current matchmaking status"""
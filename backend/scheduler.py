@@ -1,3 +1,4 @@
+from flask import g
 from apscheduler.schedulers.background import BackgroundScheduler
 from backend.socket_events import cleanup_inactive_games as cleanup
 
@@ -8,6 +9,7 @@ def init_scheduler(app):
     def cleanup_with_context():
         """Wrapper to provide app context for cleanup job"""
         with app.app_context():
+            g.db_scope = 'job:cleanup_inactive_games'
             cleanup()
     
     # Add jobs with the context wrapper
@@ -19,6 +21,30 @@ def init_scheduler(app):
         replace_existing=True
     )
     
+    # Pick up rating changes made by other workers
+    from backend.game.rank_index import reload_rank_index
+    
+    def reload_rank_index_with_context():
+        with app.app_context():
+            g.db_scope = 'job:reload_rank_index'
+            reload_rank_index()
+    
+    scheduler.add_job(
+        func=reload_rank_index_with_context,
+        trigger='interval',
+        seconds=app.config.get('RANK_INDEX_RELOAD_SECONDS', 300),
+        id='reload_rank_index',
+        replace_existing=True
+    )
+    
+    # Incremental database maintenance (SQLite only)
+    from backend.utils.db_maintenance import init_db_maintenance
+    init_db_maintenance(app, scheduler)
+    
+    # Job run times and failures for /metrics
+    from backend.utils.metrics import instrument_scheduler
+    instrument_scheduler(scheduler)
+    
     # Start the scheduler
     scheduler.start()
     return scheduler 
\ No newline at end of file
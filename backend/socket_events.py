@@ -1,21 +1,39 @@
 from flask_socketio import SocketIO, emit, join_room, leave_room, disconnect
+from flask import current_app, g, request
 from flask_login import current_user
 from backend import socketio, db
 from backend.models.game_session import GameSession
 from backend.models.game import Game
 from backend.models.race_history import RaceHistory
 from backend.models.leaderboard import Leaderboard
+from backend.game.rank_index import rank_index
+from backend.game.track_leaderboards import track_leaderboards
+from backend.game.lobby_directory import lobby_directory
+from backend.game.matchmaking import matchmaking_queue
+from backend.utils.db_routing import read_only, db_intent, READ
+from backend.utils.db_utils import run_after_commit
+from backend.utils.flight_recorder import flight_recorder
+from backend.utils.handler_profiler import handler_profiler, instrument_handler
+from backend.utils.metrics import record_matchmaking_wait, record_tick
 import json
+import time
 import uuid
+from functools import partial
 from datetime import datetime, timedelta
 
 # Active game tracking
 active_games = {}  # {game_id: {player_states: {}, last_updates: {}, disconnected_players: {}}}
+socket_match_queue = []  # Players waiting for a socket match, oldest first
 
 # Constants
 CLEANUP_INTERVAL = 30  # seconds
 RECONNECT_TIMEOUT = 60  # seconds to allow for reconnection
 INACTIVE_TIMEOUT = 30  # seconds before considering a player inactive
+LOBBY_BROADCAST_INTERVAL = 0.2  # seconds of lobby changes coalesced per diff
+
+# Lobby browser channel
+LOBBIES_ROOM = 'lobbies'
+lobby_broadcaster = {'started': False, 'subscribers': set()}
 
 def cleanup_inactive_games():
     """Clean up inactive games and sessions"""
@@ -40,6 +58,11 @@ def cleanup_inactive_games():
             # Delete inactive sessions
             for session in inactive_sessions:
                 db.session.delete(session)
+            
+            touched_games = {game.id for game in inactive_games}
+            touched_games.update(session.game_id for session in inactive_sessions)
+        
+        lobby_directory.touch(*touched_games)
                 
     except Exception as e:
         print(f"Error in cleanup_inactive_games: {e}")
@@ -126,7 +149,8 @@ def handle_player_timeout(game_id, user_id):
     }, room=f'game_{game_id}')
 
 @socketio.on('connect')
-def handle_connect():
+@instrument_handler
+def handle_connect(auth=None):
     if not current_user.is_authenticated:
         return False
     
@@ -183,11 +207,15 @@ def handle_connect():
                 } for s in active_session.game.sessions]
             })
     
+    # Personal room for match notifications
+    join_room(f'user_{current_user.id}')
     emit('connection_success', {'user_id': current_user.id})
 
 @socketio.on('disconnect')
-def handle_disconnect():
+@instrument_handler
+def handle_disconnect(reason=None):
     if not current_user.is_authenticated:
+        lobby_broadcaster['subscribers'].discard(request.sid)
         return
     
     # Find active game sessions
@@ -206,22 +234,27 @@ def handle_disconnect():
             handle_player_disconnect(session.game_id, current_user.id)
     
     # Leave all rooms
+    lobby_broadcaster['subscribers'].discard(request.sid)
     for game_id in active_games:
         leave_room(f'game_{game_id}')
     leave_room(f'user_{current_user.id}')
 
 @socketio.on('join_game')
+@instrument_handler
 def handle_join_game(data):
     game_id = data['game_id']
     game = Game.query.get(game_id)
     
-    if game and game.status == 'waiting' and not game.is_full():
-        # Get or create session
-        session = GameSession.query.filter_by(
-            game_id=game_id,
-            user_id=current_user.id
-        ).first()
-        
+    if not game or game.status != 'waiting':
+        return
+    
+    # Players placed by matchmaking already hold a seat in the full game
+    session = GameSession.query.filter_by(
+        game_id=game_id,
+        user_id=current_user.id
+    ).first()
+    
+    if session or not game.is_full():
         if not session:
             session = GameSession(
                 game_id=game_id,
@@ -230,6 +263,7 @@ def handle_join_game(data):
             )
             db.session.add(session)
             db.session.commit()
+            lobby_directory.touch(game_id)
         
         # Join game room
         join_room(f'game_{game_id}')
@@ -249,6 +283,7 @@ def handle_join_game(data):
         }, room=f'game_{game_id}')
 
 @socketio.on('game_update')
+@instrument_handler
 def handle_game_update(data):
     game_id = data['game_id']
     if game_id in active_games:
@@ -269,6 +304,7 @@ def handle_game_update(data):
         }, room=f'game_{game_id}')
 
 @socketio.on('race_finished')
+@instrument_handler
 def handle_race_finished(data):
     game_id = data['game_id']
     game = Game.query.get(game_id)
@@ -293,11 +329,13 @@ def handle_race_finished(data):
                 ship_id=session.ship_id,
                 completion_time=session.finish_time,
                 position=session.position,
-                completed=True,
                 replay_data=data.get('replay_data')
             )
             db.session.add(race)
             
+            # Update per-track leaderboard in the same transaction
+            track_leaderboards.record_result(game, session, data.get('replay_data'))
+            
             # Check if race is complete
             all_finished = all(s.finish_time is not None for s in game.sessions)
             if all_finished:
@@ -316,7 +354,59 @@ def handle_race_finished(data):
                 'rating_change': race.rating_change
             }, room=f'game_{game_id}')
 
+def broadcast_lobby_changes(app):
+    """Push coalesced lobby diffs to the lobbies channel.
+
+    Runs as a background task; each pass drains every change made since the
+    previous one, so work scales with lobby churn rather than viewer count.
+    """
+    while True:
+        socketio.sleep(LOBBY_BROADCAST_INTERVAL)
+        started = time.perf_counter()
+        try:
+            with handler_profiler.profile_loop('lobby_broadcast'):
+                with app.app_context(), db_intent(READ):
+                    g.db_scope = 'lobby_broadcast'
+                    diff = lobby_directory.drain_changes()
+                    db.session.remove()
+                if diff and lobby_broadcaster['subscribers']:
+                    socketio.emit('lobbies_diff', diff, room=LOBBIES_ROOM)
+        except Exception as e:
+            print(f"Error in broadcast_lobby_changes: {e}")
+        elapsed = time.perf_counter() - started
+        overran = record_tick('lobby_broadcast', elapsed, LOBBY_BROADCAST_INTERVAL)
+        flight_recorder.record_tick('lobby_broadcast', elapsed, overran)
+
+@socketio.on('subscribe_lobbies')
+@instrument_handler
+@read_only
+def handle_subscribe_lobbies(data=None):
+    """Join the lobby browser channel and receive the current snapshot"""
+    if not lobby_broadcaster['started']:
+        lobby_broadcaster['started'] = True
+        socketio.start_background_task(
+            broadcast_lobby_changes,
+            current_app._get_current_object()
+        )
+    
+    join_room(LOBBIES_ROOM)
+    lobby_broadcaster['subscribers'].add(request.sid)
+    
+    version, lobbies = lobby_directory.snapshot()
+    emit('lobbies_snapshot', {
+        'version': version,
+        'lobbies': lobbies
+    })
+
+@socketio.on('unsubscribe_lobbies')
+@instrument_handler
+def handle_unsubscribe_lobbies(data=None):
+    leave_room(LOBBIES_ROOM)
+    lobby_broadcaster['subscribers'].discard(request.sid)
+
 @socketio.on('spectate_game')
+@instrument_handler
+@read_only
 def handle_spectate(data):
     game_id = data['game_id']
     game = Game.query.get(game_id)
@@ -361,6 +451,7 @@ def update_ratings(game):
         
         # Update user rating
         session.user.rating += rating_change
+        run_after_commit(partial(rank_index.update, session.user_id, session.user.rating))
         
         # Update race history rating change
         race = RaceHistory.query.filter_by(
@@ -387,12 +478,14 @@ def calculate_rating_change(player_rating, position, players):
     return int(rating_change)
 
 @socketio.on('party_message')
+@instrument_handler
 def handle_party_message(data):
     party_id = data['party_id']
     message = data['message']
     matchmaking_queue.send_party_message(party_id, current_user.id, message)
 
 @socketio.on('party_action')
+@instrument_handler
 def handle_party_action(data):
     action = data['action']
     party_id = data['party_id']
@@ -406,6 +499,7 @@ def handle_party_action(data):
         matchmaking_queue.add_spectator(party_id, current_user.id)
 
 @socketio.on('add_reaction')
+@instrument_handler
 def handle_reaction(data):
     timestamp = data['timestamp']
     emoji = data['emoji']
@@ -420,6 +514,7 @@ def handle_reaction(data):
     }, room=f'game_{game_id}_spectators')
 
 @socketio.on('add_comment')
+@instrument_handler
 def handle_comment(data):
     timestamp = data['timestamp']
     comment = data['message']
@@ -432,6 +527,7 @@ def handle_comment(data):
     }, room=f'game_{game_id}_spectators')
 
 @socketio.on('join_matchmaking')
+@instrument_handler
 def handle_join_matchmaking(data):
     ship_id = data.get('ship_id')
     course_id = data.get('course_id')
@@ -441,17 +537,23 @@ def handle_join_matchmaking(data):
         'user_id': current_user.id,
         'username': current_user.username,
         'rating': current_user.rating,
-        'ship_id': ship_id
+        'ship_id': ship_id,
+        'queued_at': time.time()
     }
     
-    matchmaking_queue.append(player)
+    socket_match_queue.append(player)
     check_matchmaking(course_id)
 
 def check_matchmaking(course_id):
-    if len(matchmaking_queue) >= 2:
-        # Create game with first 4 players in queue
-        players = matchmaking_queue[:4]
-        del matchmaking_queue[:4]
+    min_players = current_app.config.get('MATCHMAKING_MIN_PLAYERS', 2)
+    max_players = current_app.config.get('MATCHMAKING_MAX_PLAYERS', 4)
+    if len(socket_match_queue) >= min_players:
+        # Create game with the longest-waiting players in queue
+        players = socket_match_queue[:max_players]
+        del socket_match_queue[:max_players]
+        now = time.time()
+        for player in players:
+            record_matchmaking_wait('socket', now - player.pop('queued_at', now))
         
         # Create game and sessions
         game_id = create_game_session(players, course_id)
@@ -464,6 +566,7 @@ def check_matchmaking(course_id):
             }, room=f"user_{player['user_id']}")
 
 @socketio.on('game_state')
+@instrument_handler
 def handle_game_state(data):
     session_id = data['session_id']
     if session_id in active_sessions:
@@ -477,6 +580,7 @@ def handle_game_state(data):
         }, room=session_id)
 
 @socketio.on('race_complete')
+@instrument_handler
 def handle_race_complete(data):
     game_id = data['game_id']
     finish_time = data['time']
@@ -500,11 +604,11 @@ def handle_race_complete(data):
         ship_id=session.ship_id,
         completion_time=finish_time,
         position=position,
-        completed=True,
         replay_data=data.get('replay_data')
     )
     
     db.session.add(race)
+    track_leaderboards.record_result(game, session, data.get('replay_data'))
     db.session.commit()
     
     # Calculate and update ratings
@@ -536,4 +640,5 @@ def create_game_session(players, course_id):
         db.session.add(session)
     
     db.session.commit()
-    return game.id 
\ No newline at end of file
+    lobby_directory.touch(game.id)
+    return game.id
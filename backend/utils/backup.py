@@ -5,44 +5,111 @@ from datetime import datetime
 import json
 from pathlib import Path
 import gzip
+import hashlib
+import time
+
+STREAM_CHUNK_SIZE = 1024 * 1024
+SQLITE_HEADER = b'SQLite format 3\x00'
+
+# Bulk-load settings for replaying SQL dumps into a scratch file
+RESTORE_PRAGMAS = (
+    'journal_mode=OFF',
+    'synchronous=OFF',
+    'locking_mode=EXCLUSIVE',
+    'cache_size=-65536',
+    'temp_store=MEMORY',
+    'foreign_keys=OFF',
+)
+DEFERRED_STATEMENTS = ('CREATE INDEX', 'CREATE UNIQUE INDEX', 'CREATE TRIGGER')
+
+# Incremental backups: the database file is split into fixed-size chunks
+# stored once under chunks/ by content hash
+CHUNK_BYTES = 256 * 1024
+MAX_CHAIN_LENGTH = 24
+# Chunks this recent may belong to a backup that has not written its manifest
+CHUNK_GC_GRACE_SECONDS = 3600
+
+
+class _RestartLimit(Exception):
+    """The paged copy kept restarting because of concurrent writes"""
+
 
 class DatabaseBackup:
-    def __init__(self, db_path, backup_dir):
+    def __init__(self, db_path, backup_dir, pages_per_step=1024, step_sleep=0.005,
+                 max_restarts=5, compress_level=6, chunk_bytes=CHUNK_BYTES,
+                 max_chain_length=MAX_CHAIN_LENGTH):
         self.db_path = Path(db_path)
         self.backup_dir = Path(backup_dir)
         self.backup_dir.mkdir(parents=True, exist_ok=True)
+        self.pages_per_step = pages_per_step
+        self.step_sleep = step_sleep
+        self.max_restarts = max_restarts
+        self.compress_level = compress_level
+        self.chunk_bytes = chunk_bytes
+        self.max_chain_length = max_chain_length
+        self.chunk_dir = self.backup_dir / 'chunks'
+
+    def create_backup(self, note=None, mode='pages', progress=None):
+        """Create a backup of the database.
 
-    def create_backup(self, note=None):
-        """Create a backup of the database"""
+        ``mode='pages'`` copies the live database page by page with the
+        online backup API into a scratch file and streams it through gzip;
+        ``mode='sql'`` writes a gzip SQL text dump. ``progress`` is called
+        as ``progress(copied_pages, total_pages)``.
+        """
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        backup_name = f"backup_{timestamp}.db.gz"
+        if mode == 'pages':
+            backup_name = f"backup_{timestamp}.sqlite.gz"
+        elif mode == 'sql':
+            backup_name = f"backup_{timestamp}.db.gz"
+        else:
+            raise ValueError(f"Unknown backup mode: {mode}")
         backup_path = self.backup_dir / backup_name
         metadata_path = self.backup_dir / f"backup_{timestamp}.json"
+        scratch_path = self.backup_dir / f"backup_{timestamp}.partial"
 
-        # Ensure we have a consistent backup using SQLite's backup API
         try:
-            # Connect to source database
-            source = sqlite3.connect(self.db_path)
-            # Create backup in memory first
-            memory_db = sqlite3.connect(':memory:')
-            source.backup(memory_db)
-            source.close()
-
-            # Write to compressed file
-            with gzip.open(backup_path, 'wb') as gz_file:
-                for line in memory_db.iterdump():
-                    gz_file.write(f'{line}\n'.encode('utf-8'))
-            
-            memory_db.close()
+            started = time.monotonic()
+            if mode == 'pages':
+                stats = self._copy_pages(scratch_path, progress)
+                tables = self._get_table_info(scratch_path)
+                size = os.path.getsize(scratch_path)
+                compress_started = time.monotonic()
+                with open(scratch_path, 'rb') as src, gzip.open(backup_path, 'wb', self.compress_level) as dst:
+                    shutil.copyfileobj(src, dst, STREAM_CHUNK_SIZE)
+                stats['compress_seconds'] = round(time.monotonic() - compress_started, 3)
+                scratch_path.unlink()
+            else:
+                stats = {}
+                size = os.path.getsize(self.db_path)
+                # Dump straight from a read connection; WAL keeps writers going.
+                # One read transaction so the counts match the dumped rows.
+                source = sqlite3.connect(f'file:{self.db_path}?mode=ro', uri=True, isolation_level=None)
+                try:
+                    source.execute('BEGIN')
+                    tables = self._count_tables(source)
+                    with gzip.open(backup_path, 'wb', self.compress_level) as gz_file:
+                        for line in source.iterdump():
+                            gz_file.write(f'{line}\n'.encode('utf-8'))
+                finally:
+                    source.close()
 
-            # Save metadata
+            seconds = time.monotonic() - started
+            compressed_size = os.path.getsize(backup_path)
             metadata = {
                 'timestamp': timestamp,
+                'file': backup_name,
+                'format': mode,
                 'original_path': str(self.db_path),
-                'size': os.path.getsize(self.db_path),
+                'size': size,
+                'compressed_size': compressed_size,
+                'compression_ratio': round(size / compressed_size, 2) if compressed_size else None,
+                'seconds': round(seconds, 3),
+                'throughput_mb_s': round(size / 1024 / 1024 / seconds, 2) if seconds else None,
                 'note': note,
-                'tables': self._get_table_info()
+                'tables': tables
             }
+            metadata.update(stats)
 
             with open(metadata_path, 'w') as f:
                 json.dump(metadata, f, indent=2)
@@ -50,101 +117,480 @@ class DatabaseBackup:
             return backup_path, metadata
 
         except Exception as e:
-            if backup_path.exists():
-                backup_path.unlink()
-            if metadata_path.exists():
-                metadata_path.unlink()
+            for path in (backup_path, metadata_path, scratch_path):
+                if path.exists():
+                    path.unlink()
             raise RuntimeError(f"Backup failed: {str(e)}")
 
+    def _copy_pages(self, dest_path, progress=None):
+        """Online backup into dest_path, pages_per_step pages at a time.
+
+        Sleeping between steps lets the server's writers in. A write from
+        another connection restarts the copy, so after max_restarts the rest
+        is copied in one step; in WAL mode that only holds a read snapshot.
+        """
+        state = {'steps': 0, 'restarts': 0, 'total': 0, 'last_remaining': None}
+
+        def on_step(status, remaining, total):
+            state['steps'] += 1
+            state['total'] = total
+            if state['last_remaining'] is not None and remaining > state['last_remaining']:
+                state['restarts'] += 1
+                if state['restarts'] >= self.max_restarts:
+                    # Raise out of the paged copy and finish in one step
+                    raise _RestartLimit()
+            state['last_remaining'] = remaining
+            if progress:
+                progress(total - remaining, total)
+            if remaining and self.step_sleep:
+                time.sleep(self.step_sleep)
+
+        source = sqlite3.connect(self.db_path, timeout=30)
+        dest = sqlite3.connect(dest_path)
+        started = time.monotonic()
+        try:
+            try:
+                source.backup(dest, pages=self.pages_per_step, progress=on_step)
+                single_step = False
+            except _RestartLimit:
+                source.backup(dest)
+                single_step = True
+            if progress:
+                progress(state['total'], state['total'])
+        finally:
+            dest.close()
+            source.close()
+        return {
+            'pages': state['total'],
+            'pages_per_step': self.pages_per_step,
+            'steps': state['steps'],
+            'restarts': state['restarts'],
+            'finished_in_single_step': single_step,
+            'copy_seconds': round(time.monotonic() - started, 3),
+        }
+
+    def create_incremental_backup(self, note=None, full=False, progress=None):
+        """Back up only the chunks that changed since the previous backup.
+
+        The database is snapshotted with the paged online backup, split into
+        chunk_bytes chunks and each chunk is stored once under chunks/ by its
+        SHA-256. A base manifest lists every chunk; an incremental manifest
+        lists only the chunks that differ from its parent. A new base starts
+        when ``full`` is set, there is no chain yet, or the chain reaches
+        max_chain_length.
+
+        Changes are found by content, not tracked: every run still copies
+        and hashes the whole file, so its I/O and CPU grow with the database
+        size. Only storage is incremental. No WAL frames are archived either,
+        so a restore can only return to the moment a backup was taken.
+        """
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        manifest_name = f"backup_{timestamp}.manifest.json"
+        manifest_path = self.backup_dir / manifest_name
+        metadata_path = self.backup_dir / f"backup_{timestamp}.json"
+        scratch_path = self.backup_dir / f"backup_{timestamp}.partial"
+
+        parent = None if full else self._latest_manifest()
+        if parent and len(self.backup_chain(parent)) >= self.max_chain_length:
+            parent = None
+
+        try:
+            started = time.monotonic()
+            stats = self._copy_pages(scratch_path, progress)
+            tables = self._get_table_info(scratch_path)
+            size = os.path.getsize(scratch_path)
+            store_started = time.monotonic()
+            hashes, new_chunks, stored_bytes = self._store_chunks(scratch_path)
+            stats['store_seconds'] = round(time.monotonic() - store_started, 3)
+            scratch_path.unlink()
+
+            manifest = {
+                'kind': 'incremental' if parent else 'base',
+                'parent': parent,
+                'chunk_bytes': self.chunk_bytes,
+                'chunk_count': len(hashes),
+                'size': size,
+            }
+            if parent:
+                previous = self._resolve_chunks(parent)
+                manifest['changes'] = {
+                    str(index): digest for index, digest in enumerate(hashes)
+                    if index >= len(previous) or previous[index] != digest
+                }
+                changed = len(manifest['changes'])
+            else:
+                manifest['chunks'] = hashes
+                changed = len(hashes)
+            with open(manifest_path, 'w') as f:
+                json.dump(manifest, f)
+
+            seconds = time.monotonic() - started
+            chain = self.backup_chain(manifest_name)
+            metadata = {
+                'timestamp': timestamp,
+                'file': manifest_name,
+                'format': 'chunks',
+                'kind': manifest['kind'],
+                'parent': parent,
+                'base': chain[0],
+                'original_path': str(self.db_path),
+                'size': size,
+                'chunk_count': len(hashes),
+                'changed_chunks': changed,
+                'new_chunks': new_chunks,
+                'compressed_size': stored_bytes,
+                'seconds': round(seconds, 3),
+                'throughput_mb_s': round(size / 1024 / 1024 / seconds, 2) if seconds else None,
+                'note': note,
+                'tables': tables
+            }
+            metadata.update(stats)
+            with open(metadata_path, 'w') as f:
+                json.dump(metadata, f, indent=2)
+
+            return manifest_path, metadata
+
+        except Exception as e:
+            for path in (manifest_path, metadata_path, scratch_path):
+                if path.exists():
+                    path.unlink()
+            raise RuntimeError(f"Incremental backup failed: {str(e)}")
+
+    def _chunk_path(self, digest):
+        return self.chunk_dir / digest[:2] / f"{digest}.gz"
+
+    def _store_chunks(self, snapshot_path):
+        """Hash the snapshot chunk by chunk, storing unseen chunks"""
+        hashes = []
+        new_chunks = 0
+        stored_bytes = 0
+        with open(snapshot_path, 'rb') as f:
+            while True:
+                chunk = f.read(self.chunk_bytes)
+                if not chunk:
+                    break
+                digest = hashlib.sha256(chunk).hexdigest()
+                hashes.append(digest)
+                path = self._chunk_path(digest)
+                if path.exists():
+                    # Mark it in use so a concurrent prune keeps it
+                    os.utime(path)
+                    continue
+                path.parent.mkdir(parents=True, exist_ok=True)
+                partial = path.with_suffix('.partial')
+                with gzip.open(partial, 'wb', self.compress_level) as out:
+                    out.write(chunk)
+                os.replace(partial, path)
+                new_chunks += 1
+                stored_bytes += os.path.getsize(path)
+        return hashes, new_chunks, stored_bytes
+
+    def _read_manifest(self, manifest_name):
+        with open(self.backup_dir / manifest_name) as f:
+            return json.load(f)
+
+    def _latest_manifest(self):
+        manifests = sorted(self.backup_dir.glob('backup_*.manifest.json'))
+        return manifests[-1].name if manifests else None
+
+    def backup_chain(self, manifest_name):
+        """Manifest names from the base backup to manifest_name"""
+        chain = []
+        while manifest_name:
+            chain.append(manifest_name)
+            manifest_name = self._read_manifest(manifest_name).get('parent')
+        return list(reversed(chain))
+
+    def _resolve_chunks(self, manifest_name):
+        """Chunk hashes of a backup: its base with each increment applied"""
+        hashes = []
+        for name in self.backup_chain(manifest_name):
+            manifest = self._read_manifest(name)
+            if manifest['kind'] == 'base':
+                hashes = list(manifest['chunks'])
+                continue
+            count = manifest['chunk_count']
+            hashes = (hashes + [None] * count)[:count]
+            for index, digest in manifest['changes'].items():
+                hashes[int(index)] = digest
+        return hashes
+
+    def prune_backups(self, keep_chains=4, grace_seconds=CHUNK_GC_GRACE_SECONDS):
+        """Delete chunked backup chains older than the newest keep_chains bases.
+
+        Chains are contiguous in time, so everything older than the oldest
+        kept base goes. Chunks no remaining manifest refers to are then
+        deleted, except ones touched within grace_seconds, which a backup
+        running now may be about to list.
+        """
+        if keep_chains < 1:
+            raise ValueError("keep_chains must be at least 1")
+        manifests = sorted(path.name for path in self.backup_dir.glob('backup_*.manifest.json'))
+        bases = [name for name in manifests if self._read_manifest(name)['kind'] == 'base']
+        removed = []
+        if len(bases) > keep_chains:
+            oldest_kept = bases[-keep_chains]
+            for name in manifests:
+                if name >= oldest_kept:
+                    break
+                (self.backup_dir / name).unlink()
+                metadata_path = self.backup_dir / f"{name.split('.')[0]}.json"
+                if metadata_path.exists():
+                    metadata_path.unlink()
+                removed.append(name)
+        chunks, freed = self._collect_chunks(grace_seconds)
+        return {'removed_backups': removed, 'removed_chunks': chunks, 'freed_bytes': freed}
+
+    def _collect_chunks(self, grace_seconds):
+        """Delete chunk files no manifest refers to"""
+        referenced = set()
+        for path in self.backup_dir.glob('backup_*.manifest.json'):
+            manifest = self._read_manifest(path.name)
+            if manifest['kind'] == 'base':
+                referenced.update(manifest['chunks'])
+            else:
+                referenced.update(manifest['changes'].values())
+
+        cutoff = time.time() - grace_seconds
+        removed = 0
+        freed = 0
+        for path in self.chunk_dir.glob('*/*'):
+            digest = path.name.split('.')[0]
+            if digest in referenced:
+                continue
+            stat = path.stat()
+            if stat.st_mtime > cutoff:
+                continue
+            path.unlink()
+            removed += 1
+            freed += stat.st_size
+        return removed, freed
+
+    def find_backup_at(self, when):
+        """Latest backup taken at or before ``when`` (a datetime)"""
+        cutoff = when.strftime('%Y%m%d_%H%M%S')
+        candidates = [b for b in self.list_backups() if b['metadata']['timestamp'] <= cutoff]
+        return candidates[0]['file'] if candidates else None
+
+    def _restore_chunks(self, manifest_path, temp_db):
+        """Reassemble a chunked backup into temp_db"""
+        manifest_name = Path(manifest_path).name
+        hashes = self._resolve_chunks(manifest_name)
+        size = self._read_manifest(manifest_name)['size']
+        with open(temp_db, 'wb') as dst:
+            for digest in hashes:
+                path = self._chunk_path(digest) if digest else None
+                if path is None or not path.exists():
+                    raise RuntimeError(f"Missing backup chunk {digest}")
+                with gzip.open(path, 'rb') as src:
+                    shutil.copyfileobj(src, dst, STREAM_CHUNK_SIZE)
+        if os.path.getsize(temp_db) != size:
+            raise RuntimeError("Reassembled database has the wrong size")
+        return {'chain_length': len(self.backup_chain(manifest_name)), 'chunks': len(hashes)}
+
     def restore_backup(self, backup_path):
-        """Restore database from backup"""
+        """Restore database from backup; stop the server first.
+
+        Page-level backups are decompressed straight into a new database
+        file. SQL dumps are replayed in a single transaction with journaling
+        off and indexes/triggers created after the data is loaded. The
+        current database is saved as a rollback backup before it is replaced.
+        """
         backup_path = Path(backup_path)
         if not backup_path.exists():
             raise FileNotFoundError(f"Backup file not found: {backup_path}")
+        metadata = self._load_metadata(backup_path)
+        backup_format = metadata.get('format') or self._detect_format(backup_path)
 
         # Create temporary database
         temp_db = self.db_path.parent / f"temp_{datetime.now().strftime('%Y%m%d_%H%M%S')}.db"
         
         try:
-            # Decompress and restore backup
-            conn = sqlite3.connect(temp_db)
-            cursor = conn.cursor()
-            
-            with gzip.open(backup_path, 'rt') as gz_file:
-                for line in gz_file:
-                    cursor.execute(line)
-            
-            conn.commit()
-            conn.close()
+            started = time.monotonic()
+            if backup_format == 'chunks':
+                report = self._restore_chunks(backup_path, temp_db)
+            elif backup_format == 'pages':
+                report = self._restore_pages(backup_path, temp_db)
+            else:
+                report = self._replay_sql_dump(backup_path, temp_db)
+            load_seconds = time.monotonic() - started
 
             # Verify the restored database
-            self._verify_restored_db(temp_db)
+            self._verify_restored_db(temp_db, metadata.get('tables'))
 
             # Replace the current database
             if self.db_path.exists():
-                # Create a rollback backup
+                # Create a rollback backup (online copy, so WAL content is kept)
                 rollback_path = self.backup_dir / f"rollback_{datetime.now().strftime('%Y%m%d_%H%M%S')}.db"
-                shutil.copy2(self.db_path, rollback_path)
+                source = sqlite3.connect(self.db_path)
+                rollback = sqlite3.connect(rollback_path)
+                try:
+                    source.backup(rollback)
+                finally:
+                    rollback.close()
+                    source.close()
+                report['rollback_path'] = str(rollback_path)
+
+            # A stale WAL would be replayed on top of the restored file
+            for suffix in ('-wal', '-shm'):
+                stale = Path(f"{self.db_path}{suffix}")
+                if stale.exists():
+                    stale.unlink()
 
             # Replace the current database with the restored one
-            shutil.move(temp_db, self.db_path)
+            os.replace(temp_db, self.db_path)
 
-            return True
+            seconds = time.monotonic() - started
+            size = os.path.getsize(self.db_path)
+            report.update({
+                'format': backup_format,
+                'size': size,
+                'load_seconds': round(load_seconds, 3),
+                'seconds': round(seconds, 3),
+                'throughput_mb_s': round(size / 1024 / 1024 / load_seconds, 2) if load_seconds else None,
+            })
+            return report
 
         except Exception as e:
             if temp_db.exists():
                 temp_db.unlink()
             raise RuntimeError(f"Restore failed: {str(e)}")
 
+    def _load_metadata(self, backup_path):
+        metadata_path = backup_path.parent / f"{backup_path.name.split('.')[0]}.json"
+        if metadata_path.exists():
+            with open(metadata_path) as f:
+                return json.load(f)
+        return {}
+
+    def _detect_format(self, backup_path):
+        if backup_path.name.endswith('.manifest.json'):
+            return 'chunks'
+        with gzip.open(backup_path, 'rb') as f:
+            header = f.read(len(SQLITE_HEADER))
+        return 'pages' if header == SQLITE_HEADER else 'sql'
+
+    def _restore_pages(self, backup_path, temp_db):
+        """Decompress a page-level backup into temp_db"""
+        with gzip.open(backup_path, 'rb') as src, open(temp_db, 'wb') as dst:
+            shutil.copyfileobj(src, dst, STREAM_CHUNK_SIZE)
+        return {}
+
+    def _replay_sql_dump(self, backup_path, temp_db):
+        """Load a SQL dump into temp_db in one transaction"""
+        conn = sqlite3.connect(temp_db, isolation_level=None)
+        for pragma in RESTORE_PRAGMAS:
+            conn.execute(f'PRAGMA {pragma}')
+        deferred = []
+        statements = 0
+        buffer = ''
+        try:
+            conn.execute('BEGIN')
+            with gzip.open(backup_path, 'rt', encoding='utf-8') as gz_file:
+                for line in gz_file:
+                    # Statements can span lines (strings with newlines)
+                    buffer += line
+                    if not sqlite3.complete_statement(buffer):
+                        continue
+                    statement, buffer = buffer.strip(), ''
+                    upper = statement[:24].upper()
+                    if upper.startswith(('BEGIN TRANSACTION', 'COMMIT')):
+                        continue  # We manage the transaction
+                    if upper.startswith(DEFERRED_STATEMENTS):
+                        deferred.append(statement)
+                        continue
+                    conn.execute(statement)
+                    statements += 1
+            if buffer.strip():
+                raise RuntimeError("Backup ends with an incomplete statement")
+
+            index_started = time.monotonic()
+            for statement in deferred:
+                conn.execute(statement)
+            conn.execute('COMMIT')
+            index_seconds = time.monotonic() - index_started
+            conn.execute('PRAGMA journal_mode=WAL')
+        finally:
+            conn.close()
+        return {
+            'statements': statements,
+            'deferred_statements': len(deferred),
+            'index_seconds': round(index_seconds, 3),
+        }
+
     def list_backups(self):
         """List available backups with their metadata"""
         backups = []
-        for backup_file in self.backup_dir.glob('backup_*.db.gz'):
-            metadata_file = self.backup_dir / f"{backup_file.stem}.json"
-            if metadata_file.exists():
-                with open(metadata_file) as f:
-                    metadata = json.load(f)
-                    backups.append({
-                        'file': backup_file.name,
-                        'metadata': metadata
-                    })
+        for metadata_file in self.backup_dir.glob('backup_*.json'):
+            with open(metadata_file) as f:
+                metadata = json.load(f)
+            # Older metadata has no 'file' entry; those were SQL dumps
+            backup_file = metadata.get('file') or f"{metadata_file.stem}.db.gz"
+            metadata.setdefault('format', 'sql')
+            if (self.backup_dir / backup_file).exists():
+                entry = {
+                    'file': backup_file,
+                    'metadata': metadata
+                }
+                if metadata['format'] == 'chunks':
+                    entry['chain'] = self.backup_chain(backup_file)
+                backups.append(entry)
         return sorted(backups, key=lambda x: x['metadata']['timestamp'], reverse=True)
 
-    def _get_table_info(self):
+    def _get_table_info(self, db_path=None):
         """Get information about database tables"""
-        conn = sqlite3.connect(self.db_path)
+        conn = sqlite3.connect(db_path or self.db_path)
+        try:
+            return self._count_tables(conn)
+        finally:
+            conn.close()
+
+    def _count_tables(self, conn):
         cursor = conn.cursor()
-        
         tables = {}
-        for table in cursor.execute("SELECT name FROM sqlite_master WHERE type='table'"):
+        for table in cursor.execute("SELECT name FROM sqlite_master WHERE type='table'").fetchall():
             table_name = table[0]
-            cursor.execute(f"SELECT COUNT(*) FROM {table_name}")
+            cursor.execute(f'SELECT COUNT(*) FROM "{table_name}"')
             row_count = cursor.fetchone()[0]
             tables[table_name] = {
                 'row_count': row_count
             }
-        
-        conn.close()
         return tables
 
-    def _verify_restored_db(self, db_path):
-        """Verify the restored database integrity"""
+    def _verify_restored_db(self, db_path, expected_tables=None):
+        """Verify the restored database integrity.
+
+        ``expected_tables`` is the backup's metadata ({name: {'row_count'}});
+        without it the restored tables are compared with the current database.
+        """
         conn = sqlite3.connect(db_path)
         cursor = conn.cursor()
         
-        # Check database integrity
-        cursor.execute("PRAGMA integrity_check")
-        result = cursor.fetchone()
-        if result[0] != "ok":
-            raise RuntimeError("Database integrity check failed")
-        
-        # Verify all tables are present
-        original_tables = set(self._get_table_info().keys())
-        restored_tables = set()
-        for table in cursor.execute("SELECT name FROM sqlite_master WHERE type='table'"):
-            restored_tables.add(table[0])
-        
-        if original_tables != restored_tables:
-            raise RuntimeError("Restored database is missing tables")
-        
-        conn.close()
\ No newline at end of file
+        try:
+            # Check database integrity
+            cursor.execute("PRAGMA integrity_check")
+            result = cursor.fetchone()
+            if result[0] != "ok":
+                raise RuntimeError("Database integrity check failed")
+            
+            # Verify all tables are present
+            if expected_tables is None:
+                expected_tables = self._get_table_info() if self.db_path.exists() else {}
+            original_tables = set(expected_tables.keys())
+            restored_tables = set()
+            for table in cursor.execute("SELECT name FROM sqlite_master WHERE type='table'").fetchall():
+                restored_tables.add(table[0])
+            
+            if original_tables and original_tables != restored_tables:
+                raise RuntimeError("Restored database is missing tables")
+            
+            # Row counts are only known for the backup itself
+            for table, info in expected_tables.items():
+                expected = info.get('row_count') if isinstance(info, dict) else None
+                if expected is None or table not in restored_tables:
+                    continue
+                cursor.execute(f'SELECT COUNT(*) FROM "{table}"')
+                if cursor.fetchone()[0] != expected:
+                    raise RuntimeError(f"Row count mismatch in restored table {table}")
+        finally:
+            conn.close()
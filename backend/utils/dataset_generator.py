@@ -0,0 +1,449 @@
+"""Deterministic synthetic dataset for load tests and benchmarks.
+
+Generates users, finished games with their sessions and race_history rows,
+a few open lobbies, and then derives leaderboards and course records from
+the race history with INSERT ... SELECT. Everything is drawn from NumPy
+generators seeded per table and per chunk, so the same seed always produces
+the same database and each table can be streamed through ``bulk_load`` by
+regenerating its chunks instead of holding the dataset in memory.
+
+Players are matched by rating (each game takes neighbours in rating order,
+like matchmaking does); finish times scale with the course's par time and
+the player's rating; replay payloads are attached to a fraction of races.
+"""
+import time
+from datetime import datetime, timedelta
+import numpy as np
+from sqlalchemy import func, text
+from werkzeug.security import generate_password_hash
+from backend import db
+from backend.models.user import User
+from backend.models.game import Game
+from backend.models.game_session import GameSession
+from backend.models.race_history import RaceHistory
+from backend.models.ship import Ship
+from backend.models.course import Course
+from backend.utils.db_utils import bulk_load
+
+GAMES_PER_CHUNK = 20000
+USERS_PER_CHUNK = 100000
+HISTORY_DAYS = 365
+MIN_PLAYERS, MAX_PLAYERS = 2, 8
+DNF_RATE = 0.03
+OPEN_LOBBY_FRACTION = 0.001
+
+# Table streams for independent seeding
+STREAM_USERS, STREAM_GAMES, STREAM_COURSES = 1, 2, 3
+
+GENERATED_COURSES = [
+    ('Tutorial Track', 'easy', 60.0, 0),
+    ('Beginner Circuit', 'easy', 90.0, 0),
+    ('Asteroid Belt', 'medium', 120.0, 1100),
+    ('Nebula Run', 'medium', 135.0, 1200),
+    ('Gravity Well Gauntlet', 'hard', 150.0, 1400),
+    ('Event Horizon', 'hard', 180.0, 1600),
+    ('Solar Flare Sprint', 'medium', 100.0, 1000),
+    ('Kuiper Drift', 'expert', 210.0, 1800),
+]
+
+LEADERBOARD_SQL = {
+    'sqlite': """
+        INSERT INTO leaderboards (user_id, track_id, best_time, ship_id, date_achieved,
+                                  total_races, wins, last_updated)
+        SELECT user_id, track_id, MIN(completion_time), ship_id, date,
+               COUNT(*), SUM(position = 1), MAX(date)
+        FROM race_history
+        WHERE game_id >= :first_game_id
+        GROUP BY user_id, track_id
+        ON CONFLICT (user_id, track_id) DO NOTHING
+    """,
+    'postgresql': """
+        INSERT INTO leaderboards (user_id, track_id, best_time, ship_id, date_achieved,
+                                  total_races, wins, last_updated)
+        SELECT DISTINCT ON (user_id, track_id)
+               user_id, track_id, completion_time, ship_id, date,
+               COUNT(*) OVER w, SUM(CASE WHEN position = 1 THEN 1 ELSE 0 END) OVER w,
+               MAX(date) OVER w
+        FROM race_history
+        WHERE game_id >= :first_game_id
+        WINDOW w AS (PARTITION BY user_id, track_id)
+        ORDER BY user_id, track_id, completion_time ASC NULLS LAST
+        ON CONFLICT (user_id, track_id) DO NOTHING
+    """,
+}
+
+COURSE_RECORD_SQL = {
+    'sqlite': """
+        INSERT INTO course_records (track_id, user_id, ship_id, best_time, date_achieved)
+        SELECT track_id, user_id, ship_id, MIN(completion_time), date
+        FROM race_history
+        WHERE game_id >= :first_game_id AND completion_time IS NOT NULL
+        GROUP BY track_id, ship_id
+        ON CONFLICT (track_id, ship_id) DO NOTHING
+    """,
+    'postgresql': """
+        INSERT INTO course_records (track_id, user_id, ship_id, best_time, date_achieved)
+        SELECT DISTINCT ON (track_id, ship_id)
+               track_id, user_id, ship_id, completion_time, date
+        FROM race_history
+        WHERE game_id >= :first_game_id AND completion_time IS NOT NULL
+        ORDER BY track_id, ship_id, completion_time
+        ON CONFLICT (track_id, ship_id) DO NOTHING
+    """,
+}
+
+
+def unique_seats(row_game, rank_pos, n_users):
+    """Move repeated ranks within a game forward to the next free rank.
+
+    Rows are grouped by game and each game has at most n_users rows, so
+    linear probing always finds a free rank; the earliest row keeps a
+    contested rank and only the later ones move.
+    """
+    rank_pos = rank_pos % n_users
+    while True:
+        key = row_game * n_users + rank_pos
+        order = np.argsort(key, kind='stable')
+        repeated = order[1:][key[order[1:]] == key[order[:-1]]]
+        if not len(repeated):
+            return rank_pos
+        rank_pos[repeated] = (rank_pos[repeated] + 1) % n_users
+
+
+class DatasetGenerator:
+    """Generates and loads a synthetic dataset of a given size"""
+    def __init__(self, users=10000, races=200000, seed=42, replay_fraction=0.02,
+                 now=None, lobby_time=None, progress=None):
+        self.n_users = int(users)
+        self.n_races = int(races)
+        self.seed = seed
+        self.replay_fraction = replay_fraction
+        self.now = now or datetime(2025, 1, 1)
+        # Open lobbies are stamped with the load time instead, since
+        # cleanup_inactive_games drops waiting games older than five minutes
+        self.lobby_time = lobby_time
+        self.progress = progress or (lambda message: None)
+        # Filled in by prepare()
+        self.first_user_id = None
+        self.first_game_id = None
+        self.n_games = None
+        self.ratings = None
+        self.by_rating = None
+        self.activity_cdf = None
+        self.ship_ids = None
+        self.ship_thresholds = None
+        self.course_ids = None
+        self.course_par = None
+        self.course_checkpoints = None
+
+    def _rng(self, stream, chunk=0):
+        return np.random.default_rng([self.seed, stream, chunk])
+
+    # Setup
+    def _ensure_catalog(self):
+        from backend.game.catalog import catalog
+        catalog.load(seed=True)
+        if not Course.query.first():
+            rng = self._rng(STREAM_COURSES)
+            for name, difficulty, par_time, required_rating in GENERATED_COURSES:
+                points = rng.uniform(50, 950, size=(int(rng.integers(4, 12)), 2)).round(1)
+                db.session.add(Course(
+                    name=name,
+                    description=f'{name} ({difficulty})',
+                    difficulty=difficulty,
+                    checkpoints=[{'x': x, 'y': y} for x, y in points.tolist()],
+                    par_time=par_time,
+                    required_rating=required_rating
+                ))
+            db.session.commit()
+
+        ships = Ship.query.order_by(Ship.required_rating, Ship.id).all()
+        courses = Course.query.order_by(Course.id).all()
+        self.ship_ids = np.array([ship.id for ship in ships])
+        self.ship_thresholds = np.array([ship.required_rating or 0 for ship in ships])
+        self.course_ids = np.array([course.id for course in courses])
+        self.course_par = np.array([course.par_time or 120.0 for course in courses])
+        self.course_checkpoints = [course.checkpoints or [] for course in courses]
+
+    def prepare(self):
+        """Pick id ranges and draw per-user ratings and activity"""
+        self._ensure_catalog()
+        self.lobby_time = self.lobby_time or datetime.utcnow()
+        self.first_user_id = (db.session.query(func.max(User.id)).scalar() or 0) + 1
+        self.first_game_id = (db.session.query(func.max(Game.id)).scalar() or 0) + 1
+        mean_players = (MIN_PLAYERS + MAX_PLAYERS) / 2.0
+        self.n_games = max(1, int(round(self.n_races / mean_players)))
+
+        rng = self._rng(STREAM_USERS)
+        self.ratings = np.clip(rng.normal(1000, 250, self.n_users), 0, 3000).astype(np.int64)
+        self.by_rating = np.argsort(self.ratings, kind='stable')
+        # A few players race far more than most
+        activity = rng.lognormal(0.0, 1.0, self.n_users)
+        cdf = np.cumsum(activity[self.by_rating])
+        self.activity_cdf = cdf / cdf[-1]
+
+    # Game plan
+    def _game_chunks(self):
+        """Yield each chunk of games with every player row drawn for it"""
+        for chunk, start in enumerate(range(0, self.n_games, GAMES_PER_CHUNK)):
+            count = min(GAMES_PER_CHUNK, self.n_games - start)
+            rng = self._rng(STREAM_GAMES, chunk)
+            game_index = np.arange(start, start + count)
+            track = rng.integers(0, len(self.course_ids), count)
+            players = np.minimum(rng.integers(MIN_PLAYERS, MAX_PLAYERS + 1, count), self.n_users)
+            # Games are spread evenly over the history window, oldest first
+            offsets = (game_index + rng.random(count)) * (HISTORY_DAYS * 86400.0 / self.n_games)
+            open_lobby = game_index >= self.n_games * (1 - OPEN_LOBBY_FRACTION)
+
+            # Rating neighbours: an activity-weighted anchor plus players at
+            # a small stride from it in rating order
+            anchor = np.searchsorted(self.activity_cdf, rng.random(count))
+            stride = rng.integers(1, 50, count)
+            row_game = np.repeat(np.arange(count), players)
+            slot = np.arange(len(row_game)) - np.repeat(np.cumsum(players) - players, players)
+            # A stride that divides n_users would seat a player twice
+            rank_pos = unique_seats(row_game, anchor[row_game] + slot * stride[row_game], self.n_users)
+            user_index = self.by_rating[rank_pos]
+            rating = self.ratings[user_index]
+
+            unlocked = np.searchsorted(self.ship_thresholds, rating, side='right')
+            ship = self.ship_ids[(rng.random(len(row_game)) * np.maximum(unlocked, 1)).astype(np.int64)]
+
+            skill = (rating - 1000) / 250.0
+            par = self.course_par[track[row_game]]
+            finish = par * (1.15 - 0.08 * skill) * rng.lognormal(0.0, 0.06, len(row_game))
+            finish = np.maximum(finish, par * 0.6).round(3)
+            dnf = rng.random(len(row_game)) < DNF_RATE
+            ranked_time = np.where(dnf, np.inf, finish)
+            order = np.lexsort((ranked_time, row_game))
+            # Rows are grouped by game already, so the sorted order keeps the
+            # same game boundaries and the slot is the rank within the game
+            position = np.empty(len(row_game), dtype=np.int64)
+            position[order] = slot + 1
+            field = players[row_game]
+            rating_change = np.round(16 * (field + 1 - 2 * position) / field).astype(np.int64)
+            experience = np.maximum(10, 110 - 15 * position)
+
+            yield {
+                'start': start,
+                'count': count,
+                'rng': rng,
+                'track': track,
+                'players': players,
+                'offsets': offsets,
+                'open_lobby': open_lobby,
+                'row_game': row_game,
+                'user_index': user_index,
+                'ship': ship,
+                'finish': finish,
+                'dnf': dnf,
+                'position': position,
+                'rating_change': rating_change,
+                'experience': experience,
+                'duration': np.where(dnf, 0.0, finish),
+            }
+
+    def _timestamp(self, offset_seconds):
+        return self.now - timedelta(seconds=HISTORY_DAYS * 86400.0 - offset_seconds)
+
+    # Row streams
+    def user_rows(self, races, wins, best_time, experience):
+        password_hash = generate_password_hash('password')
+        rng = self._rng(STREAM_USERS, 1)
+        for start in range(0, self.n_users, USERS_PER_CHUNK):
+            stop = min(start + USERS_PER_CHUNK, self.n_users)
+            joined = rng.uniform(0, HISTORY_DAYS * 86400.0, stop - start).tolist()
+            ratings = self.ratings[start:stop].tolist()
+            best = best_time[start:stop].tolist()
+            for i, index in enumerate(range(start, stop)):
+                user_id = self.first_user_id + index
+                yield {
+                    'id': user_id,
+                    'username': f'pilot_{user_id:07d}',
+                    'email': f'pilot_{user_id}@example.test',
+                    'password_hash': password_hash,
+                    'created_at': self._timestamp(joined[i]),
+                    'is_active': True,
+                    'rating': ratings[i],
+                    'races_completed': int(races[index]),
+                    'wins': int(wins[index]),
+                    'best_time': None if best[i] == np.inf else best[i],
+                    'experience_points': int(experience[index]),
+                }
+
+    def game_rows(self):
+        for plan in self._game_chunks():
+            offsets = plan['offsets'].tolist()
+            longest = np.zeros(plan['count'])
+            np.maximum.at(longest, plan['row_game'], plan['duration'])
+            tracks = self.course_ids[plan['track']].tolist()
+            for i in range(plan['count']):
+                started = self._timestamp(offsets[i])
+                is_open = bool(plan['open_lobby'][i])
+                yield {
+                    'id': self.first_game_id + plan['start'] + i,
+                    'track_id': tracks[i],
+                    'status': 'waiting' if is_open else 'completed',
+                    'start_time': None if is_open else started,
+                    'end_time': None if is_open else started + timedelta(seconds=float(longest[i])),
+                    'max_players': MAX_PLAYERS,
+                    'created_at': self.lobby_time if is_open else started - timedelta(seconds=60),
+                }
+
+    def _player_rows(self, plan):
+        """Per-player columns as Python lists, plus game-level lookups"""
+        row_game = plan['row_game']
+        open_row = plan['open_lobby'][row_game]
+        return {
+            'game_id': (self.first_game_id + plan['start'] + row_game).tolist(),
+            'user_id': (self.first_user_id + plan['user_index']).tolist(),
+            'ship_id': plan['ship'].tolist(),
+            'track_id': self.course_ids[plan['track'][row_game]].tolist(),
+            'finish': plan['finish'].tolist(),
+            'dnf': plan['dnf'].tolist(),
+            'position': plan['position'].tolist(),
+            'rating_change': plan['rating_change'].tolist(),
+            'experience': plan['experience'].tolist(),
+            'date_offset': (plan['offsets'][row_game] + plan['duration']).tolist(),
+            'open': open_row.tolist(),
+        }
+
+    def session_rows(self):
+        for plan in self._game_chunks():
+            rows = self._player_rows(plan)
+            for i in range(len(rows['game_id'])):
+                is_open = rows['open'][i]
+                finished = not is_open and not rows['dnf'][i]
+                yield {
+                    'game_id': rows['game_id'][i],
+                    'user_id': rows['user_id'][i],
+                    'ship_id': rows['ship_id'][i],
+                    'is_ready': not is_open,
+                    # cleanup_inactive_games deletes disconnected sessions
+                    'is_connected': True,
+                    'finish_time': rows['finish'][i] if finished else None,
+                    'position': None if is_open else rows['position'][i],
+                    'dnf': not is_open and rows['dnf'][i],
+                    'created_at': self.lobby_time if is_open else self._timestamp(rows['date_offset'][i]),
+                }
+
+    def _replay(self, rng, track_index, finish_time):
+        """Compact replay: the ship's position at each checkpoint"""
+        checkpoints = self.course_checkpoints[track_index] or [{'x': 0, 'y': 0}]
+        splits = np.sort(rng.random(len(checkpoints))) * finish_time
+        jitter = rng.normal(0, 3, (len(checkpoints), 2))
+        return {
+            'version': 1,
+            'frames': [
+                [round(t, 3), round(point['x'] + dx, 1), round(point['y'] + dy, 1)]
+                for t, point, (dx, dy) in zip(splits.tolist(), checkpoints, jitter.tolist())
+            ]
+        }
+
+    def race_rows(self):
+        for plan in self._game_chunks():
+            rows = self._player_rows(plan)
+            rng = plan['rng']
+            track_index = plan['track'][plan['row_game']].tolist()
+            with_replay = (rng.random(len(rows['game_id'])) < self.replay_fraction).tolist()
+            for i in range(len(rows['game_id'])):
+                if rows['open'][i]:
+                    continue
+                dnf = rows['dnf'][i]
+                yield {
+                    'user_id': rows['user_id'][i],
+                    'game_id': rows['game_id'][i],
+                    'track_id': rows['track_id'][i],
+                    'ship_id': rows['ship_id'][i],
+                    'completion_time': None if dnf else rows['finish'][i],
+                    'position': rows['position'][i],
+                    'date': self._timestamp(rows['date_offset'][i]),
+                    'rating_change': rows['rating_change'][i],
+                    'experience_gained': rows['experience'][i],
+                    'replay_data': (
+                        self._replay(rng, track_index[i], rows['finish'][i])
+                        if with_replay[i] and not dnf else None
+                    ),
+                }
+
+    def user_aggregates(self):
+        """Per-user race counts, wins, best time and XP over the whole plan"""
+        races = np.zeros(self.n_users, dtype=np.int64)
+        wins = np.zeros(self.n_users, dtype=np.int64)
+        experience = np.zeros(self.n_users, dtype=np.int64)
+        best_time = np.full(self.n_users, np.inf)
+        for plan in self._game_chunks():
+            played = ~plan['open_lobby'][plan['row_game']]
+            users = plan['user_index'][played]
+            races += np.bincount(users, minlength=self.n_users)
+            winners = users[plan['position'][played] == 1]
+            wins += np.bincount(winners, minlength=self.n_users)
+            experience += np.bincount(
+                users, weights=plan['experience'][played], minlength=self.n_users
+            ).astype(np.int64)
+            finished = played & ~plan['dnf']
+            np.minimum.at(best_time, plan['user_index'][finished], plan['finish'][finished])
+        return races, wins, best_time, experience
+
+    # Load
+    def generate(self):
+        """Generate and load everything; returns per-table load stats.
+
+        All tables load in one transaction, so a failure leaves the
+        database as it was.
+        """
+        started = time.perf_counter()
+        self.prepare()
+        self.progress(f"Planning {self.n_games} games for {self.n_users} users")
+        races, wins, best_time, experience = self.user_aggregates()
+
+        try:
+            results = self._load(races, wins, best_time, experience)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+        self.progress("Analyzing...")
+        db.session.execute(text('ANALYZE'))
+        db.session.commit()
+        results['total_seconds'] = round(time.perf_counter() - started, 3)
+        return results
+
+    def _load(self, races, wins, best_time, experience):
+        results = {}
+        for name, model, rows in (
+            ('users', User, self.user_rows(races, wins, best_time, experience)),
+            ('games', Game, self.game_rows()),
+            ('game_sessions', GameSession, self.session_rows()),
+            ('race_history', RaceHistory, self.race_rows()),
+        ):
+            self.progress(f"Loading {name}...")
+            results[name] = bulk_load(model, rows, chunk_size=5000, defer_indexes=True, commit=False)
+            self.progress(
+                f"  {results[name]['rows']} rows in {results[name]['seconds']}s "
+                f"({results[name]['rows_per_second']} rows/s)"
+            )
+
+        dialect = db.session.connection().dialect.name
+        for name, statements in (('leaderboards', LEADERBOARD_SQL), ('course_records', COURSE_RECORD_SQL)):
+            self.progress(f"Aggregating {name}...")
+            step_started = time.perf_counter()
+            result = db.session.execute(
+                text(statements.get(dialect, statements['sqlite'])),
+                {'first_game_id': self.first_game_id}
+            )
+            results[name] = {
+                'rows': result.rowcount,
+                'seconds': round(time.perf_counter() - step_started, 3),
+            }
+        return results
+
+
+def generate_dataset(users, races, seed=42, replay_fraction=0.02, progress=None):
+    """Generate a dataset inside the current app context"""
+    generator = DatasetGenerator(
+        users=users, races=races, seed=seed,
+        replay_fraction=replay_fraction, progress=progress
+    )
+    return generator.generate()
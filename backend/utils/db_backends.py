@@ -0,0 +1,275 @@
+"""Database backend selection.
+
+The game runs on SQLite by default and on PostgreSQL when
+``DATABASE_BACKEND = 'postgresql'`` (or a ``postgresql://`` DATABASE_URL) is
+configured. Each backend supplies its own connection pool settings and
+connect-time tuning. This module only depends on SQLAlchemy so manage.py can
+use it without importing the Flask app.
+"""
+import sqlite3
+from pathlib import Path
+from sqlalchemy import JSON, create_engine, event
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import QueuePool
+
+# JSON column that is stored as JSONB on PostgreSQL
+JSONType = JSON().with_variant(JSONB(), 'postgresql')
+
+
+def _setting(config, name, default=None):
+    """Read a setting from a Flask config mapping or a Config class"""
+    if isinstance(config, dict):
+        value = config.get(name)
+    else:
+        value = getattr(config, name, None)
+    return default if value is None else value
+
+
+class DatabaseBackend:
+    """Base class for a configured database backend"""
+    name = None
+
+    def __init__(self, config):
+        self.config = config
+
+    @property
+    def uri(self):
+        raise NotImplementedError
+
+    def engine_options(self):
+        """Keyword arguments for create_engine / SQLALCHEMY_ENGINE_OPTIONS"""
+        return {}
+
+    def install(self, engine):
+        """Attach per-connection tuning to an engine"""
+
+    def prepare(self):
+        """Make sure the database location exists"""
+
+    def create_engine(self, **overrides):
+        """Create a tuned standalone engine (used outside the Flask app)"""
+        options = dict(self.engine_options(), **overrides)
+        engine = create_engine(self.uri, **options)
+        self.install(engine)
+        return engine
+
+    @property
+    def read_split(self):
+        """Whether read-intent queries get their own connection pool"""
+        return bool(_setting(self.config, 'DB_READ_SPLIT', False)) and self.read_uri is not None
+
+    @property
+    def read_uri(self):
+        return None
+
+    def create_read_engine(self):
+        """Engine for read-intent queries, or None without a read split"""
+        return None
+
+
+class SQLiteBackend(DatabaseBackend):
+    """File-backed SQLite with WAL and a small shared connection pool"""
+    name = 'sqlite'
+
+    PRAGMAS = (
+        # New databases free pages incrementally (see utils/db_maintenance);
+        # existing ones keep their mode until a full VACUUM
+        ('auto_vacuum', 'INCREMENTAL'),
+        # Write-Ahead Logging for better concurrency
+        ('journal_mode', 'WAL'),
+        # Optimize for speed over durability
+        ('synchronous', 'NORMAL'),
+        # Memory-mapped I/O for better performance
+        ('mmap_size', 30000000000),
+        # Increase cache size (negative = KiB)
+        ('cache_size', -2000),
+        # Keep temp tables and indexes in memory
+        ('temp_store', 'MEMORY'),
+    )
+
+    @property
+    def db_path(self):
+        url = _setting(self.config, 'DATABASE_URL')
+        if url and url.startswith('sqlite'):
+            return Path(make_url(url).database)
+        return Path(_setting(self.config, 'DB_PATH'))
+
+    @property
+    def uri(self):
+        url = _setting(self.config, 'DATABASE_URL')
+        if url and url.startswith('sqlite'):
+            return url
+        return f'sqlite:///{self.db_path}'
+
+    def engine_options(self):
+        if self.read_split:
+            # SQLite allows one writer at a time; with readers moved to
+            # their own pool, writers queue on a single connection instead
+            # of contending for the database lock
+            pool_size = _setting(self.config, 'DB_WRITER_POOL_SIZE', 1)
+            max_overflow = 0
+        else:
+            pool_size = _setting(self.config, 'DB_POOL_SIZE', 5)
+            max_overflow = _setting(self.config, 'DB_MAX_OVERFLOW', 10)
+        return {
+            'poolclass': QueuePool,
+            'pool_size': pool_size,
+            'max_overflow': max_overflow,
+            'pool_timeout': _setting(self.config, 'DB_POOL_TIMEOUT', 30),
+            # Connections are handed between eventlet greenlets and threads
+            'connect_args': {
+                'check_same_thread': False,
+                'timeout': _setting(self.config, 'DB_BUSY_TIMEOUT', 30),
+            },
+        }
+
+    @property
+    def read_uri(self):
+        # WAL lets any number of mode=ro connections read alongside the writer
+        return f'sqlite:///file:{self.db_path}?mode=ro&uri=true'
+
+    def create_read_engine(self):
+        if not self.read_split:
+            return None
+        engine = create_engine(
+            self.read_uri,
+            poolclass=QueuePool,
+            pool_size=_setting(self.config, 'DB_READ_POOL_SIZE', 8),
+            max_overflow=_setting(self.config, 'DB_READ_MAX_OVERFLOW', 8),
+            pool_timeout=_setting(self.config, 'DB_POOL_TIMEOUT', 30),
+            connect_args={'check_same_thread': False},
+        )
+
+        @event.listens_for(engine, 'connect')
+        def set_reader_pragma(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            cursor.execute('PRAGMA query_only=ON')
+            cursor.execute('PRAGMA mmap_size=30000000000')
+            cursor.execute('PRAGMA cache_size=-2000')
+            cursor.execute('PRAGMA temp_store=MEMORY')
+            cursor.close()
+
+        return engine
+
+    def install(self, engine):
+        pragmas = self.PRAGMAS
+
+        @event.listens_for(engine, 'connect')
+        def set_sqlite_pragma(dbapi_connection, connection_record):
+            if not isinstance(dbapi_connection, sqlite3.Connection):
+                return
+            cursor = dbapi_connection.cursor()
+            for pragma, value in pragmas:
+                cursor.execute(f'PRAGMA {pragma}={value}')
+            cursor.close()
+
+    def prepare(self):
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+
+
+def _postgres_url(url):
+    """Pin the psycopg2 driver; SQLAlchemy no longer accepts postgres:// and
+    newer releases default a bare postgresql:// to psycopg 3"""
+    for scheme in ('postgres://', 'postgresql://'):
+        if url.startswith(scheme):
+            return 'postgresql+psycopg2://' + url[len(scheme):]
+    return url
+
+
+class PostgresBackend(DatabaseBackend):
+    """PostgreSQL through psycopg2 with a pre-pinged, recycled pool"""
+    name = 'postgresql'
+
+    @property
+    def uri(self):
+        url = _setting(self.config, 'DATABASE_URL')
+        if url:
+            return _postgres_url(url)
+        return 'postgresql+psycopg2://{user}:{password}@{host}:{port}/{name}'.format(
+            user=_setting(self.config, 'DB_USER', 'postgres'),
+            password=_setting(self.config, 'DB_PASSWORD', 'postgres'),
+            host=_setting(self.config, 'DB_HOST', 'localhost'),
+            port=_setting(self.config, 'DB_PORT', '5432'),
+            name=_setting(self.config, 'DB_NAME', 'space_racing'),
+        )
+
+    def engine_options(self):
+        statement_timeout = _setting(self.config, 'DB_STATEMENT_TIMEOUT_MS', 15000)
+        return {
+            'pool_size': _setting(self.config, 'DB_POOL_SIZE', 10),
+            'max_overflow': _setting(self.config, 'DB_MAX_OVERFLOW', 20),
+            'pool_timeout': _setting(self.config, 'DB_POOL_TIMEOUT', 30),
+            'pool_recycle': _setting(self.config, 'DB_POOL_RECYCLE', 1800),
+            'pool_pre_ping': _setting(self.config, 'DB_POOL_PRE_PING', True),
+            'connect_args': {
+                'application_name': 'halo-drive',
+                'options': f'-c statement_timeout={statement_timeout}',
+            },
+        }
+
+    @property
+    def read_uri(self):
+        # Point at a streaming replica to offload reads from the primary
+        url = _setting(self.config, 'DATABASE_READ_URL')
+        return _postgres_url(url) if url else None
+
+    def create_read_engine(self):
+        if not self.read_split:
+            return None
+        options = self.engine_options()
+        options['pool_size'] = _setting(self.config, 'DB_READ_POOL_SIZE', options['pool_size'])
+        engine = create_engine(self.read_uri, **options)
+        self.install(engine)
+        return engine
+
+    def install(self, engine):
+        @event.listens_for(engine, 'connect')
+        def set_session_defaults(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            # Don't let an abandoned transaction pin row locks forever
+            cursor.execute("SET idle_in_transaction_session_timeout = '60s'")
+            cursor.close()
+
+
+BACKENDS = {
+    SQLiteBackend.name: SQLiteBackend,
+    PostgresBackend.name: PostgresBackend,
+}
+
+
+def get_backend(config):
+    """Return the backend selected by DATABASE_BACKEND or DATABASE_URL"""
+    name = _setting(config, 'DATABASE_BACKEND')
+    url = _setting(config, 'DATABASE_URL')
+    if not name:
+        name = 'postgresql' if url and url.startswith(('postgres://', 'postgresql')) else 'sqlite'
+    if name in ('postgres', 'psql'):
+        name = 'postgresql'
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown database backend: {name}")
+    return BACKENDS[name](config)
+
+
+def configure_database(app):
+    """Set the database URI and engine options; call before db.init_app"""
+    backend = get_backend(app.config)
+    backend.prepare()
+    app.config['SQLALCHEMY_DATABASE_URI'] = backend.uri
+    options = backend.engine_options()
+    options.update(app.config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = options
+    app.extensions['db_backend'] = backend
+    return backend
+
+
+def install_database_backend(app, db):
+    """Attach backend tuning to the app's engine; call after db.init_app"""
+    backend = app.extensions.get('db_backend') or configure_database(app)
+    with app.app_context():
+        backend.install(db.engine)
+    
+    read_engine = backend.create_read_engine()
+    if read_engine is not None:
+        app.extensions['db_read_engine'] = read_engine
+    return backend
@@ -0,0 +1,284 @@
+"""Incremental SQLite maintenance.
+
+Replaces the stop-the-world ``VACUUM`` with small steps that run on the
+background scheduler: ``PRAGMA incremental_vacuum`` in page batches,
+``ANALYZE`` of tables whose estimated row counts drifted since their
+statistics were gathered, ``PRAGMA optimize``, and WAL checkpoints. Every
+step checks a time budget before starting and does bounded work: vacuum
+batches of vacuum_step_pages, ANALYZE sampling capped by analysis_limit,
+row counts estimated from max(rowid) instead of scanned. The heavier steps
+only run while the server is quiet. A passive checkpoint runs every time,
+and the WAL is truncated only after a passive checkpoint has caught up.
+Uses the stdlib sqlite3 module so manage.py can share it.
+"""
+import sqlite3
+import time
+from datetime import datetime
+from pathlib import Path
+from threading import Lock
+
+AUTO_VACUUM_INCREMENTAL = 2
+
+
+class DatabaseMaintenance:
+    """Budgeted maintenance steps with exported WAL statistics"""
+    def __init__(self):
+        self.lock = Lock()
+        self.db_path = None
+        self.budget_seconds = 2.0
+        self.vacuum_step_pages = 256
+        self.min_free_pages = 64
+        self.analyze_drift = 0.2
+        self.analysis_limit = 1000
+        self.wal_truncate_bytes = 64 * 1024 * 1024
+        self.max_quiet_qps = 20.0
+        self.busy_timeout = 5.0
+        self.activity = 0
+        self.activity_since = time.monotonic()
+        self.last_report = None
+        self.analyzed_estimates = {}  # {table: estimate_rows at last ANALYZE}
+        self.stats = {
+            'runs': 0,
+            'wal_bytes': 0,
+            'wal_frames': 0,
+            'checkpointed_frames': 0,
+            'checkpoint_lag_frames': 0,
+            'last_checkpoint_at': None,
+            'last_truncate_at': None,
+            'freelist_pages': 0,
+            'page_count': 0,
+            'auto_vacuum': None,
+        }
+
+    def configure(self, db_path, **settings):
+        self.db_path = Path(db_path)
+        for name, value in settings.items():
+            if value is not None and hasattr(self, name):
+                setattr(self, name, value)
+
+    def note_activity(self, queries=1):
+        """Count database work; maintenance backs off when this is busy"""
+        self.activity += queries
+
+    def activity_rate(self):
+        elapsed = max(time.monotonic() - self.activity_since, 1e-6)
+        return self.activity / elapsed
+
+    def is_quiet(self):
+        return self.activity_rate() <= self.max_quiet_qps
+
+    def connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=self.busy_timeout, isolation_level=None)
+        conn.execute(f'PRAGMA analysis_limit={int(self.analysis_limit)}')
+        return conn
+
+    def wal_path(self):
+        return Path(f'{self.db_path}-wal')
+
+    # Steps
+    def incremental_vacuum(self, conn, deadline):
+        """Release free pages back to the filesystem in small batches"""
+        if conn.execute('PRAGMA auto_vacuum').fetchone()[0] != AUTO_VACUUM_INCREMENTAL:
+            return {'skipped': 'auto_vacuum is not INCREMENTAL (see --full-vacuum)'}
+        released = 0
+        while time.monotonic() < deadline:
+            free = conn.execute('PRAGMA freelist_count').fetchone()[0]
+            if free <= self.min_free_pages:
+                break
+            # execute() only steps the pragma once (one page); a script runs
+            # it to completion
+            conn.executescript(f'PRAGMA incremental_vacuum({self.vacuum_step_pages})')
+            remaining = conn.execute('PRAGMA freelist_count').fetchone()[0]
+            if remaining >= free:
+                break
+            released += free - remaining
+        return {'pages_released': released}
+
+    def estimate_rows(self, conn, table):
+        """Row count estimate from max(rowid), one b-tree descent.
+
+        Deleted rows still count until their rowids are reused; returns
+        None for WITHOUT ROWID tables.
+        """
+        try:
+            return conn.execute(f'SELECT max(rowid) FROM "{table}"').fetchone()[0] or 0
+        except sqlite3.OperationalError:
+            return None
+
+    def analyze_drifted(self, conn, deadline):
+        """ANALYZE tables whose estimated row count moved by more than analyze_drift"""
+        analyzed_counts = {}
+        try:
+            for table, stat in conn.execute('SELECT tbl, stat FROM sqlite_stat1'):
+                analyzed_counts.setdefault(table, int(stat.split()[0]))
+        except sqlite3.OperationalError:
+            pass  # No statistics gathered yet
+        tables = [row[0] for row in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'"
+        )]
+        done = []
+        for table in tables:
+            if time.monotonic() >= deadline:
+                break
+            estimate = self.estimate_rows(conn, table)
+            if estimate is None:
+                continue
+            # Compare like with like: the estimate taken when we last
+            # analyzed, or the exact count ANALYZE stored before a restart
+            baseline = self.analyzed_estimates.get(table, analyzed_counts.get(table))
+            if baseline is None:
+                drifted = estimate > 0
+            else:
+                drifted = abs(estimate - baseline) > self.analyze_drift * max(baseline, 1)
+            if drifted:
+                conn.execute(f'ANALYZE "{table}"')
+                self.analyzed_estimates[table] = estimate
+                done.append(table)
+        return {'analyzed': done}
+
+    def optimize(self, conn, deadline):
+        if time.monotonic() >= deadline:
+            return {'skipped': 'budget'}
+        conn.execute('PRAGMA optimize')
+        return {}
+
+    def checkpoint(self, conn, mode='PASSIVE'):
+        busy, wal_frames, checkpointed = conn.execute(f'PRAGMA wal_checkpoint({mode})').fetchone()
+        now = datetime.utcnow().isoformat()
+        # (-1, -1) means the database is not in WAL mode
+        wal_frames, checkpointed = max(wal_frames, 0), max(checkpointed, 0)
+        self.stats.update({
+            'wal_frames': wal_frames,
+            'checkpointed_frames': checkpointed,
+            'checkpoint_lag_frames': wal_frames - checkpointed,
+        })
+        if not busy:
+            self.stats['last_checkpoint_at'] = now
+            if mode == 'TRUNCATE':
+                self.stats['last_truncate_at'] = now
+        return {'mode': mode, 'busy': bool(busy), 'wal_frames': wal_frames, 'checkpointed': checkpointed}
+
+    def truncate_wal(self, conn, deadline):
+        """Reset the WAL file once a passive checkpoint has copied every frame.
+
+        With nothing left to copy, TRUNCATE only waits for readers to move
+        off the WAL; the wait is capped at what is left of the budget.
+        """
+        wait = min(max(deadline - time.monotonic(), 0), self.busy_timeout)
+        conn.execute(f'PRAGMA busy_timeout={int(wait * 1000)}')
+        try:
+            return self.checkpoint(conn, 'TRUNCATE')
+        finally:
+            conn.execute(f'PRAGMA busy_timeout={int(self.busy_timeout * 1000)}')
+
+    def refresh_stats(self, conn=None):
+        wal = self.wal_path()
+        self.stats['wal_bytes'] = wal.stat().st_size if wal.exists() else 0
+        if conn is not None:
+            self.stats['freelist_pages'] = conn.execute('PRAGMA freelist_count').fetchone()[0]
+            self.stats['page_count'] = conn.execute('PRAGMA page_count').fetchone()[0]
+            self.stats['auto_vacuum'] = conn.execute('PRAGMA auto_vacuum').fetchone()[0]
+        return dict(self.stats)
+
+    def run(self, budget_seconds=None, force=False):
+        """Run one maintenance pass; force ignores the traffic check"""
+        if self.db_path is None or not self.db_path.exists():
+            return None
+        if not self.lock.acquire(blocking=False):
+            return None  # Previous pass still running
+        started = time.monotonic()
+        budget = self.budget_seconds if budget_seconds is None else budget_seconds
+        deadline = started + budget if budget else float('inf')
+        quiet = force or self.is_quiet()
+        report = {'started_at': datetime.utcnow().isoformat(), 'quiet': quiet, 'steps': {}}
+        try:
+            conn = self.connect()
+            try:
+                if quiet:
+                    for name, step in (
+                        ('incremental_vacuum', self.incremental_vacuum),
+                        ('analyze', self.analyze_drifted),
+                        ('optimize', self.optimize),
+                    ):
+                        step_start = time.monotonic()
+                        try:
+                            result = step(conn, deadline)
+                        except sqlite3.OperationalError as e:
+                            # Usually SQLITE_BUSY; try again next pass
+                            result = {'error': str(e)}
+                        result['seconds'] = round(time.monotonic() - step_start, 4)
+                        report['steps'][name] = result
+
+                self.refresh_stats()
+                try:
+                    result = report['steps']['checkpoint'] = self.checkpoint(conn, 'PASSIVE')
+                    if (quiet and not result['busy'] and result['wal_frames'] == result['checkpointed']
+                            and self.stats['wal_bytes'] > self.wal_truncate_bytes
+                            and time.monotonic() < deadline):
+                        report['steps']['truncate'] = self.truncate_wal(conn, deadline)
+                except sqlite3.OperationalError as e:
+                    report['steps']['checkpoint'] = {'mode': 'PASSIVE', 'error': str(e)}
+                self.refresh_stats(conn)
+            finally:
+                conn.close()
+        finally:
+            self.activity = 0
+            self.activity_since = time.monotonic()
+            self.stats['runs'] += 1
+            report['seconds'] = round(time.monotonic() - started, 4)
+            self.last_report = report
+            self.lock.release()
+        return report
+
+    def full_vacuum(self, incremental=True):
+        """Blocking VACUUM; also switches auto_vacuum to INCREMENTAL"""
+        conn = sqlite3.connect(self.db_path, timeout=self.busy_timeout, isolation_level=None)
+        try:
+            if incremental:
+                conn.execute('PRAGMA auto_vacuum=INCREMENTAL')
+            conn.execute('VACUUM')
+        finally:
+            conn.close()
+
+    def snapshot(self):
+        stats = self.refresh_stats()
+        stats['wal_size_mb'] = round(stats['wal_bytes'] / 1024 / 1024, 2)
+        stats['activity_qps'] = round(self.activity_rate(), 2)
+        stats['last_run'] = self.last_report
+        return stats
+
+
+# Global maintenance instance
+db_maintenance = DatabaseMaintenance()
+
+
+def init_db_maintenance(app, scheduler=None):
+    """Schedule maintenance passes for the SQLite backend"""
+    backend = app.extensions.get('db_backend')
+    if backend is None or backend.name != 'sqlite':
+        return None
+    if not app.config.get('DB_MAINTENANCE_ENABLED', True):
+        return None
+
+    db_maintenance.configure(
+        backend.db_path,
+        budget_seconds=app.config.get('DB_MAINTENANCE_BUDGET_SECONDS'),
+        max_quiet_qps=app.config.get('DB_MAINTENANCE_MAX_QPS'),
+        wal_truncate_bytes=app.config.get('DB_MAINTENANCE_WAL_TRUNCATE_BYTES'),
+        analyze_drift=app.config.get('DB_MAINTENANCE_ANALYZE_DRIFT'),
+    )
+    query_stats = app.extensions.get('query_stats')
+    if query_stats is not None:
+        query_stats.listeners.append(lambda scope, count, db_ms: db_maintenance.note_activity(count))
+
+    if scheduler is not None:
+        scheduler.add_job(
+            func=db_maintenance.run,
+            trigger='interval',
+            seconds=app.config.get('DB_MAINTENANCE_INTERVAL', 300),
+            id='db_maintenance',
+            replace_existing=True,
+            max_instances=1
+        )
+    app.extensions['db_maintenance'] = db_maintenance
+    return db_maintenance
@@ -0,0 +1,72 @@
+"""Read/write routing for the Flask-SQLAlchemy session.
+
+Routes and socket handlers declare read intent with ``@read_only`` (or the
+``db_intent('read')`` context manager). While read intent is active, queries
+go to a separate pool of read-only connections and the primary engine is
+left to writers; flushes always use the primary engine. Without a
+declaration everything goes to the primary engine, as before.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from flask import current_app, has_app_context
+
+try:
+    # Flask-SQLAlchemy>=3
+    from flask_sqlalchemy.session import Session as _BaseSession
+except ImportError:
+    _BaseSession = None
+
+READ = 'read'
+WRITE = 'write'
+
+_db_intent = ContextVar('db_intent', default=WRITE)
+
+
+def current_intent():
+    return _db_intent.get()
+
+
+@contextmanager
+def db_intent(intent):
+    """Run a block with the given database intent ('read' or 'write')"""
+    token = _db_intent.set(intent)
+    try:
+        yield
+    finally:
+        _db_intent.reset(token)
+
+
+def read_only(f):
+    """Declare that a route or socket handler only reads from the database"""
+    @wraps(f)
+    def wrapper(*args, **kwargs):
+        with db_intent(READ):
+            return f(*args, **kwargs)
+    return wrapper
+
+
+def get_read_engine():
+    if not has_app_context():
+        return None
+    return current_app.extensions.get('db_read_engine')
+
+
+if _BaseSession is not None:
+    class RoutingSession(_BaseSession):
+        """Session that sends read-intent queries to the read-only pool"""
+        def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+            if bind is None and not self._flushing and _db_intent.get() == READ:
+                reader = get_read_engine()
+                if reader is not None:
+                    return reader
+            return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+else:
+    RoutingSession = None
+
+
+def session_options():
+    """SQLAlchemy(session_options=...) enabling routing when supported"""
+    if RoutingSession is None:
+        return {}
+    return {'class_': RoutingSession}
@@ -1,6 +1,9 @@
 import time
 from functools import wraps
+from itertools import groupby, islice
+from sqlalchemy import event
 from sqlalchemy.exc import OperationalError, IntegrityError
+from sqlalchemy.orm import Session
 
 def with_retry(max_retries=3, delay=0.1):
     """Decorator to retry database operations on failure"""
@@ -27,10 +30,158 @@ def optimize_query(query):
     ).enable_eagerloads(True)
 
 def batch_insert(model, items, batch_size=100):
-    """Insert items in batches"""
+    """Insert items (dicts, which may differ in keys) in one transaction"""
+    return bulk_load(model, items, chunk_size=batch_size)
+
+
+BULK_MIN_CHUNK = 100
+BULK_MAX_CHUNK = 50000
+BULK_TARGET_SECONDS = 0.25  # Aim for chunks of about this duration
+
+
+def _conflict_insert(table, dialect_name, on_conflict, conflict_columns, update_columns, row_keys=()):
+    """INSERT with an ON CONFLICT clause for SQLite or PostgreSQL.
+
+    An upsert without ``update_columns`` updates only the columns the rows
+    supply (``row_keys``), so columns a row leaves out keep their values.
+    """
+    if dialect_name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect_name == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        raise ValueError(f"ON CONFLICT is not supported on {dialect_name}")
+
+    stmt = insert(table)
+    if conflict_columns is None:
+        conflict_columns = [column.name for column in table.primary_key.columns]
+    if on_conflict == 'ignore':
+        return stmt.on_conflict_do_nothing(index_elements=conflict_columns)
+    if on_conflict == 'update':
+        if update_columns is None:
+            update_columns = [
+                column.name for column in table.columns
+                if column.name in row_keys and column.name not in conflict_columns
+                and not column.primary_key
+            ]
+        if not update_columns:
+            return stmt.on_conflict_do_nothing(index_elements=conflict_columns)
+        return stmt.on_conflict_do_update(
+            index_elements=conflict_columns,
+            set_={name: stmt.excluded[name] for name in update_columns}
+        )
+    raise ValueError(f"Unknown on_conflict mode: {on_conflict}")
+
+
+def bulk_load(model, rows, chunk_size=1000, on_conflict=None, conflict_columns=None,
+              update_columns=None, defer_indexes=False, session=None, commit=True):
+    """Stream rows (dicts) into a table in one transaction.
+
+    Rows are pulled from the iterable in chunks and sent with Core
+    executemany, so only one chunk is in memory at a time. The chunk size
+    adapts so each executemany takes about BULK_TARGET_SECONDS.
+    executemany needs the same keys in every row, so each chunk is sent as
+    runs of consecutive rows sharing a key set; order is kept.
+    ``on_conflict`` is None, 'ignore' or 'update' (upsert on
+    ``conflict_columns``, default the primary key; ``update_columns``
+    defaults to the non-key columns present in the rows). With ``defer_indexes``
+    the table's non-unique indexes are dropped for the load and rebuilt
+    before commit. Returns load statistics including rows per second.
+    """
+    from backend.models import db
+
+    table = getattr(model, '__table__', model)
+    session = session or db.session
+    # Use the session's connection: the SQLite writer pool has one slot
+    conn = session.connection()
+    dialect_name = conn.dialect.name
+
+    if on_conflict not in (None, 'ignore', 'update'):
+        raise ValueError(f"Unknown on_conflict mode: {on_conflict}")
+    statements = {}  # {frozenset(row keys): insert}
+
+    def statement_for(keys):
+        stmt = statements.get(keys)
+        if stmt is None:
+            # Upserts only update the columns this key set supplies
+            stmt = statements[keys] = _conflict_insert(
+                table, dialect_name, on_conflict, conflict_columns, update_columns, row_keys=keys
+            ) if on_conflict else table.insert()
+        return stmt
+
+    deferred = [index for index in table.indexes if not index.unique] if defer_indexes else []
+    iterator = iter(rows)
+    total = 0
+    chunks = 0
+    size = max(BULK_MIN_CHUNK, min(chunk_size, BULK_MAX_CHUNK))
+    started = time.perf_counter()
+    try:
+        while True:
+            chunk = list(islice(iterator, size))
+            if not chunk:
+                break
+            chunk_started = time.perf_counter()
+            for keys, run in groupby(chunk, key=frozenset):
+                conn.execute(statement_for(keys), list(run))
+            elapsed = time.perf_counter() - chunk_started
+            total += len(chunk)
+            chunks += 1
+            if chunks == 1:
+                # pysqlite only opens the transaction at the first INSERT;
+                # from here on the DDL is part of it and rolls back with
+                # the load
+                for index in deferred:
+                    index.drop(conn, checkfirst=True)
+            if elapsed > 0 and len(chunk) == size:
+                scale = max(0.5, min(2.0, BULK_TARGET_SECONDS / elapsed))
+                size = int(max(BULK_MIN_CHUNK, min(BULK_MAX_CHUNK, size * scale)))
+
+        index_started = time.perf_counter()
+        for index in deferred if chunks else ():
+            index.create(conn)
+        index_seconds = time.perf_counter() - index_started
+
+        if commit:
+            session.commit()
+    except Exception:
+        session.rollback()
+        raise
+
+    seconds = time.perf_counter() - started
+    return {
+        'table': table.name,
+        'rows': total,
+        'chunks': chunks,
+        'final_chunk_size': size,
+        'seconds': round(seconds, 3),
+        'index_seconds': round(index_seconds, 3),
+        'rows_per_second': round(total / seconds, 1) if seconds else None,
+        'deferred_indexes': [index.name for index in deferred] if chunks else [],
+    }
+
+def run_after_commit(callback, session=None):
+    """Run callback once the current transaction commits.
+
+    Callbacks are dropped if the transaction rolls back, so in-memory
+    caches never reflect writes that did not make it to the database.
+    """
     from backend.models import db
-    
-    for i in range(0, len(items), batch_size):
-        batch = items[i:i + batch_size]
-        db.session.bulk_insert_mappings(model, batch)
-        db.session.commit() 
\ No newline at end of file
+
+    session = session or db.session()
+    session.info.setdefault('after_commit_callbacks', []).append(callback)
+
+
+@event.listens_for(Session, 'after_commit')
+def _run_after_commit_callbacks(session):
+    callbacks = session.info.pop('after_commit_callbacks', None)
+    for callback in callbacks or ():
+        try:
+            callback()
+        except Exception as e:
+            print(f"Error in after-commit callback: {e}")
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _discard_after_commit_callbacks(session, previous_transaction):
+    if previous_transaction.parent is None:
+        session.info.pop('after_commit_callbacks', None)
@@ -0,0 +1,343 @@
+"""Always-on flight recorder: a fixed-size binary ring buffer per process.
+
+Every Socket.IO event handled, every inbound packet and every pass of the
+lobby broadcast loop is written as one 36-byte record:
+
+    time (perf_counter ns), tick, kind, flags, event type, game id,
+    session id (first 8 bytes), payload bytes, duration (us)
+
+Recording is a single ``struct.pack_into`` into a preallocated bytearray,
+so the buffer never grows and old records are simply overwritten.
+
+The buffer is written to ``FLIGHT_RECORDER_DIR`` on demand (admin endpoint
+or SIGUSR2), on unhandled exceptions and on anomalies: a loop pass that
+overruns its interval, or a handler slower than
+``FLIGHT_RECORDER_SLOW_HANDLER_MS``. Automatic dumps are rate limited.
+
+INBOUND records carry the engine.io session id; EVENT records carry the
+Socket.IO sid. The reading side (``load_dump``/``format_records`` and the
+CLI) has no Flask dependency::
+
+    python -m backend.utils.flight_recorder logs/flight/<dump>.bin --game 42
+    python manage.py --decode-flight-recording logs/flight/<dump>.bin
+"""
+import argparse
+import json
+import os
+import struct
+import sys
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+MAGIC = b'HALOFR01'
+RECORD = struct.Struct('<qIBBHi8sII')
+RECORD_SIZE = RECORD.size
+_pack_into = RECORD.pack_into
+_clock = time.perf_counter_ns
+DEFAULT_CAPACITY = 65536  # Records; 36 bytes each
+MAX_EVENT_TYPES = 256  # Inbound names are client controlled; extra names share 'other'
+MAX_DUMPS = 20
+U32_MAX = 0xFFFFFFFF
+
+# Record kinds
+EVENT = 1  # A Socket.IO handler ran
+INBOUND = 2  # A packet arrived (engine.io layer)
+TICK = 3  # One pass of a server loop
+MARK = 4  # An anomaly or dump trigger
+KIND_NAMES = {EVENT: 'event', INBOUND: 'inbound', TICK: 'tick', MARK: 'mark'}
+
+# Flags
+FLAG_ERROR = 1
+FLAG_SLOW = 2
+FLAG_OVERRUN = 4
+FLAG_NAMES = ((FLAG_ERROR, 'error'), (FLAG_SLOW, 'slow'), (FLAG_OVERRUN, 'overrun'))
+
+
+class FlightRecorder:
+    """Ring buffer of fixed-size records with interned event type names"""
+    def __init__(self, capacity=DEFAULT_CAPACITY):
+        self.lock = threading.Lock()
+        self.capacity = capacity
+        self.buffer = bytearray(RECORD.size * capacity)
+        self.written = 0  # Records ever written; the slot is written % capacity
+        self.tick = 0
+        self.event_types = {'other': 0}
+        self.event_names = ['other']
+        self.output_dir = Path('logs') / 'flight'
+        self.slow_handler_us = 250000
+        self.dump_cooldown = 60.0
+        self.last_auto_dump = 0.0
+        self.dumps = []  # [(path, reason)], newest last
+
+    def event_type(self, name):
+        code = self.event_types.get(name)
+        if code is None:
+            with self.lock:
+                code = self.event_types.get(name)
+                if code is None:
+                    if len(self.event_names) >= MAX_EVENT_TYPES:
+                        return 0
+                    code = self.event_types[name] = len(self.event_names)
+                    self.event_names.append(name)
+        return code
+
+    def record(self, kind, event, sid=b'', game_id=0, payload=0, duration_us=0, flags=0, now_ns=None):
+        """Append one record (the hot path: one pack_into, no allocation)"""
+        index = self.written
+        self.written = index + 1
+        if duration_us > U32_MAX:
+            duration_us = U32_MAX
+        _pack_into(self.buffer, (index % self.capacity) * RECORD_SIZE, now_ns or _clock(),
+                   self.tick, kind, flags, event, game_id, sid, payload & U32_MAX, duration_us)
+
+    # Instrumentation points
+    def record_event(self, name, sid, game_id, duration_us, error=False, now_ns=None):
+        """A finished handler; now_ns saves a clock read when the caller has one"""
+        if game_id.__class__ is not int or not 0 <= game_id <= 0x7FFFFFFF:
+            game_id = 0  # Client supplied; must never make pack_into raise
+        flags = FLAG_ERROR if error else 0
+        if duration_us >= self.slow_handler_us:
+            flags |= FLAG_SLOW
+        code = self.event_types.get(name)
+        if code is None:
+            code = self.event_type(name)
+        self.record(EVENT, code, sid.encode() if sid else b'', game_id, 0, duration_us, flags, now_ns)
+        if flags:
+            self.anomaly(f"{'error' if error else 'slow'}_{name}")
+
+    def record_packet(self, eio_sid, data):
+        """Inbound engine.io message: size and, for text events, the name"""
+        code = 0
+        if data.__class__ is str:
+            start = data.find('["', 0, 16)
+            if start >= 0:
+                end = data.find('"', start + 2, start + 66)
+                if end > 0:
+                    name = data[start + 2:end]
+                    code = self.event_types.get(name)
+                    if code is None:
+                        code = self.event_type(name)
+        self.record(INBOUND, code, eio_sid.encode() if eio_sid else b'', 0, len(data))
+
+    def record_tick(self, loop, seconds, overran):
+        self.tick = (self.tick + 1) & U32_MAX
+        self.record(TICK, self.event_type(loop), b'', 0, 0, int(seconds * 1e6),
+                    FLAG_OVERRUN if overran else 0)
+        if overran:
+            self.anomaly(f'overrun_{loop}')
+
+    def anomaly(self, reason):
+        """Mark the buffer and dump it, at most once per cooldown"""
+        self.record(MARK, self.event_type(reason))
+        now = time.monotonic()
+        if now - self.last_auto_dump < self.dump_cooldown:
+            return None
+        self.last_auto_dump = now
+        return self.dump(reason)
+
+    # Dumps
+    def snapshot(self):
+        """Records in chronological order, as raw bytes"""
+        written = self.written
+        data = bytes(self.buffer)
+        if written <= self.capacity:
+            return data[:written * RECORD.size]
+        split = (written % self.capacity) * RECORD.size
+        return data[split:] + data[:split]
+
+    def dump(self, reason='manual'):
+        """Write the buffer to disk; returns the file path"""
+        records = self.snapshot()
+        header = json.dumps({
+            'pid': os.getpid(),
+            'reason': reason,
+            'created': datetime.utcnow().isoformat(),
+            # Anchor for turning perf_counter_ns into wall-clock time
+            'perf_counter_ns': time.perf_counter_ns(),
+            'time_ns': time.time_ns(),
+            'record_format': RECORD.format,
+            'capacity': self.capacity,
+            'written': self.written,
+            'tick': self.tick,
+            'event_names': list(self.event_names),
+        }).encode()
+
+        safe_reason = ''.join(c if c.isalnum() or c in '-_' else '_' for c in reason)[:48]
+        try:
+            self.output_dir.mkdir(parents=True, exist_ok=True)
+            path = self.output_dir / f"{datetime.utcnow():%Y%m%d-%H%M%S-%f}_{os.getpid()}_{safe_reason}.bin"
+            with open(path, 'wb') as f:
+                f.write(MAGIC)
+                f.write(struct.pack('<I', len(header)))
+                f.write(header)
+                f.write(records)
+        except OSError as e:
+            print(f"Error writing flight recording: {e}")
+            return None
+
+        with self.lock:
+            self.dumps.append((str(path), reason))
+            while len(self.dumps) > MAX_DUMPS:
+                old_path, _ = self.dumps.pop(0)
+                try:
+                    os.remove(old_path)
+                except OSError:
+                    pass
+        return str(path)
+
+    def status(self):
+        return {
+            'capacity': self.capacity,
+            'record_bytes': RECORD.size,
+            'written': self.written,
+            'tick': self.tick,
+            'event_types': len(self.event_names),
+            'dumps': [{'path': path, 'reason': reason} for path, reason in self.dumps],
+        }
+
+
+# Global recorder instance
+flight_recorder = FlightRecorder()
+
+
+def install_exception_hooks(recorder=flight_recorder):
+    """Dump on exceptions nothing else caught, in any thread"""
+    previous_hook = sys.excepthook
+    previous_thread_hook = threading.excepthook
+
+    def excepthook(exc_type, exc, tb):
+        recorder.dump(f'unhandled_{exc_type.__name__}')
+        previous_hook(exc_type, exc, tb)
+
+    def thread_excepthook(args):
+        recorder.dump(f'unhandled_{args.exc_type.__name__}')
+        previous_thread_hook(args)
+
+    sys.excepthook = excepthook
+    threading.excepthook = thread_excepthook
+
+
+def instrument_engineio(socketio, recorder=flight_recorder):
+    """Record every inbound engine.io message before Socket.IO decodes it"""
+    server = socketio.server
+    if server is None or getattr(server, '_flight_recorder_wrapped', False):
+        return
+    original = server.eio.handlers.get('message')
+    if original is None:
+        return
+
+    def on_message(eio_sid, data):
+        recorder.record_packet(eio_sid, data)
+        return original(eio_sid, data)
+
+    server.eio.on('message', on_message)
+    server._flight_recorder_wrapped = True
+
+
+def init_flight_recorder(app, socketio):
+    if not app.config.get('FLIGHT_RECORDER_ENABLED', True):
+        return
+    recorder = flight_recorder
+    capacity = app.config.get('FLIGHT_RECORDER_CAPACITY', DEFAULT_CAPACITY)
+    if capacity != recorder.capacity and not recorder.written:
+        recorder.capacity = capacity
+        recorder.buffer = bytearray(RECORD.size * capacity)
+    recorder.output_dir = Path(app.config.get('FLIGHT_RECORDER_DIR', recorder.output_dir))
+    recorder.slow_handler_us = int(app.config.get('FLIGHT_RECORDER_SLOW_HANDLER_MS', 250) * 1000)
+    recorder.dump_cooldown = app.config.get('FLIGHT_RECORDER_DUMP_COOLDOWN', 60.0)
+
+    instrument_engineio(socketio, recorder)
+    install_exception_hooks(recorder)
+    try:
+        import signal
+        signal.signal(signal.SIGUSR2, lambda signum, frame: recorder.dump('signal'))
+    except (AttributeError, ValueError):
+        pass  # No SIGUSR2 on this platform, or not the main thread
+    app.extensions['flight_recorder'] = recorder
+
+
+# Reading side
+def load_dump(path):
+    """(header, [record dicts]) from a dump file"""
+    data = Path(path).read_bytes()
+    if data[:len(MAGIC)] != MAGIC:
+        raise ValueError(f"{path} is not a flight recording")
+    offset = len(MAGIC)
+    (header_length,) = struct.unpack_from('<I', data, offset)
+    offset += 4
+    header = json.loads(data[offset:offset + header_length])
+    offset += header_length
+
+    record = struct.Struct(header['record_format'])
+    names = header['event_names']
+    wall_offset_ns = header['time_ns'] - header['perf_counter_ns']
+    records = []
+    for fields in record.iter_unpack(data[offset:offset + (len(data) - offset) // record.size * record.size]):
+        t_ns, tick, kind, flags, event, game_id, sid, payload, duration_us = fields
+        records.append({
+            'time': datetime.utcfromtimestamp((t_ns + wall_offset_ns) / 1e9).isoformat(),
+            'tick': tick,
+            'kind': KIND_NAMES.get(kind, str(kind)),
+            'event': names[event] if event < len(names) else str(event),
+            'game_id': game_id or None,
+            'sid': sid.rstrip(b'\0').decode(errors='replace') or None,
+            'payload_bytes': payload,
+            'duration_us': duration_us,
+            'flags': [name for bit, name in FLAG_NAMES if flags & bit],
+        })
+    return header, records
+
+
+def filter_records(records, game_id=None, event=None, kind=None, sid=None, last=None):
+    selected = [
+        r for r in records
+        if (game_id is None or r['game_id'] == game_id)
+        and (event is None or r['event'] == event)
+        and (kind is None or r['kind'] == kind)
+        and (sid is None or (r['sid'] or '').startswith(sid[:8]))
+    ]
+    return selected[-last:] if last else selected
+
+
+def format_records(header, records):
+    lines = [
+        f"Flight recording of pid {header['pid']}: {header['reason']} at {header['created']}",
+        f"{header['written']} records written, {min(header['written'], header['capacity'])} kept, "
+        f"tick {header['tick']}",
+        '',
+        f"{'time':26s} {'tick':>7s} {'kind':8s} {'event':24s} {'game':>7s} {'sid':8s} "
+        f"{'bytes':>7s} {'us':>9s}  flags",
+    ]
+    for r in records:
+        lines.append(
+            f"{r['time']:26s} {r['tick']:7d} {r['kind']:8s} {r['event'][:24]:24s} "
+            f"{r['game_id'] or '-':>7} {r['sid'] or '-':8s} {r['payload_bytes'] or '-':>7} "
+            f"{r['duration_us'] or '-':>9}  {','.join(r['flags'])}"
+        )
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Decode a flight recorder dump')
+    parser.add_argument('path')
+    parser.add_argument('--game', type=int, help='Only records for this game id')
+    parser.add_argument('--event', help='Only this event type')
+    parser.add_argument('--kind', choices=sorted(KIND_NAMES.values()))
+    parser.add_argument('--sid', help='Only this session id (first 8 characters match)')
+    parser.add_argument('--last', type=int, help='Only the last N matching records')
+    parser.add_argument('--json', action='store_true', help='Print JSON lines')
+    args = parser.parse_args(argv)
+
+    header, records = load_dump(args.path)
+    records = filter_records(records, args.game, args.event, args.kind, args.sid, args.last)
+    if args.json:
+        for r in records:
+            print(json.dumps(r))
+    else:
+        print(format_records(header, records))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,372 @@
+"""Per-event Socket.IO handler timing and on-demand cProfile captures.
+
+``instrument_handler`` wraps every ``@socketio.on`` handler. Each call is
+counted and timed for the metrics sinks, written to the flight recorder,
+and its wall time and CPU time go into per-event HDR-style histograms
+(``/admin/handler-stats``).
+
+An admin can arm a capture (``POST /admin/profile``) that runs cProfile over
+the next N invocations of one event, or over N seconds of a server loop
+such as ``lobby_broadcast``. When it completes, the capture writes
+``<name>.pstats`` plus ``<name>.collapsed`` (folded stacks for
+flamegraph.pl / speedscope) to ``HANDLER_PROFILE_DIR`` from a background
+thread, so the handler that completes it is not held up. Captures are per
+worker: only the process that received the admin request profiles.
+
+CPU time is thread time. Under eventlet a handler that yields on I/O may
+also be charged for other green threads that ran on the same OS thread.
+"""
+import cProfile
+import os
+import pstats
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from functools import wraps
+from pathlib import Path
+from threading import Lock, Thread
+from flask import request
+from backend.utils.flight_recorder import flight_recorder
+from backend.utils.metrics import metrics
+
+MAX_EVENTS = 64  # Bounded; extra event names share 'other'
+MAX_STACK_DEPTH = 64
+MAX_FOLDED_STACKS = 10000  # Paths under 1/N of the profile's time are dropped
+MAX_WALK_NODES = 200000
+
+
+class HdrHistogram:
+    """Log-linear histogram of integer microseconds (HDR layout).
+
+    Values below 2**SUB_BITS get exact buckets; above that each power of two
+    is split into 2**(SUB_BITS - 1) buckets, so the relative error stays
+    under 1/64 at any magnitude. Buckets are sparse.
+    """
+    SUB_BITS = 7
+
+    def __init__(self):
+        self.counts = {}
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+    def record(self, value):
+        exponent = value.bit_length() - self.SUB_BITS
+        if exponent <= 0:
+            index = value
+        else:
+            index = (exponent << (self.SUB_BITS - 1)) + (value >> exponent)
+        counts = self.counts
+        counts[index] = counts.get(index, 0) + 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def bucket_upper(self, index):
+        if index < (1 << self.SUB_BITS):
+            return index
+        exponent = (index >> (self.SUB_BITS - 1)) - 1
+        mantissa = index - (exponent << (self.SUB_BITS - 1))
+        return ((mantissa + 1) << exponent) - 1
+
+    def percentile(self, q):
+        if not self.count:
+            return None
+        target = q / 100.0 * self.count
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= target:
+                return min(self.bucket_upper(index), self.max)
+        return self.max
+
+    def summary(self):
+        """Percentiles in milliseconds"""
+        if not self.count:
+            return {'count': 0}
+        return {
+            'count': self.count,
+            'mean_ms': round(self.total / self.count / 1000.0, 3),
+            'p50_ms': round(self.percentile(50) / 1000.0, 3),
+            'p90_ms': round(self.percentile(90) / 1000.0, 3),
+            'p99_ms': round(self.percentile(99) / 1000.0, 3),
+            'p999_ms': round(self.percentile(99.9) / 1000.0, 3),
+            'max_ms': round(self.max / 1000.0, 3),
+        }
+
+
+class EventTimings:
+    def __init__(self):
+        self.wall = HdrHistogram()
+        self.cpu = HdrHistogram()
+        self.errors = 0
+
+
+# cProfile output
+def _frame_name(func):
+    filename, line, name = func
+    if filename == '~':
+        return name.replace(';', ':')  # Built-ins, e.g. <method 'execute' ...>
+    return f"{name} ({os.path.basename(filename)}:{line})".replace(';', ':')
+
+
+def collapsed_stacks(stats):
+    """Folded stacks ("a;b;c <microseconds>") rebuilt from pstats data.
+
+    cProfile keeps caller/callee edges rather than whole stacks, so the time
+    reaching a function along one path is its share of each incoming edge's
+    cumulative time, and its own time is split in that proportion. Paths
+    carrying less than 1/MAX_FOLDED_STACKS of the total are not descended
+    into and the walk stops after MAX_WALK_NODES frames, so a dense call
+    graph costs bounded time instead of one visit per distinct path.
+    """
+    entries = stats.stats
+    names = {func: _frame_name(func) for func in entries}
+    callees = {}
+    for func, (_, _, _, _, callers) in entries.items():
+        for caller, edge in callers.items():
+            callees.setdefault(caller, []).append((func, edge[3]))
+    roots = [func for func, entry in entries.items() if not entry[4]]
+
+    total = sum(entry[2] for entry in entries.values()) * 1e6
+    min_micros = max(1.0, total / MAX_FOLDED_STACKS)
+    folded = {}
+    budget = MAX_WALK_NODES
+    # (function, microseconds reaching it along this path, path so far)
+    stack = [(root, entries[root][3] * 1e6, ()) for root in roots]
+    while stack and budget:
+        func, micros, path = stack.pop()
+        budget -= 1
+        _, _, own, cumulative, _ = entries[func]
+        path = path + (names[func],)
+        fraction = min(micros / (cumulative * 1e6), 1.0) if cumulative else 1.0
+        own_micros = own * fraction * 1e6
+        if own_micros >= 1:
+            key = ';'.join(path)
+            folded[key] = folded.get(key, 0) + own_micros
+        if len(path) >= MAX_STACK_DEPTH:
+            continue
+        for callee, edge_cumulative in callees.get(func, ()):
+            callee_micros = edge_cumulative * fraction * 1e6
+            if callee_micros < min_micros or names[callee] in path:
+                continue  # Too small to show, or recursion already counted above
+            stack.append((callee, callee_micros, path))
+    return [f"{key} {int(round(micros))}" for key, micros in sorted(folded.items())]
+
+
+class ProfileCapture:
+    """cProfile over the next N calls of an event or N seconds of a loop"""
+    def __init__(self, target, kind, invocations=None, seconds=None):
+        self.target = target
+        self.kind = kind  # 'event' or 'loop'
+        self.invocations = invocations
+        self.seconds = seconds
+        self.profile = cProfile.Profile()
+        self.calls = 0
+        self.started_at = datetime.utcnow()
+        self.first_call = None
+        self.finished_at = None
+        self.files = None
+        self.writing = False
+        self.error = None
+
+    def matches(self, kind, name, handler_name=None):
+        return self.kind == kind and self.target in (name, handler_name)
+
+    def begin(self):
+        if self.first_call is None:
+            self.first_call = time.monotonic()
+
+    def done(self):
+        if self.invocations is not None and self.calls >= self.invocations:
+            return True
+        return (self.seconds is not None and self.first_call is not None
+                and time.monotonic() - self.first_call >= self.seconds)
+
+    def write(self, directory):
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        # The target comes from the admin request; keep it to one plain path segment
+        safe_target = ''.join(c if c.isalnum() or c in '-_' else '_' for c in self.target)[:48]
+        stem = f"{self.started_at:%Y%m%d-%H%M%S}_{self.kind}_{safe_target}_{os.getpid()}"
+        pstats_path = directory / f'{stem}.pstats'
+        collapsed_path = directory / f'{stem}.collapsed'
+        self.profile.dump_stats(str(pstats_path))
+        # pstats refuses an empty profile (a capture stopped before any call)
+        lines = collapsed_stacks(pstats.Stats(self.profile)) if self.profile.stats else []
+        collapsed_path.write_text(''.join(f'{line}\n' for line in lines))
+        self.files = {'pstats': str(pstats_path), 'collapsed': str(collapsed_path)}
+
+    def status(self):
+        return {
+            'target': self.target,
+            'kind': self.kind,
+            'invocations': self.invocations,
+            'seconds': self.seconds,
+            'calls': self.calls,
+            'started_at': self.started_at.isoformat(),
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+            'writing': self.writing,
+            'files': self.files,
+            'error': self.error,
+        }
+
+
+class HandlerProfiler:
+    """Per-event timings plus at most one armed profile capture"""
+    def __init__(self):
+        self.lock = Lock()
+        self.events = {}  # {event name: EventTimings}
+        self.capture = None
+        self.last_capture = None
+        self.output_dir = Path('logs') / 'profiles'
+
+    def timings(self, name):
+        timings = self.events.get(name)
+        if timings is None:
+            with self.lock:
+                if name not in self.events and len(self.events) >= MAX_EVENTS:
+                    name = 'other'
+                timings = self.events.setdefault(name, EventTimings())
+        return timings
+
+    def start_capture(self, target, kind='event', invocations=None, seconds=None):
+        """Arm a capture; returns None when one is already running"""
+        with self.lock:
+            if self.capture is not None:
+                return None
+            self.capture = ProfileCapture(target, kind, invocations, seconds)
+            return self.capture
+
+    def finish_capture(self, capture=None):
+        """Disarm the capture (or the given one if still armed) and write it.
+
+        Writing runs on its own OS thread: it is CPU bound, and the caller
+        is often a handler that still holds a database connection.
+        """
+        with self.lock:
+            if self.capture is None or (capture is not None and self.capture is not capture):
+                return None
+            capture, self.capture = self.capture, None
+        capture.finished_at = datetime.utcnow()
+        capture.writing = True
+        self.last_capture = capture
+        Thread(target=self._write_capture, args=(capture,), name='profile-capture-writer',
+               daemon=True).start()
+        return capture
+
+    def _write_capture(self, capture):
+        try:
+            capture.write(self.output_dir)
+        except Exception as e:
+            capture.error = str(e)
+            print(f"Error writing profile capture: {e}")
+        finally:
+            capture.writing = False
+
+    def profiled_call(self, capture, func, *args, **kwargs):
+        capture.begin()
+        try:
+            capture.profile.enable()
+        except ValueError as e:
+            # Another profiler (or an overlapping green thread) holds the hook
+            capture.error = str(e)
+            return func(*args, **kwargs)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            # enable/disable are called here directly so no profiler frames
+            # end up in the capture
+            capture.profile.disable()
+            capture.calls += 1
+            if capture.done():
+                self.finish_capture(capture)
+
+    @contextmanager
+    def profile_loop(self, loop):
+        """Profile one pass of a server loop while a loop capture is armed"""
+        capture = self.capture
+        if capture is None or not capture.matches('loop', loop):
+            yield
+            return
+        capture.begin()
+        try:
+            capture.profile.enable()
+        except ValueError as e:
+            capture.error = str(e)
+            yield
+            return
+        try:
+            yield
+        finally:
+            capture.profile.disable()
+            capture.calls += 1
+            if capture.done():
+                self.finish_capture(capture)
+
+    def snapshot(self):
+        with self.lock:
+            events = dict(self.events)
+        return {
+            'events': {
+                name: {
+                    'wall': timings.wall.summary(),
+                    'cpu': timings.cpu.summary(),
+                    'errors': timings.errors,
+                }
+                for name, timings in sorted(events.items())
+            },
+            'capture': self.capture.status() if self.capture else None,
+            'last_capture': self.last_capture.status() if self.last_capture else None,
+        }
+
+    def reset(self):
+        with self.lock:
+            self.events.clear()
+
+
+# Global profiler instance
+handler_profiler = HandlerProfiler()
+
+
+def instrument_handler(handler):
+    """Count, time and (when armed) profile a Socket.IO event handler"""
+    handler_name = handler.__name__
+
+    @wraps(handler)
+    def wrapper(*args, **kwargs):
+        socket_event = getattr(request, 'event', None)
+        name = socket_event['message'] if socket_event else handler_name
+        metrics.inc('socket_events_received', name)
+        timings = handler_profiler.timings(name)
+        capture = handler_profiler.capture
+
+        failed = False
+        wall_started = time.perf_counter_ns()
+        cpu_started = time.thread_time_ns()
+        try:
+            if capture is not None and capture.matches('event', name, handler_name):
+                return handler_profiler.profiled_call(capture, handler, *args, **kwargs)
+            return handler(*args, **kwargs)
+        except Exception:
+            timings.errors += 1
+            failed = True
+            raise
+        finally:
+            cpu = time.thread_time_ns() - cpu_started
+            ended = time.perf_counter_ns()
+            wall = ended - wall_started
+            timings.wall.record(wall // 1000)
+            timings.cpu.record(cpu // 1000)
+            metrics.observe('socket_handler_seconds', wall / 1e9, name)
+            data = args[0] if args and isinstance(args[0], dict) else {}
+            flight_recorder.record_event(name, getattr(request, 'sid', None),
+                                         data.get('game_id') or data.get('gameId') or 0,
+                                         wall // 1000, failed, ended)
+    return wrapper
+
+
+def init_handler_profiler(app):
+    handler_profiler.output_dir = Path(app.config.get('HANDLER_PROFILE_DIR', handler_profiler.output_dir))
+    app.extensions['handler_profiler'] = handler_profiler
@@ -0,0 +1,383 @@
+"""Workload-driven index advisor for SQLite.
+
+Replays the statement fingerprints captured in the slow-query log against a
+scratch copy of the database. Candidate indexes are derived from each
+statement's equality predicates, range predicates, ORDER BY and selected
+columns, then tried one at a time with ``EXPLAIN QUERY PLAN``. A greedy pass
+keeps the candidate with the largest estimated saving, re-plans the workload
+with it in place, and repeats. Costs are row estimates from ``sqlite_stat1``
+weighted by how often each fingerprint was seen; they rank candidates, they
+are not timings.
+
+To capture the whole workload rather than just slow statements, run the
+server for a while with ``SLOW_QUERY_THRESHOLD_MS=0``.
+"""
+import math
+import re
+import shutil
+import sqlite3
+import tempfile
+from pathlib import Path
+
+REPLAYABLE = ('select', 'update', 'delete', 'with')
+WRITE_RE = re.compile(r'^\s*(?:INSERT(?: OR \w+)? INTO|UPDATE|DELETE FROM)\s+"?(\w+)"?', re.IGNORECASE)
+TABLE_RE = re.compile(r'\b(?:FROM|JOIN|UPDATE)\s+"?(\w+)"?(?:\s+(?:AS\s+)?(\w+))?', re.IGNORECASE)
+PREDICATE_RE = re.compile(
+    r'(?:"?(\w+)"?\.)?"?(\w+)"?\s*(=|<=|>=|<|>|\bIN\b|\bIS\b|\bLIKE\b|\bBETWEEN\b)', re.IGNORECASE
+)
+ORDER_TERM_RE = re.compile(r'^\s*(?:"?(\w+)"?\.)?"?(\w+)"?(?:\s+(ASC|DESC))?', re.IGNORECASE)
+SELECT_COLUMN_RE = re.compile(r'"?(\w+)"?\."?(\w+)"?')
+CLAUSE_END_RE = re.compile(r'\b(?:GROUP BY|ORDER BY|LIMIT|HAVING)\b', re.IGNORECASE)
+ORDER_END_RE = re.compile(r'\b(?:LIMIT|OFFSET)\b', re.IGNORECASE)
+
+# SQLite plan lines
+SEARCH_RE = re.compile(
+    r'^(SEARCH|SCAN) (?:TABLE )?(\w+)(?: AS \w+)?'
+    r'(?: USING (COVERING INDEX|INDEX|INTEGER PRIMARY KEY|PRIMARY KEY) ?(\w+)?)?(?: \((.*)\))?'
+)
+SQL_KEYWORDS = {
+    'where', 'on', 'join', 'left', 'right', 'inner', 'outer', 'cross', 'natural',
+    'group', 'order', 'limit', 'set', 'using', 'union', 'select', 'values', 'as',
+}
+EQUALITY_OPS = {'=', 'in', 'is'}
+RANGE_OPS = {'<', '>', '<=', '>=', 'between', 'like'}
+MAX_COVERING_COLUMNS = 5
+WRITE_COST = 2.0  # Estimated cost of maintaining one more index per write
+
+
+def denormalize(statement):
+    """Turn a normalized fingerprint back into something EXPLAIN accepts"""
+    if ', ...' in statement:
+        return None
+    return statement.replace('(?+)', '(?, ?)')
+
+
+def _split_clauses(statement):
+    """(text between FROM and ORDER BY, ORDER BY text, select list)"""
+    upper = statement.upper()
+    select_end = upper.find(' FROM ')
+    select_list = statement[:select_end] if select_end != -1 else ''
+    body = statement[select_end:] if select_end != -1 else statement
+    order_by = ''
+    order_at = body.upper().rfind(' ORDER BY ')
+    if order_at != -1:
+        order_by = body[order_at + len(' ORDER BY '):]
+        end = ORDER_END_RE.search(order_by)
+        if end:
+            order_by = order_by[:end.start()]
+        body = body[:order_at]
+    return body, order_by, select_list
+
+
+class IndexAdvisor:
+    """Evaluates candidate indexes for a workload on a scratch database"""
+    def __init__(self, db_path, workload, max_indexes=10, min_gain=0.01):
+        """workload: [(statement, weight, fingerprint)] from the slow-query log"""
+        self.db_path = Path(db_path)
+        self.workload = workload
+        self.max_indexes = max_indexes
+        self.min_gain = min_gain
+        self.conn = None
+        self.scratch_dir = None
+        self.columns = {}  # {table: [column names]}
+        self.rowid_columns = {}  # {table: INTEGER PRIMARY KEY column}, stored in every index
+        self.indexes = {}  # {table: [(name, (columns...))]}
+        self.stats = {}  # {(table, index or None): [row counts]}
+
+    # Scratch database
+    def open_scratch(self):
+        """Copy the database with the online backup API and analyze it"""
+        self.scratch_dir = tempfile.mkdtemp(prefix='index-advisor-')
+        scratch_path = Path(self.scratch_dir) / self.db_path.name
+        source = sqlite3.connect(f'file:{self.db_path}?mode=ro', uri=True)
+        self.conn = sqlite3.connect(scratch_path)
+        try:
+            source.backup(self.conn)
+        finally:
+            source.close()
+        self.conn.execute('ANALYZE')
+        self._load_schema()
+        self._load_stats()
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+        if self.scratch_dir:
+            shutil.rmtree(self.scratch_dir, ignore_errors=True)
+            self.scratch_dir = None
+
+    def _load_schema(self):
+        tables = [row[0] for row in self.conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'"
+        )]
+        for table in tables:
+            info = self.conn.execute(f'PRAGMA table_info("{table}")').fetchall()
+            self.columns[table] = [row[1] for row in info]
+            primary_keys = [row for row in info if row[5]]
+            if len(primary_keys) == 1 and primary_keys[0][2].upper() == 'INTEGER':
+                self.rowid_columns[table] = primary_keys[0][1]
+            self.indexes[table] = []
+            for row in self.conn.execute(f'PRAGMA index_list("{table}")'):
+                name = row[1]
+                columns = tuple(info[2] for info in self.conn.execute(f'PRAGMA index_info("{name}")'))
+                self.indexes[table].append((name, columns))
+
+    def _load_stats(self):
+        self.stats = {}
+        for table, index, stat in self.conn.execute('SELECT tbl, idx, stat FROM sqlite_stat1'):
+            counts = [int(value) for value in stat.split() if value.isdigit()]
+            self.stats[(table, index)] = counts
+            self.stats.setdefault((table, None), counts[:1])
+
+    def table_rows(self, table):
+        counts = self.stats.get((table, None))
+        return max(counts[0], 1) if counts else 1000
+
+    # Plan costing
+    def _estimate(self, kind, table, using, index, constraints):
+        rows = self.table_rows(table)
+        if kind == 'SCAN':
+            # Covering index scans read a narrower b-tree than the table
+            return rows * (0.5 if using == 'COVERING INDEX' else 1.0), rows
+        if using in ('INTEGER PRIMARY KEY', 'PRIMARY KEY'):
+            if constraints and '=' in constraints and '>' not in constraints and '<' not in constraints:
+                return 1.0, 1.0
+            return rows / 4.0, rows / 4.0
+
+        terms = [term.strip() for term in (constraints or '').split(' AND ') if term.strip()]
+        equalities = sum(1 for term in terms if term.endswith('=?') and not term.endswith(('<=?', '>=?')))
+        ranges = len(terms) - equalities
+        counts = self.stats.get((table, index))
+        if counts and equalities and len(counts) > equalities:
+            matched = float(counts[equalities])
+        elif equalities:
+            matched = max(rows / (10.0 ** equalities), 1.0)
+        else:
+            matched = float(rows)
+        if ranges:
+            matched = max(matched / 4.0, 1.0)
+        # Non-covering searches also look up every matched row in the table
+        lookups = matched if using == 'INDEX' else 0.0
+        return math.log2(rows + 1) + matched + lookups, matched
+
+    def plan_cost(self, plan):
+        cost = 0.0
+        outer = 1.0
+        for detail in plan:
+            if detail.startswith('USE TEMP B-TREE'):
+                cost += outer * math.log2(outer + 1)
+                continue
+            match = SEARCH_RE.match(detail)
+            if not match:
+                continue
+            kind, table, using, index, constraints = match.groups()
+            step_cost, rows_out = self._estimate(kind, table, using, index, constraints)
+            cost += outer * step_cost
+            outer = max(outer * rows_out, 1.0)
+        return cost
+
+    def explain(self, statement):
+        params = (None,) * statement.count('?')
+        rows = self.conn.execute('EXPLAIN QUERY PLAN ' + statement, params).fetchall()
+        return [row[-1] for row in rows]
+
+    def workload_cost(self, statements):
+        """{fingerprint: weighted cost} for replayable statements"""
+        costs = {}
+        for statement, weight, key in statements:
+            try:
+                costs[key] = self.plan_cost(self.explain(statement)) * weight
+            except sqlite3.Error:
+                continue
+        return costs
+
+    # Candidate generation
+    def _aliases(self, statement):
+        aliases = {}
+        for table, alias in TABLE_RE.findall(statement):
+            if table not in self.columns:
+                continue
+            aliases[table] = table
+            if alias and alias.lower() not in SQL_KEYWORDS:
+                aliases[alias] = table
+        return aliases
+
+    def _resolve(self, aliases, qualifier, column):
+        if qualifier:
+            table = aliases.get(qualifier)
+            return table if table and column in self.columns[table] else None
+        for table in set(aliases.values()):
+            if column in self.columns[table]:
+                return table
+        return None
+
+    def candidates_for(self, statement):
+        """{table: set of column tuples} suggested by one statement"""
+        aliases = self._aliases(statement)
+        if not aliases:
+            return {}
+        body, order_by, select_list = _split_clauses(statement)
+        predicates = CLAUSE_END_RE.split(body)[0]
+
+        equality, ranges, order, selected = {}, {}, {}, {}
+        for qualifier, column, op in PREDICATE_RE.findall(predicates):
+            table = self._resolve(aliases, qualifier, column)
+            if table is None:
+                continue
+            target = equality if op.lower() in EQUALITY_OPS else ranges
+            columns = target.setdefault(table, [])
+            if column not in columns:
+                columns.append(column)
+        for term in order_by.split(','):
+            match = ORDER_TERM_RE.match(term)
+            if match:
+                table = self._resolve(aliases, match.group(1), match.group(2))
+                if table:
+                    order.setdefault(table, []).append(match.group(2))
+        for qualifier, column in SELECT_COLUMN_RE.findall(select_list):
+            table = self._resolve(aliases, qualifier, column)
+            if table:
+                selected.setdefault(table, []).append(column)
+
+        suggestions = {}
+        for table in set(equality) | set(ranges) | set(order):
+            eq = tuple(equality.get(table, ()))
+            options = set()
+            if eq:
+                options.add(eq)
+                options.update((column,) for column in eq)
+            for column in ranges.get(table, ()):
+                if column not in eq:
+                    options.add(eq + (column,))
+            order_columns = tuple(c for c in order.get(table, ()) if c not in eq)
+            if order_columns and len(order) == 1:
+                options.add(eq + order_columns)
+            # Covering variant when the statement reads only a few columns
+            for base in list(options):
+                extra = tuple(
+                    c for c in selected.get(table, ())
+                    if c not in base and c != self.rowid_columns.get(table)
+                )
+                if extra and len(base) + len(extra) <= MAX_COVERING_COLUMNS:
+                    options.add(base + extra)
+            suggestions[table] = {option for option in options if option}
+        return suggestions
+
+    def _is_redundant(self, table, columns):
+        """An existing index already starts with these columns"""
+        return any(existing[:len(columns)] == columns for _, existing in self.indexes.get(table, ()))
+
+    def candidates(self, statements):
+        found = {}
+        for statement, _, key in statements:
+            for table, options in self.candidates_for(statement).items():
+                for columns in options:
+                    if not self._is_redundant(table, columns):
+                        found.setdefault((table, columns), set()).add(key)
+        return found
+
+    # Evaluation
+    def _try_index(self, table, columns, statements):
+        name = 'advisor_' + '_'.join((table,) + columns)
+        column_sql = ', '.join(f'"{column}"' for column in columns)
+        self.conn.execute(f'CREATE INDEX "{name}" ON "{table}" ({column_sql})')
+        try:
+            self.conn.execute(f'ANALYZE "{name}"')
+            self._load_stats()
+            return self.workload_cost(statements)
+        finally:
+            self.conn.execute(f'DROP INDEX "{name}"')
+            self.conn.execute('DELETE FROM sqlite_stat1 WHERE idx = ?', (name,))
+            self._load_stats()
+
+    def _keep_index(self, table, columns):
+        name = 'idx_' + '_'.join((table,) + columns)
+        column_sql = ', '.join(f'"{column}"' for column in columns)
+        self.conn.execute(f'CREATE INDEX "{name}" ON "{table}" ({column_sql})')
+        self.conn.execute(f'ANALYZE "{name}"')
+        self.indexes.setdefault(table, []).append((name, columns))
+        self._load_stats()
+        return name, f'CREATE INDEX {name} ON {table} ({", ".join(columns)});'
+
+    def advise(self):
+        """Ranked [recommendation dict] with estimated benefit"""
+        statements, writes = [], {}
+        for statement, weight, key in self.workload:
+            write = WRITE_RE.match(statement)
+            if write:
+                writes[write.group(1)] = writes.get(write.group(1), 0) + weight
+            replayable = denormalize(statement)
+            if replayable and replayable.lstrip().lower().startswith(REPLAYABLE):
+                statements.append((replayable, weight, key))
+
+        baseline = self.workload_cost(statements)
+        start_total = sum(baseline.values()) or 1.0
+        recommendations = []
+        while len(recommendations) < self.max_indexes:
+            best = None
+            for (table, columns), keys in self.candidates(statements).items():
+                relevant = [s for s in statements if s[2] in keys]
+                costs = self._try_index(table, columns, relevant)
+                saving = sum(baseline[key] - costs.get(key, baseline[key]) for key in keys if key in baseline)
+                saving -= writes.get(table, 0) * WRITE_COST
+                if saving > 0 and (best is None or saving > best[0]):
+                    improved = sorted(
+                        key for key in keys
+                        if key in baseline and costs.get(key, baseline[key]) < baseline[key]
+                    )
+                    best = (saving, table, columns, improved)
+            if best is None or best[0] / start_total < self.min_gain:
+                break
+            saving, table, columns, improved = best
+            name, ddl = self._keep_index(table, columns)
+            baseline = self.workload_cost(statements)
+            recommendations.append({
+                'rank': len(recommendations) + 1,
+                'table': table,
+                'columns': list(columns),
+                'name': name,
+                'sql': ddl,
+                'estimated_saving': round(saving, 1),
+                'estimated_benefit_pct': round(100.0 * saving / start_total, 1),
+                'improves': improved,
+                'table_writes': writes.get(table, 0),
+            })
+        return {
+            'statements': len(statements),
+            'baseline_cost': round(start_total, 1),
+            'final_cost': round(sum(baseline.values()), 1),
+            'recommendations': recommendations,
+        }
+
+
+def workload_from_summaries(summaries):
+    """[(statement, weight, fingerprint)] from slow-query log summaries"""
+    return [(group['statement'], group['count'], group['fingerprint']) for group in summaries]
+
+
+def advise_indexes(db_path, summaries, max_indexes=10):
+    advisor = IndexAdvisor(db_path, workload_from_summaries(summaries), max_indexes=max_indexes)
+    try:
+        advisor.open_scratch()
+        return advisor.advise()
+    finally:
+        advisor.close()
+
+
+def format_advice(result):
+    lines = [
+        f"Replayed {result['statements']} statement fingerprints; "
+        f"estimated workload cost {result['baseline_cost']} -> {result['final_cost']}",
+        ''
+    ]
+    if not result['recommendations']:
+        lines.append('No index improves the captured workload.')
+    for rec in result['recommendations']:
+        lines.append(
+            f"{rec['rank']}. {rec['sql']}\n"
+            f"   estimated benefit {rec['estimated_benefit_pct']}% ({rec['estimated_saving']} cost units), "
+            f"improves {len(rec['improves'])} fingerprint(s): {', '.join(rec['improves'][:5])}"
+            + (f"\n   table sees ~{rec['table_writes']} logged writes" if rec['table_writes'] else '')
+        )
+    return '\n'.join(lines)
@@ -0,0 +1,377 @@
+"""Memory accounting for long-lived in-process structures.
+
+Two views:
+
+* ``subsystem_report()`` walks each registered structure (active games,
+  matchmaking parties and their chat, queues, rating buckets, in-memory
+  caches) and sums ``sys.getsizeof`` over everything reachable from it.
+  Each walk has its own seen-set, so objects shared between subsystems are
+  counted in both. Framework objects (SQLAlchemy, Flask, Socket.IO, locks)
+  count only their own size and are not descended into.
+* ``MemoryTracker`` runs ``tracemalloc`` on demand and keeps snapshots, so
+  two points in time can be diffed by allocation site. Snapshots are also
+  written to ``MEMORY_SNAPSHOT_DIR`` so they can be diffed offline.
+
+The reading side (``compare_snapshots``/``top_stats``/``format_stats`` and
+the CLI) has no Flask dependency::
+
+    python -m backend.utils.memory_accounting diff old.snapshot new.snapshot
+    python manage.py --memory-diff old.snapshot new.snapshot
+    python manage.py --memory-report http://localhost:5000
+"""
+import argparse
+import gc
+import json
+import os
+import sys
+import tracemalloc
+import types
+from collections import OrderedDict
+from datetime import datetime
+from pathlib import Path
+from threading import Lock
+
+MAX_WALK_OBJECTS = 500000  # Per subsystem; walks stop here and report truncated
+OPAQUE_MODULE_PREFIXES = ('sqlalchemy', 'flask', 'werkzeug', 'socketio', 'engineio', 'threading',
+                          '_thread', 'eventlet', 'logging', 'prometheus_client', 'statsd')
+SKIPPED_TYPES = (type, types.ModuleType, types.FunctionType, types.BuiltinFunctionType,
+                 types.MethodType, types.CodeType, types.FrameType)
+SNAPSHOT_FILTERS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'),
+    tracemalloc.Filter(False, '<unknown>'),
+)
+
+
+def _opaque(obj):
+    module = getattr(type(obj), '__module__', '') or ''
+    return module.startswith(OPAQUE_MODULE_PREFIXES)
+
+
+def deep_sizeof(root, max_objects=MAX_WALK_OBJECTS):
+    """(bytes, objects, truncated) reachable from root"""
+    seen = set()
+    stack = [root]
+    total = 0
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen or isinstance(obj, SKIPPED_TYPES):
+            continue
+        if len(seen) >= max_objects:
+            return total, len(seen), True
+        seen.add(id(obj))
+        total += sys.getsizeof(obj)
+        if _opaque(obj) or isinstance(obj, (str, bytes, bytearray, int, float, bool)):
+            continue
+        if isinstance(obj, dict):
+            stack.extend(obj.keys())
+            stack.extend(obj.values())
+        elif isinstance(obj, (list, tuple, set, frozenset)) or type(obj).__name__ == 'deque':
+            stack.extend(obj)
+        else:
+            attributes = getattr(obj, '__dict__', None)
+            if attributes is not None:
+                stack.append(attributes)
+            for slot in getattr(type(obj), '__slots__', ()):
+                value = getattr(obj, slot, None)
+                if value is not None:
+                    stack.append(value)
+    return total, len(seen), False
+
+
+# Subsystems: name -> callable returning the object to size (a tuple sums its parts)
+def _matchmaking_queues():
+    """Every live MatchmakingQueue (the API blueprint keeps its own)"""
+    queues = []
+    for module_name in ('backend.game.matchmaking', 'backend.routes.api'):
+        module = sys.modules.get(module_name)
+        queue = getattr(module, 'matchmaking_queue', None) if module else None
+        if queue is not None and all(queue is not q for q in queues):
+            queues.append(queue)
+    return queues
+
+
+def _socket_state(name):
+    module = sys.modules.get('backend.socket_events')
+    return getattr(module, name, None) if module else None
+
+
+def _per_queue(attribute):
+    return tuple(getattr(queue, attribute) for queue in _matchmaking_queues())
+
+
+def _party_chat():
+    return tuple(party.chat_history for queue in _matchmaking_queues() for party in queue.parties.values())
+
+
+def _module_attribute(module_name, attribute):
+    module = sys.modules.get(module_name)
+    return getattr(module, attribute, None) if module else None
+
+
+SUBSYSTEMS = OrderedDict([
+    ('active_games', lambda: _socket_state('active_games')),
+    ('socket_matchmaking_queue', lambda: _socket_state('socket_match_queue')),
+    ('lobby_subscribers', lambda: _socket_state('lobby_broadcaster')),
+    ('matchmaking.parties', lambda: _per_queue('parties')),
+    ('matchmaking.party_chat', _party_chat),
+    ('matchmaking.queued_players', lambda: _per_queue('queued_players')),
+    ('matchmaking.rating_buckets', lambda: _per_queue('rating_buckets')),
+    ('matchmaking.queue', lambda: _per_queue('queue')),
+    ('cache.rank_index', lambda: _module_attribute('backend.game.rank_index', 'rank_index')),
+    ('cache.lobby_directory', lambda: _module_attribute('backend.game.lobby_directory', 'lobby_directory')),
+    ('cache.catalog', lambda: _module_attribute('backend.game.catalog', 'catalog')),
+    ('cache.track_leaderboards',
+     lambda: _module_attribute('backend.game.track_leaderboards', 'track_leaderboards')),
+    ('instrumentation.query_stats', lambda: _module_attribute('backend.utils.query_stats', 'query_stats')),
+    ('instrumentation.slow_query_plans',
+     lambda: getattr(_module_attribute('backend.utils.slow_query_log', 'slow_query_log'), 'plans', None)),
+    ('instrumentation.handler_profiler',
+     lambda: getattr(_module_attribute('backend.utils.handler_profiler', 'handler_profiler'), 'events', None)),
+    ('instrumentation.flight_recorder',
+     lambda: _module_attribute('backend.utils.flight_recorder', 'flight_recorder')),
+])
+
+
+def _item_count(obj):
+    if isinstance(obj, tuple):
+        return sum(len(part) for part in obj)  # One container per queue or party
+    try:
+        return len(obj)
+    except TypeError:
+        return None
+
+
+def process_memory():
+    """Resident set size and peak from /proc, or getrusage elsewhere"""
+    info = {}
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith(('VmRSS:', 'VmHWM:')):
+                    key = 'rss_bytes' if line.startswith('VmRSS') else 'peak_rss_bytes'
+                    info[key] = int(line.split()[1]) * 1024
+    except OSError:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        info['peak_rss_bytes'] = peak if sys.platform == 'darwin' else peak * 1024
+    info['gc_objects'] = len(gc.get_objects())
+    return info
+
+
+def subsystem_report(subsystems=None):
+    """Approximate deep size per subsystem, largest first"""
+    report = {}
+    for name, getter in (subsystems or SUBSYSTEMS).items():
+        try:
+            obj = getter()
+        except Exception as e:
+            report[name] = {'error': str(e)}
+            continue
+        if obj is None:
+            continue
+        size, objects, truncated = deep_sizeof(obj)
+        report[name] = {
+            'bytes': size,
+            'objects': objects,
+            'items': _item_count(obj),
+            'truncated': truncated,
+        }
+    return dict(sorted(report.items(), key=lambda item: -item[1].get('bytes', 0)))
+
+
+# tracemalloc
+def _stat_row(stat, group_by):
+    frames = stat.traceback.format(most_recent_first=True) if group_by == 'traceback' else None
+    frame = stat.traceback[-1]  # Frames run oldest to most recent
+    row = {
+        'site': frame.filename if group_by == 'filename' else f"{frame.filename}:{frame.lineno}",
+        'size_bytes': stat.size,
+        'count': stat.count,
+    }
+    if hasattr(stat, 'size_diff'):
+        row['size_diff_bytes'] = stat.size_diff
+        row['count_diff'] = stat.count_diff
+    if frames:
+        row['traceback'] = frames
+    return row
+
+
+def top_stats(snapshot, group_by='lineno', limit=25):
+    return [_stat_row(stat, group_by) for stat in snapshot.statistics(group_by)[:limit]]
+
+
+def compare_snapshots(old, new, group_by='lineno', limit=25):
+    """Allocation sites that grew the most between two snapshots"""
+    return [_stat_row(stat, group_by) for stat in new.compare_to(old, group_by)[:limit]]
+
+
+def _megabytes(size):
+    return f"{size / 1048576:+.3f}" if size < 0 else f"{size / 1048576:.3f}"
+
+
+def format_stats(rows):
+    diff = rows and 'size_diff_bytes' in rows[0]
+    header = (f"{'diff MB':>10s} {'diff #':>9s} " if diff else '') + f"{'size MB':>10s} {'count':>9s}  site"
+    lines = [header, '-' * len(header)]
+    for row in rows:
+        prefix = f"{_megabytes(row['size_diff_bytes']):>10s} {row['count_diff']:+9d} " if diff else ''
+        lines.append(f"{prefix}{row['size_bytes'] / 1048576:10.3f} {row['count']:9d}  {row['site']}")
+        for frame in row.get('traceback', ())[2:]:  # The site's own frame is the first two lines
+            lines.append(f"{'':>42s}{frame.strip()}")
+    return '\n'.join(lines)
+
+
+class MemoryTracker:
+    """On-demand tracemalloc with a small set of retained snapshots"""
+    def __init__(self):
+        self.lock = Lock()
+        self.snapshots = OrderedDict()  # {id: {'label', 'taken_at', 'snapshot', 'path'}}
+        self.next_id = 1
+        self.max_snapshots = 10
+        self.frames = 10
+        self.output_dir = Path('logs') / 'memory'
+
+    def start(self, frames=None):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(frames or self.frames)
+
+    def stop(self):
+        """Stop tracing; retained snapshots stay available"""
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+    def status(self):
+        tracing = tracemalloc.is_tracing()
+        current, peak = tracemalloc.get_traced_memory() if tracing else (0, 0)
+        return {
+            'tracing': tracing,
+            'frames': tracemalloc.get_traceback_limit() if tracing else None,
+            'traced_bytes': current,
+            'traced_peak_bytes': peak,
+            'tracemalloc_overhead_bytes': tracemalloc.get_tracemalloc_memory() if tracing else 0,
+            'snapshots': self.list_snapshots(),
+        }
+
+    def take_snapshot(self, label=None):
+        """Snapshot now; returns its summary, or None when not tracing"""
+        if not tracemalloc.is_tracing():
+            return None
+        snapshot = tracemalloc.take_snapshot().filter_traces(SNAPSHOT_FILTERS)
+        with self.lock:
+            snapshot_id = self.next_id
+            self.next_id += 1
+        taken_at = datetime.utcnow()
+        path = None
+        try:
+            self.output_dir.mkdir(parents=True, exist_ok=True)
+            path = self.output_dir / f"{taken_at:%Y%m%d-%H%M%S}_{os.getpid()}_{snapshot_id}.snapshot"
+            snapshot.dump(str(path))
+        except OSError as e:
+            print(f"Error writing memory snapshot: {e}")
+            path = None
+        with self.lock:
+            self.snapshots[snapshot_id] = {
+                'label': label,
+                'taken_at': taken_at.isoformat(),
+                'snapshot': snapshot,
+                'path': str(path) if path else None,
+                'traced_bytes': sum(stat.size for stat in snapshot.statistics('filename')),
+            }
+            while len(self.snapshots) > self.max_snapshots:
+                self.snapshots.popitem(last=False)
+        return self.describe(snapshot_id)
+
+    def describe(self, snapshot_id):
+        entry = self.snapshots[snapshot_id]
+        return dict({key: value for key, value in entry.items() if key != 'snapshot'}, id=snapshot_id)
+
+    def list_snapshots(self):
+        with self.lock:
+            ids = list(self.snapshots)
+        return [self.describe(snapshot_id) for snapshot_id in ids if snapshot_id in self.snapshots]
+
+    def get(self, snapshot_id):
+        entry = self.snapshots.get(snapshot_id)
+        return entry['snapshot'] if entry else None
+
+
+# Global tracker instance
+memory_tracker = MemoryTracker()
+
+
+def init_memory_accounting(app):
+    memory_tracker.output_dir = Path(app.config.get('MEMORY_SNAPSHOT_DIR', memory_tracker.output_dir))
+    memory_tracker.frames = app.config.get('MEMORY_TRACEMALLOC_FRAMES', memory_tracker.frames)
+    memory_tracker.max_snapshots = app.config.get('MEMORY_MAX_SNAPSHOTS', memory_tracker.max_snapshots)
+    if app.config.get('MEMORY_TRACEMALLOC_AT_START', False):
+        memory_tracker.start()
+    app.extensions['memory_tracker'] = memory_tracker
+
+
+# CLI
+def fetch_report(base_url, token=None):
+    """GET /admin/memory from a running server"""
+    from urllib.request import Request, urlopen
+
+    request = Request(base_url.rstrip('/') + '/admin/memory')
+    if token:
+        request.add_header('X-Admin-Token', token)
+    with urlopen(request, timeout=30) as response:
+        return json.loads(response.read())
+
+
+def format_report(report):
+    process = report.get('process', {})
+    lines = []
+    if 'rss_bytes' in process:
+        lines.append(f"RSS {process['rss_bytes'] / 1048576:.1f} MB "
+                     f"(peak {process.get('peak_rss_bytes', 0) / 1048576:.1f} MB), "
+                     f"{process.get('gc_objects', 0)} gc-tracked objects")
+    lines.append('')
+    lines.append(f"{'subsystem':36s} {'MB':>10s} {'objects':>10s} {'items':>9s}")
+    for name, entry in report.get('subsystems', {}).items():
+        if 'error' in entry:
+            lines.append(f"{name:36s} error: {entry['error']}")
+            continue
+        items = '-' if entry['items'] is None else str(entry['items'])
+        marker = ' (truncated)' if entry['truncated'] else ''
+        lines.append(f"{name:36s} {entry['bytes'] / 1048576:10.3f} {entry['objects']:10d} "
+                     f"{items:>9s}{marker}")
+    tracing = report.get('tracemalloc') or {}
+    if tracing.get('tracing'):
+        lines.append('')
+        lines.append(f"tracemalloc: {tracing['traced_bytes'] / 1048576:.1f} MB traced, "
+                     f"{len(tracing.get('snapshots', []))} snapshots")
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Memory accounting reports')
+    commands = parser.add_subparsers(dest='command', required=True)
+    diff = commands.add_parser('diff', help='Top allocation sites that grew between two snapshots')
+    diff.add_argument('old')
+    diff.add_argument('new')
+    top = commands.add_parser('top', help='Largest allocation sites in one snapshot')
+    top.add_argument('snapshot')
+    for command in (diff, top):
+        command.add_argument('--limit', type=int, default=25)
+        command.add_argument('--group-by', choices=['lineno', 'filename', 'traceback'], default='lineno')
+    report = commands.add_parser('report', help='Per-subsystem sizes from a running server')
+    report.add_argument('url')
+    report.add_argument('--token', default=os.getenv('ADMIN_TOKEN'))
+    args = parser.parse_args(argv)
+
+    if args.command == 'diff':
+        rows = compare_snapshots(tracemalloc.Snapshot.load(args.old), tracemalloc.Snapshot.load(args.new),
+                                 args.group_by, args.limit)
+        print(format_stats(rows))
+    elif args.command == 'top':
+        print(format_stats(top_stats(tracemalloc.Snapshot.load(args.snapshot), args.group_by, args.limit)))
+    else:
+        print(format_report(fetch_report(args.url, args.token)))
+
+
+if __name__ == '__main__':
+    main()
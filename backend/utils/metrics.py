@@ -0,0 +1,305 @@
+"""Operational metrics for the game server.
+
+Instrumentation points call the module-level ``metrics`` recorder
+(``inc``/``observe``), which forwards to the registered sinks: Prometheus
+here and, optionally, StatsD (backend.utils.statsd_exporter). The
+Prometheus sink keeps counters and histograms in its own registry and is
+served at ``/metrics``. Gauges (active games, players, spectators, queue
+depths) are read from the live game state when they are collected, so no
+code path has to keep them up to date.
+
+Label cardinality is bounded: every label keeps at most
+``MAX_LABEL_VALUES`` distinct values and later ones are reported as 'other'.
+Game ids never become labels; per-game values are reported as distributions.
+"""
+import time
+from hmac import compare_digest
+from threading import Lock
+from flask import Response, request
+
+try:
+    from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Histogram, generate_latest
+    from prometheus_client.core import GaugeMetricFamily, HistogramMetricFamily
+except ImportError:
+    CollectorRegistry = None
+
+NAMESPACE = 'halo'
+MAX_LABEL_VALUES = 64
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+WAIT_BUCKETS = (1, 2, 5, 10, 20, 30, 45, 60, 90, 120, 180, 300, 600)
+JOB_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+SPECTATOR_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 250, 500, 1000)
+
+# name: (kind, help, label, histogram buckets)
+METRICS = {
+    'socket_events_received': ('counter', 'Socket.IO events received', 'event', None),
+    'socket_events_emitted': ('counter', 'Socket.IO emit calls (one per call, not per recipient)',
+                              'event', None),
+    'socket_handler_seconds': ('histogram', 'Socket.IO event handler latency', 'event',
+                               LATENCY_BUCKETS),
+    'tick_seconds': ('histogram', 'Duration of one pass of a periodic server loop', 'loop',
+                     LATENCY_BUCKETS),
+    'tick_overruns': ('counter', 'Loop passes that took longer than their interval', 'loop', None),
+    'db_query_seconds': ('histogram', 'Database time per request, socket event or job', 'kind',
+                         LATENCY_BUCKETS),
+    'db_queries': ('counter', 'Database statements executed', 'kind', None),
+    'matchmaking_wait_seconds': ('histogram', 'Time from joining a matchmaking queue to a match',
+                                 'queue', WAIT_BUCKETS),
+    'scheduler_job_seconds': ('histogram', 'Background scheduler job run time', 'job', JOB_BUCKETS),
+    'scheduler_job_errors': ('counter', 'Background scheduler jobs that raised', 'job', None),
+}
+LABELS = {name: spec[2] for name, spec in METRICS.items()}
+
+
+class Metrics:
+    """Fans instrumentation calls out to the registered sinks"""
+    def __init__(self):
+        self.lock = Lock()
+        self.sinks = ()
+        self.label_values = {label: set() for label in LABELS.values() if label}  # Values seen so far
+
+    def add_sink(self, sink):
+        if sink not in self.sinks:
+            self.sinks = self.sinks + (sink,)
+
+    def bounded(self, label, value):
+        """The value itself, or 'other' once the label is full"""
+        seen = self.label_values[label]
+        if value in seen:
+            return value
+        with self.lock:
+            if len(seen) >= MAX_LABEL_VALUES:
+                return 'other'
+            seen.add(value)
+        return value
+
+    def inc(self, name, label_value=None, value=1):
+        if not self.sinks:
+            return
+        if label_value is not None and label_value not in self.label_values[LABELS[name]]:
+            label_value = self.bounded(LABELS[name], label_value)
+        for sink in self.sinks:
+            sink.inc(name, label_value, value)
+
+    def observe(self, name, seconds, label_value=None):
+        if not self.sinks:
+            return
+        if label_value is not None and label_value not in self.label_values[LABELS[name]]:
+            label_value = self.bounded(LABELS[name], label_value)
+        for sink in self.sinks:
+            sink.observe(name, label_value, seconds)
+
+
+# Global recorder instance
+metrics = Metrics()
+
+
+# Instrumentation helpers (socket handlers: backend.utils.handler_profiler)
+def record_tick(loop, seconds, interval):
+    """Record one loop pass; returns True when it overran its interval"""
+    metrics.observe('tick_seconds', seconds, loop)
+    if seconds > interval:
+        metrics.inc('tick_overruns', loop)
+        return True
+    return False
+
+
+def record_matchmaking_wait(queue, seconds):
+    metrics.observe('matchmaking_wait_seconds', seconds, queue)
+
+
+def scope_kind(scope):
+    """Collapse a query_stats scope into http / socket / job / background"""
+    if scope.startswith('socket:'):
+        return 'socket'
+    if scope.startswith('job:'):
+        return 'job'
+    if scope in ('background', 'lobby_broadcast'):
+        return 'background'
+    return 'http'
+
+
+def record_db_scope(scope, count, db_ms):
+    kind = scope_kind(scope)
+    metrics.observe('db_query_seconds', db_ms / 1000.0, kind)
+    metrics.inc('db_queries', kind, count)
+
+
+def instrument_socketio(socketio):
+    """Count every emit, whether from flask_socketio.emit or socketio.emit"""
+    server = socketio.server
+    if server is None or getattr(server, '_metrics_wrapped', False):
+        return
+    original_emit = server.emit
+
+    def emit(event, *args, **kwargs):
+        metrics.inc('socket_events_emitted', event)
+        return original_emit(event, *args, **kwargs)
+
+    server.emit = emit
+    server._metrics_wrapped = True
+
+
+def instrument_scheduler(scheduler):
+    """Time every job run through the scheduler's event listeners"""
+    from apscheduler.events import EVENT_JOB_ERROR, EVENT_JOB_EXECUTED, EVENT_JOB_SUBMITTED
+
+    started = {}  # {job id: perf_counter at submission}
+
+    def on_submitted(event):
+        started[event.job_id] = time.perf_counter()
+
+    def on_finished(event):
+        began = started.pop(event.job_id, None)
+        if began is not None:
+            metrics.observe('scheduler_job_seconds', time.perf_counter() - began, event.job_id)
+        if event.exception is not None:
+            metrics.inc('scheduler_job_errors', event.job_id)
+
+    scheduler.add_listener(on_submitted, EVENT_JOB_SUBMITTED)
+    scheduler.add_listener(on_finished, EVENT_JOB_EXECUTED | EVENT_JOB_ERROR)
+
+
+# Gauges, read from live state at collection time
+def _rooms(socketio):
+    try:
+        return dict(socketio.server.manager.rooms.get('/', {}))
+    except AttributeError:
+        return {}
+
+
+def collect_gauges(socketio):
+    """Current game, player, spectator and queue figures"""
+    from backend.socket_events import active_games, socket_match_queue
+
+    rooms = _rooms(socketio)
+    game_ids = list(active_games)
+    players = sum(len(rooms.get(f'game_{game_id}', ())) for game_id in game_ids)
+    spectators = [len(members) for room, members in rooms.items()
+                  if room.startswith('game_') and room.endswith('_spectators')]
+
+    sockets = {}
+    try:
+        sockets = dict(socketio.server.eio.sockets)
+    except AttributeError:
+        pass
+    outbound = 0
+    for socket in sockets.values():
+        queue = getattr(socket, 'queue', None)
+        if queue is not None:
+            outbound += queue.qsize()
+
+    party_queue = 0
+    try:
+        from backend.routes.api import matchmaking_queue as party_matchmaking
+        party_queue = len(party_matchmaking.queued_players)
+    except ImportError:
+        pass
+
+    return {
+        'active_games': len(game_ids),
+        'active_players': players,
+        'connected_clients': len(sockets),
+        'outbound_queue_depth': outbound,
+        'matchmaking_queue_size': {'socket': len(socket_match_queue), 'party': party_queue},
+        'spectators_per_game': spectators,
+    }
+
+
+class PrometheusSink:
+    """prometheus_client counters and histograms plus the live gauges"""
+    def __init__(self, socketio):
+        self.socketio = socketio
+        self.registry = CollectorRegistry()
+        self.instruments = {}
+        for name, (kind, description, label, buckets) in METRICS.items():
+            labels = (label,) if label else ()
+            if kind == 'counter':
+                instrument = Counter(name, description, labels, namespace=NAMESPACE,
+                                     registry=self.registry)
+            else:
+                instrument = Histogram(name, description, labels, namespace=NAMESPACE,
+                                       buckets=buckets, registry=self.registry)
+            self.instruments[name] = instrument
+        self.registry.register(self)
+
+    def _instrument(self, name, label_value):
+        instrument = self.instruments[name]
+        return instrument.labels(label_value) if label_value is not None else instrument
+
+    def inc(self, name, label_value, value):
+        self._instrument(name, label_value).inc(value)
+
+    def observe(self, name, label_value, value):
+        self._instrument(name, label_value).observe(value)
+
+    def describe(self):
+        # Keeps register() from running a full collection during app start
+        return []
+
+    def collect(self):
+        """Custom collector half: gauges computed at scrape time"""
+        try:
+            gauges = collect_gauges(self.socketio)
+        except Exception as e:
+            print(f"Error collecting game metrics: {e}")
+            return
+        for name, description in (
+            ('active_games', 'Games with live state on this worker'),
+            ('active_players', 'Players connected to an active game room'),
+            ('connected_clients', 'Open Socket.IO connections'),
+            ('outbound_queue_depth', 'Packets queued for delivery across all connections'),
+        ):
+            yield GaugeMetricFamily(f'{NAMESPACE}_{name}', description, value=gauges[name])
+
+        queue_size = GaugeMetricFamily(f'{NAMESPACE}_matchmaking_queue_size',
+                                       'Players waiting in a matchmaking queue', labels=['queue'])
+        for queue, size in gauges['matchmaking_queue_size'].items():
+            queue_size.add_metric([queue], size)
+        yield queue_size
+
+        counts = gauges['spectators_per_game']
+        buckets = [(str(bound), sum(1 for count in counts if count <= bound))
+                   for bound in SPECTATOR_BUCKETS]
+        buckets.append(('+Inf', len(counts)))
+        yield HistogramMetricFamily(f'{NAMESPACE}_spectators_per_game',
+                                    'Spectators watching each game', buckets=buckets,
+                                    sum_value=sum(counts))
+
+
+prometheus_sink = None
+
+
+def init_metrics(app, socketio):
+    """Register the sinks, hook the instrumentation points, serve /metrics"""
+    global prometheus_sink
+
+    if not app.config.get('METRICS_ENABLED', True):
+        return
+
+    from backend.utils.query_stats import query_stats
+    if record_db_scope not in query_stats.listeners:
+        query_stats.listeners.append(record_db_scope)
+    instrument_socketio(socketio)
+
+    if app.config.get('STATSD_ENABLED', False):
+        from backend.utils.statsd_exporter import init_statsd
+        init_statsd(app, socketio)
+
+    if CollectorRegistry is None:
+        print("Warning: prometheus_client is not installed; /metrics is disabled")
+        return
+    if prometheus_sink is None:
+        prometheus_sink = PrometheusSink(socketio)
+    metrics.add_sink(prometheus_sink)
+
+    def metrics_endpoint():
+        token = app.config.get('METRICS_TOKEN')
+        supplied = request.headers.get('Authorization', '')
+        if token and not compare_digest(supplied, f'Bearer {token}'):
+            return Response('Forbidden\n', status=403, mimetype='text/plain')
+        return Response(generate_latest(prometheus_sink.registry), mimetype=CONTENT_TYPE_LATEST)
+
+    app.add_url_rule('/metrics', 'metrics', metrics_endpoint)
+    app.extensions['metrics'] = metrics
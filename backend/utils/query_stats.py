@@ -0,0 +1,230 @@
+"""Per-request and per-socket-event SQL accounting.
+
+Cursor execute events on the app's engines add each statement's duration to
+the current app context. When the context is torn down (end of an HTTP
+request, a Socket.IO event, or a background job) the totals are folded into
+rolling histograms keyed by the Flask endpoint or ``socket:<event>`` name.
+The hot path is two perf_counter() calls and a few attribute updates.
+"""
+import time
+from bisect import bisect_left
+from threading import Lock
+from flask import g, has_app_context, has_request_context, request
+from sqlalchemy import event
+
+# Histogram bucket upper bounds
+DB_TIME_BOUNDS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+QUERY_COUNT_BOUNDS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89, 144, 233)
+
+MAX_SCOPES = 256  # Bounded label cardinality; extra scopes share 'other'
+
+
+class RollingHistogram:
+    """Fixed-bucket histogram over a sliding time window.
+
+    The window is split into slots; each observation lands in the current
+    slot and slots older than the window are recycled, so memory is fixed.
+    """
+    def __init__(self, bounds, window=600, slots=10):
+        self.bounds = tuple(bounds)
+        self.slot_seconds = window / slots
+        self.slots = [[0] * (len(self.bounds) + 1) for _ in range(slots)]
+        self.sums = [0.0] * slots
+        self.slot_ids = [-1] * slots
+        # Lifetime totals, for counters that must never go backwards
+        self.total_count = 0
+        self.total_sum = 0.0
+
+    def _slot(self, now):
+        slot_id = int(now / self.slot_seconds)
+        index = slot_id % len(self.slots)
+        if self.slot_ids[index] != slot_id:
+            self.slot_ids[index] = slot_id
+            self.slots[index] = [0] * (len(self.bounds) + 1)
+            self.sums[index] = 0.0
+        return index
+
+    def observe(self, value, now=None):
+        index = self._slot(now if now is not None else time.time())
+        self.slots[index][bisect_left(self.bounds, value)] += 1
+        self.sums[index] += value
+        self.total_count += 1
+        self.total_sum += value
+
+    def snapshot(self, now=None):
+        """Window totals with bucket counts and approximate percentiles"""
+        current = int((now if now is not None else time.time()) / self.slot_seconds)
+        buckets = [0] * (len(self.bounds) + 1)
+        total = 0.0
+        for index, slot_id in enumerate(self.slot_ids):
+            if current - slot_id < len(self.slots):
+                for i, count in enumerate(self.slots[index]):
+                    buckets[i] += count
+                total += self.sums[index]
+        count = sum(buckets)
+
+        def percentile(p):
+            if not count:
+                return None
+            rank = p * count
+            seen = 0
+            for i, bucket in enumerate(buckets):
+                seen += bucket
+                if seen >= rank:
+                    return self.bounds[i] if i < len(self.bounds) else float('inf')
+
+        labelled = {str(bound): buckets[i] for i, bound in enumerate(self.bounds)}
+        labelled['+Inf'] = buckets[-1]
+        return {
+            'count': count,
+            'sum': round(total, 3),
+            'buckets': labelled,
+            'p50': percentile(0.5),
+            'p95': percentile(0.95),
+            'p99': percentile(0.99),
+        }
+
+
+class ScopeStats:
+    """Rolling statistics for one endpoint or socket event"""
+    def __init__(self):
+        self.db_time_ms = RollingHistogram(DB_TIME_BOUNDS_MS)
+        self.query_count = RollingHistogram(QUERY_COUNT_BOUNDS)
+        self.slowest_ms = 0.0
+        self.slowest_statement = None
+
+
+class QueryStats:
+    """Registry of per-scope query statistics"""
+    def __init__(self):
+        self.lock = Lock()
+        self.scopes = {}  # {scope name: ScopeStats}
+        self.listeners = []  # Callables(scope, count, db_ms) notified per scope
+
+    def record(self, scope, count, db_ms, slowest_ms, slowest_statement):
+        with self.lock:
+            stats = self.scopes.get(scope)
+            if stats is None:
+                if len(self.scopes) >= MAX_SCOPES:
+                    scope = 'other'
+                    stats = self.scopes.get(scope)
+                if stats is None:
+                    stats = self.scopes[scope] = ScopeStats()
+            stats.db_time_ms.observe(db_ms)
+            stats.query_count.observe(count)
+            if slowest_ms > stats.slowest_ms:
+                stats.slowest_ms = slowest_ms
+                stats.slowest_statement = slowest_statement
+        for listener in self.listeners:
+            listener(scope, count, db_ms)
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                scope: {
+                    'db_time_ms': stats.db_time_ms.snapshot(),
+                    'queries': stats.query_count.snapshot(),
+                    'slowest_ms': round(stats.slowest_ms, 3),
+                    'slowest_statement': stats.slowest_statement,
+                }
+                for scope, stats in sorted(self.scopes.items())
+            }
+
+    def reset(self):
+        with self.lock:
+            self.scopes.clear()
+
+
+# Global registry instance
+query_stats = QueryStats()
+
+
+def current_scope():
+    """Name the work the current context is doing"""
+    if has_request_context():
+        socket_event = getattr(request, 'event', None)
+        if socket_event:
+            return f"socket:{socket_event['message']}"
+        return request.endpoint or 'unknown'
+    return getattr(g, 'db_scope', None) or 'background'
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_start', []).append(time.perf_counter())
+    if context is not None:
+        context._query_start_pushed = True
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get('query_start')
+    if not starts:
+        return
+    elapsed_ms = (time.perf_counter() - starts.pop()) * 1000.0
+    if not has_app_context():
+        return
+
+    stats = g.get('_query_stats')
+    if stats is None:
+        # [scope, count, total ms, slowest ms, slowest statement]
+        stats = g._query_stats = [current_scope(), 0, 0.0, 0.0, None]
+    stats[1] += 1
+    stats[2] += elapsed_ms
+    if elapsed_ms > stats[3]:
+        stats[3] = elapsed_ms
+        stats[4] = statement
+
+
+def _handle_error(exception_context):
+    # A failed statement never reaches after_cursor_execute; drop its start
+    # so later statements are not paired with it
+    conn = exception_context.connection
+    context = exception_context.execution_context
+    if conn is None or not getattr(context, '_query_start_pushed', False):
+        return  # Failed before the cursor ran (connect, compile)
+    starts = conn.info.get('query_start')
+    if starts:
+        starts.pop()
+
+
+def instrument_engine(engine):
+    event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+    event.listen(engine, 'handle_error', _handle_error)
+
+
+def request_query_stats():
+    """(query count, total DB ms) so far in the current context"""
+    stats = g.get('_query_stats') if has_app_context() else None
+    if stats is None:
+        return 0, 0.0
+    return stats[1], stats[2]
+
+
+def init_query_stats(app, db):
+    """Instrument the app's engines and fold stats at context teardown"""
+    if not app.config.get('QUERY_STATS_ENABLED', True):
+        return
+
+    with app.app_context():
+        instrument_engine(db.engine)
+    read_engine = app.extensions.get('db_read_engine')
+    if read_engine is not None:
+        instrument_engine(read_engine)
+
+    @app.after_request
+    def add_server_timing(response):
+        if app.config.get('QUERY_STATS_SERVER_TIMING', False):
+            count, db_ms = request_query_stats()
+            response.headers.add(
+                'Server-Timing',
+                f'db;dur={db_ms:.2f};desc="{count} queries"'
+            )
+        return response
+
+    @app.teardown_appcontext
+    def fold_query_stats(exc):
+        stats = g.pop('_query_stats', None)
+        if stats is not None:
+            query_stats.record(*stats)
+
+    app.extensions['query_stats'] = query_stats
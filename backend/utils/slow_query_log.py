@@ -0,0 +1,333 @@
+"""Slow-query log with automatic query plan capture.
+
+Statements slower than ``SLOW_QUERY_THRESHOLD_MS`` are written as JSON lines
+to a rotating log: normalized SQL, a fingerprint of it, the shape of the bind
+parameters and, the first time a fingerprint is seen, its plan
+(``EXPLAIN QUERY PLAN`` on SQLite, ``EXPLAIN`` on PostgreSQL). Plans are
+scanned for full table scans and index use. The reading side
+(``load_entries``/``summarize``/``format_report``) has no Flask dependency so
+manage.py can build reports offline.
+"""
+import hashlib
+import json
+import logging
+import re
+import time
+from collections import Counter
+from datetime import datetime
+from logging.handlers import RotatingFileHandler
+from pathlib import Path
+from threading import Lock
+from sqlalchemy import event
+
+DEFAULT_WATCH_TABLES = ('game_sessions', 'race_history', 'users')
+EXPLAINABLE = ('select', 'insert', 'update', 'delete', 'with')
+MAX_PLAN_CACHE = 2000
+MAX_STATEMENT_LENGTH = 4000
+
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PLACEHOLDER_RE = re.compile(r'%\(\w+\)s|%s|\$\d+')
+_IN_LIST_RE = re.compile(r'\(\s*\?(?:\s*,\s*\?)+\s*\)')
+_VALUES_RE = re.compile(r'(VALUES\s*\(\?[^)]*\))(?:\s*,\s*\(\?[^)]*\))+', re.IGNORECASE)
+_SPACE_RE = re.compile(r'\s+')
+
+# SQLite: "SCAN users", "SCAN TABLE users AS u", "SCAN g USING COVERING INDEX ix"
+_SQLITE_SCAN_RE = re.compile(r'\bSCAN (?:TABLE )?(\w+)(?: AS \w+)?(.*)$')
+_SQLITE_INDEX_RE = re.compile(r'USING (?:COVERING )?INDEX (\w+)')
+# PostgreSQL: "Seq Scan on users", "Index Only Scan using ix on users"
+_PG_SEQ_SCAN_RE = re.compile(r'Seq Scan on (\w+)')
+_PG_INDEX_RE = re.compile(r'Index (?:Only )?Scan (?:Backward )?using (\w+)|Bitmap Index Scan on (\w+)')
+
+
+def normalize_sql(statement):
+    """Replace literals and placeholders with ? and collapse lists"""
+    sql = _STRING_RE.sub('?', statement)
+    sql = _PLACEHOLDER_RE.sub('?', sql)
+    sql = _NUMBER_RE.sub('?', sql)
+    sql = _SPACE_RE.sub(' ', sql).strip()
+    sql = _IN_LIST_RE.sub('(?+)', sql)
+    sql = _VALUES_RE.sub(r'\1, ...', sql)
+    return sql
+
+
+def fingerprint(normalized):
+    return hashlib.sha1(normalized.encode('utf-8')).hexdigest()[:12]
+
+
+def parameter_shape(parameters, executemany=False):
+    """Types of the bound parameters, without their values"""
+    rows = None
+    if executemany:
+        rows = len(parameters)
+        parameters = parameters[0] if parameters else ()
+    if isinstance(parameters, dict):
+        shape = {key: type(value).__name__ for key, value in sorted(parameters.items())}
+    else:
+        shape = [type(value).__name__ for value in (parameters or ())]
+    if rows is not None:
+        return {'rows': rows, 'each': shape}
+    return shape
+
+
+def analyze_plan(plan, dialect_name='sqlite'):
+    """(tables scanned in full, indexes used) from plan lines"""
+    full_scans, indexes = [], []
+    for line in plan:
+        if dialect_name == 'postgresql':
+            full_scans.extend(_PG_SEQ_SCAN_RE.findall(line))
+            for using, bitmap in _PG_INDEX_RE.findall(line):
+                indexes.append(using or bitmap)
+            continue
+        scan = _SQLITE_SCAN_RE.search(line)
+        if scan and 'INDEX' not in scan.group(2):
+            full_scans.append(scan.group(1))
+        indexes.extend(_SQLITE_INDEX_RE.findall(line))
+    return sorted(set(full_scans)), sorted(set(indexes))
+
+
+class SlowQueryLog:
+    """Records slow statements from instrumented engines"""
+    def __init__(self):
+        self.lock = Lock()
+        self.threshold_ms = 50.0
+        self.watch_tables = set(DEFAULT_WATCH_TABLES)
+        self.plans = {}  # {fingerprint: (plan lines, full scans, indexes)}
+        self.scope_fn = None
+        self.logger = logging.getLogger('halo_drive.slow_queries')
+        self.logger.propagate = False
+        self.logger.setLevel(logging.INFO)
+
+    def configure(self, path, threshold_ms=50.0, max_bytes=5 * 1024 * 1024,
+                  backup_count=5, watch_tables=DEFAULT_WATCH_TABLES):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        for handler in list(self.logger.handlers):
+            self.logger.removeHandler(handler)
+            handler.close()
+        handler = RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backup_count)
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        self.logger.addHandler(handler)
+        self.threshold_ms = threshold_ms
+        self.watch_tables = set(watch_tables)
+
+    def instrument_engine(self, engine):
+        event.listen(engine, 'before_cursor_execute', self._before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', self._after_cursor_execute)
+        event.listen(engine, 'handle_error', self._handle_error)
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('slow_query_start', []).append(time.perf_counter())
+        if context is not None:
+            context._slow_query_start_pushed = True
+
+    def _handle_error(self, exception_context):
+        # Failed statements skip after_cursor_execute; keep the stack aligned
+        conn = exception_context.connection
+        if conn is None or not getattr(exception_context.execution_context, '_slow_query_start_pushed', False):
+            return
+        starts = conn.info.get('slow_query_start')
+        if starts:
+            starts.pop()
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        starts = conn.info.get('slow_query_start')
+        if not starts:
+            return
+        elapsed_ms = (time.perf_counter() - starts.pop()) * 1000.0
+        if elapsed_ms < self.threshold_ms:
+            return
+        try:
+            self.record(cursor, conn.dialect.name, statement, parameters, executemany, elapsed_ms)
+        except Exception as e:
+            print(f"Error recording slow query: {e}")
+
+    def _explain(self, cursor, dialect_name, statement, parameters, executemany):
+        if executemany:
+            parameters = parameters[0] if parameters else ()
+        explain_cursor = cursor.connection.cursor()
+        try:
+            if dialect_name == 'sqlite':
+                explain_cursor.execute('EXPLAIN QUERY PLAN ' + statement, parameters)
+                # Columns are (id, parent, notused, detail)
+                return [row[-1] for row in explain_cursor.fetchall()]
+            if dialect_name == 'postgresql':
+                # Keep a failed EXPLAIN from aborting the caller's transaction
+                explain_cursor.execute('SAVEPOINT slow_query_explain')
+                try:
+                    explain_cursor.execute('EXPLAIN ' + statement, parameters)
+                    plan = [row[0] for row in explain_cursor.fetchall()]
+                except Exception:
+                    explain_cursor.execute('ROLLBACK TO SAVEPOINT slow_query_explain')
+                    raise
+                explain_cursor.execute('RELEASE SAVEPOINT slow_query_explain')
+                return plan
+            return None
+        finally:
+            explain_cursor.close()
+
+    def _plan_for(self, key, cursor, dialect_name, statement, parameters, executemany):
+        """Cached plan analysis; (plan, full scans, indexes, newly explained)"""
+        cached = self.plans.get(key)
+        if cached is not None:
+            return cached + (False,)
+        plan = None
+        if statement.lstrip().lower().startswith(EXPLAINABLE):
+            try:
+                plan = self._explain(cursor, dialect_name, statement, parameters, executemany)
+            except Exception as e:
+                plan = [f'EXPLAIN failed: {e}']
+        full_scans, indexes = analyze_plan(plan or (), dialect_name)
+        with self.lock:
+            if len(self.plans) >= MAX_PLAN_CACHE:
+                self.plans.clear()
+            self.plans[key] = (plan, full_scans, indexes)
+        return plan, full_scans, indexes, True
+
+    def record(self, cursor, dialect_name, statement, parameters, executemany, elapsed_ms):
+        normalized = normalize_sql(statement)
+        key = fingerprint(normalized)
+        plan, full_scans, indexes, new_plan = self._plan_for(
+            key, cursor, dialect_name, statement, parameters, executemany
+        )
+        entry = {
+            'ts': datetime.utcnow().isoformat(),
+            'fingerprint': key,
+            'duration_ms': round(elapsed_ms, 3),
+            'scope': self.scope_fn() if self.scope_fn else None,
+            'backend': dialect_name,
+            'statement': normalized[:MAX_STATEMENT_LENGTH],
+            'params': parameter_shape(parameters, executemany),
+            'full_scans': full_scans,
+            'watched_scans': [table for table in full_scans if table in self.watch_tables],
+            'indexes': indexes,
+        }
+        if new_plan:
+            entry['plan'] = plan
+        self.logger.info(json.dumps(entry, separators=(',', ':')))
+        return entry
+
+
+# Global slow query log instance
+slow_query_log = SlowQueryLog()
+
+
+def init_slow_query_log(app, db):
+    """Record slow statements from the app's engines"""
+    if not app.config.get('SLOW_QUERY_LOG_ENABLED', True):
+        return
+    from flask import has_app_context
+    from backend.utils.query_stats import current_scope
+
+    slow_query_log.configure(
+        app.config.get('SLOW_QUERY_LOG_PATH', 'logs/slow_queries.jsonl'),
+        threshold_ms=app.config.get('SLOW_QUERY_THRESHOLD_MS', 50.0),
+        max_bytes=app.config.get('SLOW_QUERY_LOG_MAX_BYTES', 5 * 1024 * 1024),
+        backup_count=app.config.get('SLOW_QUERY_LOG_BACKUPS', 5),
+        watch_tables=app.config.get('SLOW_QUERY_WATCH_TABLES', DEFAULT_WATCH_TABLES),
+    )
+    slow_query_log.scope_fn = lambda: current_scope() if has_app_context() else None
+
+    with app.app_context():
+        slow_query_log.instrument_engine(db.engine)
+    read_engine = app.extensions.get('db_read_engine')
+    if read_engine is not None:
+        slow_query_log.instrument_engine(read_engine)
+    app.extensions['slow_query_log'] = slow_query_log
+
+
+def log_files(path):
+    """The log and its rotated files, oldest first"""
+    path = Path(path)
+    rotated = sorted(
+        path.parent.glob(path.name + '.*'),
+        key=lambda p: int(p.suffix[1:]) if p.suffix[1:].isdigit() else 0,
+        reverse=True
+    )
+    return rotated + ([path] if path.exists() else [])
+
+
+def load_entries(path):
+    """Parse every entry in the log and its rotated files"""
+    for log_file in log_files(path):
+        with open(log_file, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue
+
+
+def summarize(entries):
+    """Group entries by fingerprint, slowest total time first"""
+    groups = {}
+    for entry in entries:
+        group = groups.get(entry['fingerprint'])
+        if group is None:
+            group = groups[entry['fingerprint']] = {
+                'fingerprint': entry['fingerprint'],
+                'statement': entry['statement'],
+                'params': entry.get('params'),
+                'durations': [],
+                'scopes': Counter(),
+                'plan': None,
+                'full_scans': set(),
+                'watched_scans': set(),
+                'indexes': set(),
+                'first_seen': entry['ts'],
+            }
+        group['durations'].append(entry['duration_ms'])
+        group['scopes'][entry.get('scope') or 'unknown'] += 1
+        if entry.get('plan') is not None:
+            group['plan'] = entry['plan']
+        group['full_scans'].update(entry.get('full_scans', ()))
+        group['watched_scans'].update(entry.get('watched_scans', ()))
+        group['indexes'].update(entry.get('indexes', ()))
+        group['last_seen'] = entry['ts']
+
+    summaries = []
+    for group in groups.values():
+        durations = sorted(group.pop('durations'))
+        group.update({
+            'count': len(durations),
+            'total_ms': round(sum(durations), 3),
+            'mean_ms': round(sum(durations) / len(durations), 3),
+            'p95_ms': durations[min(len(durations) - 1, int(len(durations) * 0.95))],
+            'max_ms': durations[-1],
+            'full_scans': sorted(group['full_scans']),
+            'watched_scans': sorted(group['watched_scans']),
+            'indexes': sorted(group['indexes']),
+        })
+        summaries.append(group)
+    summaries.sort(key=lambda g: g['total_ms'], reverse=True)
+    return summaries
+
+
+def format_report(summaries, declared_indexes=None, limit=20):
+    """Plain-text report; declared_indexes is {index name: table}"""
+    lines = []
+    for group in summaries[:limit]:
+        flag = '  FULL SCAN: ' + ', '.join(group['watched_scans']) if group['watched_scans'] else ''
+        lines.append(
+            f"[{group['fingerprint']}] {group['count']}x  total {group['total_ms']:.1f} ms  "
+            f"mean {group['mean_ms']:.1f}  p95 {group['p95_ms']:.1f}  max {group['max_ms']:.1f}{flag}"
+        )
+        lines.append(f"  {group['statement'][:300]}")
+        lines.append(f"  params: {json.dumps(group['params'])}")
+        scopes = ', '.join(f'{scope} ({count})' for scope, count in group['scopes'].most_common(3))
+        lines.append(f"  from: {scopes}")
+        for plan_line in group['plan'] or ():
+            lines.append(f"    plan: {plan_line}")
+        lines.append('')
+
+    watched = sorted({table for group in summaries for table in group['watched_scans']})
+    lines.append(f"Full scans on watched tables: {', '.join(watched) if watched else 'none'}")
+
+    used = {index for group in summaries for index in group['indexes']}
+    lines.append(f"Indexes used by slow queries: {', '.join(sorted(used)) if used else 'none'}")
+    if declared_indexes:
+        unused = sorted(
+            f'{name} ({table})' for name, table in declared_indexes.items() if name not in used
+        )
+        lines.append(f"Declared indexes never seen: {', '.join(unused) if unused else 'none'}")
+    return '\n'.join(lines)
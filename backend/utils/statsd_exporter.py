@@ -0,0 +1,137 @@
+"""StatsD export of the metrics in backend.utils.metrics.
+
+Each worker aggregates in-process and flushes every ``STATSD_FLUSH_INTERVAL``
+seconds through a ``statsd`` pipeline, which packs the lines into as few UDP
+datagrams as fit ``STATSD_MAX_UDP_SIZE``. Recording is a dict update under
+a lock; nothing touches the network on the event path.
+
+Counters are sent as one ``incr`` per key and interval. Timers keep the
+interval's count plus a reservoir of up to ``STATSD_RESERVOIR`` samples, sent
+as ``timing`` values (for percentiles) next to an exact ``.count`` counter.
+Stats are named ``<prefix>.<worker id>.<metric>[.<label>]``; plain StatsD has
+no tags, so the worker id and label value are path segments.
+"""
+import os
+import re
+import socket
+from random import random
+from threading import Lock
+from backend.utils.metrics import collect_gauges, metrics
+
+_UNSAFE_RE = re.compile(r'[^A-Za-z0-9_\-]')
+
+
+def stat_name(name, label_value=None):
+    if label_value is None:
+        return name
+    return f"{name}.{_UNSAFE_RE.sub('_', str(label_value))}"
+
+
+def default_worker_id():
+    return _UNSAFE_RE.sub('_', f"{socket.gethostname()}_{os.getpid()}")
+
+
+class StatsdSink:
+    """Aggregates inc/observe calls and flushes them as batched StatsD lines"""
+    def __init__(self, client, socketio=None, reservoir=64):
+        self.client = client
+        self.socketio = socketio
+        self.reservoir = reservoir
+        self.lock = Lock()
+        self.counters = {}  # {(name, label): total}
+        self.timers = {}  # {(name, label): [count, samples in seconds]}
+
+    def inc(self, name, label_value, value):
+        # Locked: scheduler jobs record from real OS threads
+        key = (name, label_value)
+        with self.lock:
+            counters = self.counters
+            counters[key] = counters.get(key, 0) + value
+
+    def observe(self, name, label_value, value):
+        key = (name, label_value)
+        with self.lock:
+            entry = self.timers.get(key)
+            if entry is None:
+                entry = self.timers[key] = [0, []]
+            entry[0] += 1
+            if entry[0] <= self.reservoir:
+                entry[1].append(value)
+            else:
+                # Reservoir sampling keeps a uniform sample of the interval
+                slot = int(random() * entry[0])
+                if slot < self.reservoir:
+                    entry[1][slot] = value
+
+    def drain(self):
+        with self.lock:
+            counters, self.counters = self.counters, {}
+            timers, self.timers = self.timers, {}
+        return counters, timers
+
+    def flush(self):
+        """Send everything recorded since the last flush; returns the key count"""
+        counters, timers = self.drain()
+        pipe = self.client.pipeline()
+        for (name, label_value), total in counters.items():
+            pipe.incr(stat_name(name, label_value), total)
+        for (name, label_value), (count, samples) in timers.items():
+            stat = stat_name(name, label_value)
+            pipe.incr(f'{stat}.count', count)
+            for seconds in samples:
+                pipe.timing(stat, seconds * 1000.0)
+
+        if self.socketio is not None:
+            try:
+                gauges = collect_gauges(self.socketio)
+            except Exception as e:
+                print(f"Error collecting game metrics: {e}")
+            else:
+                for name in ('active_games', 'active_players', 'connected_clients',
+                             'outbound_queue_depth'):
+                    pipe.gauge(name, gauges[name])
+                for queue, size in gauges['matchmaking_queue_size'].items():
+                    pipe.gauge(stat_name('matchmaking_queue_size', queue), size)
+                spectators = gauges['spectators_per_game']
+                pipe.gauge('spectators_total', sum(spectators))
+                pipe.gauge('spectators_max_per_game', max(spectators, default=0))
+
+        pipe.send()
+        return len(counters) + len(timers)
+
+    def run(self, interval):
+        """Flush loop, run as a Socket.IO background task"""
+        while True:
+            self.socketio.sleep(interval)
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Error flushing StatsD metrics: {e}")
+
+
+statsd_sink = None
+
+
+def init_statsd(app, socketio):
+    """Attach a StatsD sink to the metrics recorder and start flushing"""
+    global statsd_sink
+
+    if statsd_sink is not None:
+        metrics.add_sink(statsd_sink)
+        return
+    try:
+        from statsd import StatsClient
+    except ImportError:
+        print("Warning: statsd is not installed; StatsD export is disabled")
+        return
+
+    worker_id = app.config.get('STATSD_WORKER_ID') or default_worker_id()
+    client = StatsClient(
+        host=app.config.get('STATSD_HOST', 'localhost'),
+        port=app.config.get('STATSD_PORT', 8125),
+        prefix=f"{app.config.get('STATSD_PREFIX', 'halo')}.{worker_id}",
+        maxudpsize=app.config.get('STATSD_MAX_UDP_SIZE', 1432),
+    )
+    statsd_sink = StatsdSink(client, socketio, reservoir=app.config.get('STATSD_RESERVOIR', 64))
+    metrics.add_sink(statsd_sink)
+    socketio.start_background_task(statsd_sink.run, app.config.get('STATSD_FLUSH_INTERVAL', 5.0))
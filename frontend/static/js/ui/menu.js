@@ -94,7 +94,62 @@ async function startCustomGame() {
 }
 
 // Lobby Browser
+let lobbySocket = null;
+const lobbyState = {
+    version: 0,
+    lobbies: new Map()
+};
+
+function renderLobbies() {
+    showLobbiesModal(Array.from(lobbyState.lobbies.values()));
+}
+
+function subscribeLobbies() {
+    if (lobbySocket) {
+        return;
+    }
+    lobbySocket = io();
+
+    // Full list on (re)subscribe, then pushed diffs
+    lobbySocket.on('connect', () => {
+        lobbySocket.emit('subscribe_lobbies');
+    });
+
+    lobbySocket.on('lobbies_snapshot', (snapshot) => {
+        lobbyState.version = snapshot.version;
+        lobbyState.lobbies = new Map(snapshot.lobbies.map(lobby => [lobby.id, lobby]));
+        renderLobbies();
+    });
+
+    lobbySocket.on('lobbies_diff', (diff) => {
+        if (diff.version <= lobbyState.version) {
+            return;  // Already covered by our snapshot
+        }
+        diff.changes.forEach(change => {
+            if (change.op === 'created' || change.op === 'updated') {
+                lobbyState.lobbies.set(change.id, change.lobby);
+            } else {
+                lobbyState.lobbies.delete(change.id);
+            }
+        });
+        lobbyState.version = diff.version;
+        renderLobbies();
+    });
+}
+
+function unsubscribeLobbies() {
+    if (lobbySocket) {
+        lobbySocket.emit('unsubscribe_lobbies');
+        lobbySocket.disconnect();
+        lobbySocket = null;
+    }
+}
+
 async function showLobbyBrowser() {
+    if (typeof io !== 'undefined') {
+        subscribeLobbies();
+        return;
+    }
     try {
         const response = await fetch('/api/lobbies');
         const lobbies = await response.json();
@@ -209,6 +264,9 @@ document.addEventListener('DOMContentLoaded', () => {
     });
 });
 
+// Leaving the menu (any navigation, including into a game) ends the lobby feed
+window.addEventListener('pagehide', unsubscribeLobbies);
+
 // Ship Details Tooltip
 function showShipDetails(event) {
     const ship = event.currentTarget;
@@ -0,0 +1,42 @@
+import sys
+from pathlib import Path
+
+import pytest
+from flask import Flask
+
+# Import the backend package from the project root
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+@pytest.fixture
+def app(tmp_path):
+    """A bare app bound to the shared db on a fresh SQLite file"""
+    from backend import db
+    from backend.models import init_models
+
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{tmp_path / 'game.db'}"
+    app.config['SECRET_KEY'] = 'test'
+    db.init_app(app)
+    with app.app_context():
+        init_models()
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.engine.dispose()
+
+
+@pytest.fixture
+def players(app):
+    """Two users, two ships and a course to race them on"""
+    from backend import db
+    from backend.models.course import Course
+    from backend.models.ship import Ship
+    from backend.models.user import User
+
+    users = [User(username=f'pilot{i}', email=f'pilot{i}@example.com') for i in range(2)]
+    ships = [Ship(name=f'ship{i}') for i in range(2)]
+    course = Course(name='ring', difficulty='easy', par_time=60.0)
+    db.session.add_all(users + ships + [course])
+    db.session.commit()
+    return users, ships, course
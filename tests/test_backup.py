@@ -0,0 +1,186 @@
+import sqlite3
+from datetime import datetime, timedelta
+
+import pytest
+from backend.utils import backup as backup_module
+from backend.utils.backup import DatabaseBackup
+
+
+class Clock(datetime):
+    """datetime whose now() advances a second per call, so backup names never collide"""
+    current = datetime(2024, 3, 1, 12, 0, 0)
+
+    @classmethod
+    def now(cls, tz=None):
+        cls.current += timedelta(seconds=1)
+        return cls.current
+
+
+@pytest.fixture(autouse=True)
+def clock(monkeypatch):
+    monkeypatch.setattr(backup_module, 'datetime', Clock)
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = tmp_path / 'game.db'
+    conn = sqlite3.connect(path)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('CREATE TABLE races (id INTEGER PRIMARY KEY, pilot TEXT, time REAL)')
+    conn.execute('CREATE INDEX idx_races_pilot ON races (pilot)')
+    conn.executemany('INSERT INTO races (pilot, time) VALUES (?, ?)',
+                     [(f'pilot{i % 50}', i * 0.5) for i in range(5000)])
+    conn.commit()
+    conn.close()
+    return path
+
+
+def add_races(db_path, n, start=0):
+    conn = sqlite3.connect(db_path)
+    conn.executemany('INSERT INTO races (pilot, time) VALUES (?, ?)',
+                     [(f'late{i}', 1.0) for i in range(start, start + n)])
+    conn.commit()
+    conn.close()
+
+
+def race_count(db_path):
+    conn = sqlite3.connect(db_path)
+    try:
+        return conn.execute('SELECT COUNT(*) FROM races').fetchone()[0]
+    finally:
+        conn.close()
+
+
+@pytest.fixture
+def backups(tmp_path, db_path):
+    return DatabaseBackup(db_path, tmp_path / 'backups', chunk_bytes=16 * 1024)
+
+
+def test_increments_store_only_changed_chunks(backups, db_path):
+    _, base = backups.create_incremental_backup()
+    add_races(backups.db_path, 10)
+    _, increment = backups.create_incremental_backup()
+
+    assert (base['kind'], increment['kind']) == ('base', 'incremental')
+    assert increment['parent'] == base['file']
+    assert 0 < increment['changed_chunks'] < increment['chunk_count']
+    assert backups.backup_chain(increment['file']) == [base['file'], increment['file']]
+
+
+def test_restore_walks_the_chain_to_any_point(backups, db_path):
+    names = []
+    for step in range(3):
+        _, metadata = backups.create_incremental_backup()
+        names.append(metadata['file'])
+        add_races(db_path, 100, start=step * 100)
+
+    backups.restore_backup(backups.backup_dir / names[1])
+    assert race_count(db_path) == 5100
+
+    # Point in time: the latest backup at or before a moment
+    when = datetime.strptime(names[2].split('.')[0][len('backup_'):], '%Y%m%d_%H%M%S')
+    assert backups.find_backup_at(when) == names[2]
+    assert backups.find_backup_at(when - timedelta(seconds=1)) == names[1]
+    assert backups.find_backup_at(datetime(2000, 1, 1)) is None
+
+
+def test_chain_length_starts_a_new_base(tmp_path, db_path):
+    backups = DatabaseBackup(db_path, tmp_path / 'backups', chunk_bytes=16 * 1024, max_chain_length=2)
+    kinds = []
+    for step in range(4):
+        kinds.append(backups.create_incremental_backup()[1]['kind'])
+        add_races(db_path, 10, start=step * 10)
+    assert kinds == ['base', 'incremental', 'base', 'incremental']
+
+
+def test_prune_drops_old_chains_and_their_chunks(backups, db_path):
+    for step in range(2):
+        backups.create_incremental_backup(full=True)
+        add_races(db_path, 2000, start=step * 2000)
+        backups.create_incremental_backup()
+    _, latest = backups.create_incremental_backup(full=True)
+    chunks_before = sum(1 for _ in backups.chunk_dir.glob('*/*.gz'))
+
+    report = backups.prune_backups(keep_chains=1, grace_seconds=0)
+    assert len(report['removed_backups']) == 4
+    assert 0 < report['removed_chunks'] < chunks_before
+    assert [b['file'] for b in backups.list_backups()] == [latest['file']]
+
+    # What is left still restores
+    add_races(db_path, 5)
+    backups.restore_backup(backups.backup_dir / latest['file'])
+    assert race_count(db_path) == 9000
+
+
+def test_prune_keeps_recent_unreferenced_chunks(backups, db_path):
+    backups.create_incremental_backup()
+    add_races(db_path, 2000)
+    backups.create_incremental_backup(full=True)
+    report = backups.prune_backups(keep_chains=1)
+    assert report['removed_backups'] and report['removed_chunks'] == 0
+
+
+def test_paged_backup_round_trips(backups, db_path):
+    steps = []
+    backup_path, metadata = backups.create_backup(progress=lambda copied, total: steps.append(copied))
+    assert metadata['format'] == 'pages'
+    assert metadata['tables']['races']['row_count'] == 5000
+    assert steps[-1] == metadata['pages']
+    assert not list(backups.backup_dir.glob('*.partial'))
+
+    add_races(db_path, 10)
+    report = backups.restore_backup(backup_path)
+    assert report['format'] == 'pages'
+    assert race_count(db_path) == 5000
+
+
+def test_paged_backup_finishes_under_concurrent_writes(tmp_path, db_path):
+    backups = DatabaseBackup(db_path, tmp_path / 'backups', pages_per_step=1, step_sleep=0,
+                             max_restarts=2)
+    writer = sqlite3.connect(db_path)
+
+    def write_between_steps(copied, total):
+        # A write from another connection restarts the paged copy
+        writer.execute("INSERT INTO races (pilot, time) VALUES ('busy', 1.0)")
+        writer.commit()
+
+    _, metadata = backups.create_backup(progress=write_between_steps)
+    writer.close()
+    assert metadata['finished_in_single_step']
+    assert metadata['restarts'] == 2
+
+
+def test_sql_dump_replays_with_deferred_indexes(backups, db_path):
+    conn = sqlite3.connect(db_path)
+    conn.execute("INSERT INTO races (pilot, time) VALUES ('multi\nline; pilot', 2.0)")
+    conn.commit()
+    conn.close()
+    backup_path, metadata = backups.create_backup(mode='sql')
+    assert metadata['format'] == 'sql'
+
+    add_races(db_path, 10)
+    report = backups.restore_backup(backup_path)
+    assert report['format'] == 'sql'
+    assert report['deferred_statements'] == 1
+    assert race_count(db_path) == 5001
+
+    conn = sqlite3.connect(db_path)
+    try:
+        assert conn.execute("SELECT COUNT(*) FROM races WHERE pilot = 'multi\nline; pilot'").fetchone()[0] == 1
+        assert conn.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+        assert 'idx_races_pilot' in {row[1] for row in conn.execute('PRAGMA index_list(races)')}
+    finally:
+        conn.close()
+
+
+def test_restore_keeps_the_current_database_when_verification_fails(backups, db_path):
+    backup_path, metadata = backups.create_backup(mode='sql')
+    # Pretend the backup was taken with more rows than it holds
+    metadata['tables']['races']['row_count'] += 1
+    backups._load_metadata = lambda path: metadata
+    add_races(db_path, 10)
+
+    with pytest.raises(RuntimeError, match='Row count mismatch'):
+        backups.restore_backup(backup_path)
+    assert race_count(db_path) == 5010
+    assert not list(db_path.parent.glob('temp_*.db'))
@@ -0,0 +1,83 @@
+import pytest
+from sqlalchemy import inspect
+from sqlalchemy.exc import IntegrityError
+from backend import db
+from backend.models.user import User
+from backend.utils.db_optimizations import bulk_operations
+from backend.utils.db_utils import batch_insert, bulk_load
+
+
+def pilots(n, start=0, **extra):
+    return ({'username': f'pilot{i}', 'email': f'pilot{i}@example.com', **extra}
+            for i in range(start, start + n))
+
+
+def index_names(table):
+    return {index['name'] for index in inspect(db.engine).get_indexes(table)}
+
+
+def test_streams_rows_in_adaptive_chunks(app):
+    result = bulk_load(User, pilots(2500), chunk_size=100)
+    assert result['rows'] == 2500 and result['chunks'] > 1
+    # Fast inserts grow the chunk, up to doubling each time
+    assert 100 <= result['final_chunk_size'] <= 100 * 2 ** (result['chunks'] - 1)
+    assert User.query.count() == 2500
+    # Column defaults still apply to keys the rows leave out
+    assert User.query.filter(User.rating != 1000).count() == 0
+
+
+def test_rows_with_different_keys(app):
+    rows = list(pilots(3)) + list(pilots(2, start=3, rating=1500)) + list(pilots(1, start=5))
+    batch_insert(User, rows)
+    ratings = dict(db.session.query(User.username, User.rating))
+    assert ratings == {'pilot0': 1000, 'pilot1': 1000, 'pilot2': 1000,
+                       'pilot3': 1500, 'pilot4': 1500, 'pilot5': 1000}
+
+
+def test_upsert_updates_only_supplied_columns(app):
+    bulk_load(User, pilots(3, rating=1200, wins=4))
+    ids = dict(db.session.query(User.username, User.id))
+    bulk_load(User, [{'id': ids['pilot0'], 'username': 'pilot0', 'email': 'pilot0@example.com',
+                      'rating': 1300},
+                     {'id': ids['pilot1'], 'username': 'pilot1', 'email': 'pilot1@example.com',
+                      'wins': 9}],
+              on_conflict='update')
+    stats = {u.username: (u.rating, u.wins) for u in User.query}
+    assert stats == {'pilot0': (1300, 4), 'pilot1': (1200, 9), 'pilot2': (1200, 4)}
+
+
+def test_ignore_skips_conflicts(app):
+    bulk_load(User, pilots(2))
+    result = bulk_load(User, pilots(3), on_conflict='ignore', conflict_columns=['username'])
+    assert result['rows'] == 3
+    assert User.query.count() == 3
+
+
+def test_deferred_indexes_are_rebuilt(app):
+    before = index_names('users')
+    result = bulk_load(User, pilots(500), defer_indexes=True)
+    assert result['deferred_indexes']
+    assert index_names('users') == before
+
+
+def test_failed_load_rolls_back_rows_and_indexes(app):
+    before = index_names('users')
+    rows = list(pilots(300)) + list(pilots(1))  # Duplicate username
+    with pytest.raises(IntegrityError):
+        bulk_load(User, rows, chunk_size=100, defer_indexes=True)
+    assert User.query.count() == 0
+    assert index_names('users') == before
+
+
+def test_bulk_operations_commits_on_the_session_connection(app):
+    with bulk_operations(db) as connection:
+        assert connection is db.session.connection()
+        connection.execute(User.__table__.insert(), list(pilots(10)))
+    db.session.close()
+    assert User.query.count() == 10
+
+    with pytest.raises(IntegrityError):
+        with bulk_operations(db) as connection:
+            connection.execute(User.__table__.insert(), list(pilots(1, start=20)))
+            connection.execute(User.__table__.insert(), list(pilots(1)))
+    assert User.query.count() == 10
@@ -0,0 +1,57 @@
+import json
+
+from sqlalchemy import text
+from backend import db
+from backend.game.catalog import Catalog
+from backend.models.ship import Ship
+
+
+def add_ships(*requirements):
+    for i, (rating, wins) in enumerate(requirements):
+        db.session.add(Ship(name=f'ship{i}', required_rating=rating, required_wins=wins))
+    db.session.commit()
+
+
+def names(body):
+    return [ship['name'] for ship in json.loads(body)]
+
+
+def test_unlocked_ships_treat_missing_requirements_as_zero(app):
+    # ship0 has a NULL rating requirement; PostgreSQL would sort it last
+    add_ships((None, 0), (1200, 0), (0, 0), (1000, 5))
+    catalog = Catalog()
+    _, body = catalog.unlocked_ships(rating=1100, wins=0)
+    assert names(body) == ['ship0', 'ship2']
+    _, body = catalog.unlocked_ships(rating=1300, wins=5)
+    assert names(body) == ['ship0', 'ship2', 'ship3', 'ship1']
+
+
+def test_etags_are_stable_until_the_catalog_changes(app):
+    from backend.game.catalog import catalog
+
+    add_ships((0, 0), (1200, 0))
+    catalog.load()
+    etag, body = catalog.unlocked_ships(1000, 0)
+    assert catalog.unlocked_ships(1050, 0) == (etag, body)
+    assert catalog.unlocked_ships(1300, 0)[0] != etag
+
+    ship = Ship.query.filter_by(name='ship0').one()
+    ship.description = 'Refitted'
+    # Committing through the ORM invalidates the shared catalog
+    db.session.commit()
+    assert catalog.unlocked_ships(1000, 0)[0] != etag
+
+
+def test_edits_from_elsewhere_show_up_after_the_ttl(app):
+    add_ships((0, 0))
+    catalog = Catalog(ttl=60)
+    etag, _ = catalog.unlocked_ships(1000, 0)
+
+    # Another worker (or manage.py) edits the table; no ORM event fires here
+    with db.engine.begin() as conn:
+        conn.execute(text("UPDATE ships SET name = 'renamed'"))
+    assert catalog.unlocked_ships(1000, 0)[0] == etag
+
+    catalog.loaded_at -= 61
+    etag_after, body = catalog.unlocked_ships(1000, 0)
+    assert etag_after != etag and names(body) == ['renamed']
@@ -0,0 +1,30 @@
+from backend import db
+from backend.models.game import Game
+from backend.models.game_session import GameSession
+from backend.models.race_history import RaceHistory
+from backend.utils.dataset_generator import DatasetGenerator
+
+
+def test_generated_games_survive_cleanup(app):
+    from backend.socket_events import cleanup_inactive_games
+
+    results = DatasetGenerator(users=200, races=5000, seed=3).generate()
+    db.session.commit()
+    statuses = dict(db.session.query(Game.status, db.func.count()).group_by(Game.status).all())
+    assert set(statuses) == {'completed', 'waiting'}
+    sessions = GameSession.query.count()
+
+    cleanup_inactive_games()
+    db.session.expire_all()
+    assert Game.query.filter_by(status='waiting').count() == statuses['waiting']
+    assert GameSession.query.count() == sessions
+    assert RaceHistory.query.count() == results['race_history']['rows']
+
+
+def test_same_seed_same_history(app):
+    generator = DatasetGenerator(users=50, races=400, seed=9)
+    generator.prepare()
+    first = list(generator.race_rows())
+    again = DatasetGenerator(users=50, races=400, seed=9)
+    again.prepare()
+    assert list(again.race_rows()) == first
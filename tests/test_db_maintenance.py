@@ -0,0 +1,91 @@
+import sqlite3
+
+import pytest
+from backend.utils.db_maintenance import DatabaseMaintenance
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = tmp_path / 'game.db'
+    conn = sqlite3.connect(path)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('CREATE TABLE races (id INTEGER PRIMARY KEY, pilot TEXT)')
+    conn.execute('CREATE INDEX idx_races_pilot ON races (pilot)')
+    conn.execute('CREATE TABLE tags (name TEXT PRIMARY KEY) WITHOUT ROWID')
+    conn.executemany('INSERT INTO races (pilot) VALUES (?)', [(f'p{i % 20}',) for i in range(1000)])
+    conn.commit()
+    conn.close()
+    return path
+
+
+@pytest.fixture
+def maintenance(db_path):
+    maintenance = DatabaseMaintenance()
+    maintenance.configure(db_path, budget_seconds=5.0)
+    statements = maintenance.statements = []
+    connect = maintenance.connect
+
+    def traced_connect():
+        conn = connect()
+        conn.set_trace_callback(statements.append)
+        return conn
+    maintenance.connect = traced_connect
+    return maintenance
+
+
+def add_races(db_path, n):
+    conn = sqlite3.connect(db_path)
+    conn.executemany('INSERT INTO races (pilot) VALUES (?)', [('late',)] * n)
+    conn.commit()
+    conn.close()
+
+
+def test_analyze_follows_estimated_drift_without_counting(maintenance, db_path):
+    report = maintenance.run(force=True)
+    assert report['steps']['analyze']['analyzed'] == ['races']
+
+    add_races(db_path, 100)
+    assert maintenance.run(force=True)['steps']['analyze']['analyzed'] == []
+    add_races(db_path, 200)
+    assert maintenance.run(force=True)['steps']['analyze']['analyzed'] == ['races']
+    assert not [sql for sql in maintenance.statements if 'COUNT(' in sql.upper()]
+
+
+def test_estimates_survive_a_restart_through_sqlite_stat1(maintenance, db_path):
+    maintenance.run(force=True)
+    restarted = DatabaseMaintenance()
+    restarted.configure(db_path)
+    assert restarted.run(force=True)['steps']['analyze']['analyzed'] == []
+
+
+def test_wal_is_truncated_only_after_a_full_passive_checkpoint(maintenance, db_path):
+    maintenance.wal_truncate_bytes = 0
+    # Closing the last connection would checkpoint and delete the WAL itself
+    keeper = sqlite3.connect(db_path)
+    add_races(db_path, 500)
+    reader = sqlite3.connect(db_path)
+    reader.execute('BEGIN')
+    reader.execute('SELECT COUNT(*) FROM races').fetchone()
+    add_races(db_path, 500)
+
+    # The open read transaction pins frames, so no truncate is attempted
+    report = maintenance.run(force=True)
+    assert report['steps']['checkpoint']['mode'] == 'PASSIVE'
+    assert 'truncate' not in report['steps']
+
+    reader.rollback()
+    reader.close()
+    keeper.execute("INSERT INTO races (pilot) VALUES ('kept')")
+    keeper.commit()
+    report = maintenance.run(force=True)
+    assert report['steps']['truncate']['mode'] == 'TRUNCATE'
+    assert not report['steps']['truncate']['busy']
+    assert maintenance.stats['wal_bytes'] == 0
+    keeper.close()
+
+
+def test_busy_server_only_gets_a_passive_checkpoint(maintenance):
+    maintenance.max_quiet_qps = 0
+    maintenance.note_activity(1000)
+    report = maintenance.run()
+    assert set(report['steps']) == {'checkpoint'}
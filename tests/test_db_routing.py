@@ -0,0 +1,116 @@
+import pytest
+from flask import Flask
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy.exc import OperationalError
+from backend.utils.db_backends import get_backend
+from backend.utils.db_routing import READ, WRITE, current_intent, db_intent, read_only, session_options
+
+
+@pytest.fixture
+def routed(tmp_path):
+    """An app with its own SQLAlchemy instance and a SQLite read pool"""
+    config = {'DB_PATH': str(tmp_path / 'game.db'), 'DB_READ_SPLIT': True}
+    backend = get_backend(config)
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = backend.uri
+    db = SQLAlchemy(session_options=session_options())
+
+    class Item(db.Model):
+        id = db.Column(db.Integer, primary_key=True)
+        name = db.Column(db.String(40))
+
+    db.init_app(app)
+    reader = backend.create_read_engine()
+    app.extensions['db_read_engine'] = reader
+    with app.app_context():
+        db.create_all()
+        yield db, Item, reader
+        db.session.remove()
+    reader.dispose()
+
+
+def test_intent_defaults_to_write_and_nests():
+    assert current_intent() == WRITE
+    with db_intent(READ):
+        assert current_intent() == READ
+        with db_intent(WRITE):
+            assert current_intent() == WRITE
+        assert current_intent() == READ
+    assert current_intent() == WRITE
+
+
+def test_read_only_resets_intent_after_an_exception():
+    @read_only
+    def failing():
+        assert current_intent() == READ
+        raise ValueError
+
+    with pytest.raises(ValueError):
+        failing()
+    assert current_intent() == WRITE
+
+
+def test_reads_go_to_the_read_pool(routed):
+    db, _, reader = routed
+
+    @read_only
+    def bind():
+        return db.session.get_bind()
+
+    assert bind() is reader
+    assert db.session.get_bind() is db.engine
+
+
+def test_read_only_queries_see_committed_rows(routed):
+    db, Item, _ = routed
+    db.session.add(Item(name='ship'))
+    db.session.commit()
+
+    @read_only
+    def names():
+        return [item.name for item in Item.query.all()]
+
+    assert names() == ['ship']
+
+
+def test_flushes_use_the_primary_even_with_read_intent(routed):
+    db, Item, reader = routed
+
+    @read_only
+    def write():
+        db.session.add(Item(name='written'))
+        db.session.commit()
+
+    write()
+    with reader.connect() as conn:
+        assert conn.exec_driver_sql('SELECT name FROM item').scalars().all() == ['written']
+
+
+def test_read_pool_is_read_only(routed):
+    _, _, reader = routed
+    with reader.connect() as conn:
+        with pytest.raises(OperationalError):
+            conn.exec_driver_sql("INSERT INTO item (name) VALUES ('nope')")
+
+
+def test_explicit_bind_wins(routed):
+    db, _, _ = routed
+    with db_intent(READ):
+        assert db.session.get_bind(bind=db.engine) is db.engine
+
+
+def test_no_read_engine_falls_back_to_the_primary(routed):
+    db, _, _ = routed
+    from flask import current_app
+    reader = current_app.extensions.pop('db_read_engine')
+    try:
+        with db_intent(READ):
+            assert db.session.get_bind() is db.engine
+    finally:
+        current_app.extensions['db_read_engine'] = reader
+
+
+def test_read_split_is_opt_in(tmp_path):
+    backend = get_backend({'DB_PATH': str(tmp_path / 'game.db')})
+    assert backend.read_split is False
+    assert backend.create_read_engine() is None
@@ -0,0 +1,76 @@
+import cProfile
+import random
+import time
+from types import SimpleNamespace
+import pstats
+from backend.utils.handler_profiler import HdrHistogram, ProfileCapture, collapsed_stacks
+
+
+def _leaf(n):
+    return sum(i * i for i in range(n))
+
+
+def _heavy():
+    return _leaf(200000)
+
+
+def _light():
+    return _leaf(50000)
+
+
+def _top():
+    _heavy()
+    _light()
+
+
+def test_histogram_percentiles_stay_within_bucket_error():
+    histogram = HdrHistogram()
+    values = list(range(1, 100001))
+    for value in values:
+        histogram.record(value)
+    for q in (50, 90, 99):
+        exact = values[int(len(values) * q / 100) - 1]
+        assert abs(histogram.percentile(q) - exact) / exact < 1 / 64
+    assert histogram.percentile(100) == 100000
+
+
+def test_collapsed_stacks_split_time_by_caller():
+    profile = cProfile.Profile()
+    profile.enable()
+    _top()
+    profile.disable()
+    lines = dict(line.rsplit(' ', 1) for line in collapsed_stacks(pstats.Stats(profile)))
+    heavy = sum(int(v) for k, v in lines.items() if '_heavy' in k and '_leaf' in k)
+    light = sum(int(v) for k, v in lines.items() if '_light' in k and '_leaf' in k)
+    assert 2.5 < heavy / light < 6  # 4x the work
+
+
+def test_collapsed_stacks_are_bounded_on_dense_call_graphs():
+    # 20 layers of 55 functions, each called from 3 functions in the layer
+    # above: far too many distinct paths to enumerate
+    rng = random.Random(1)
+    layers = [[('f.py', layer * 100 + i, f'fn{layer}_{i}') for i in range(55)] for layer in range(20)]
+    stats = {}
+    for depth, layer in enumerate(layers):
+        for func in layer:
+            callers = {}
+            if depth:
+                for caller in rng.sample(layers[depth - 1], 3):
+                    callers[caller] = (1, 1, 0.0001, 0.001 * (20 - depth))
+            stats[func] = (1, 1, 0.0001, 0.003 * (20 - depth), callers)
+    started = time.perf_counter()
+    lines = collapsed_stacks(SimpleNamespace(stats=stats))
+    assert time.perf_counter() - started < 10
+    assert lines
+
+
+def test_capture_files_never_leave_the_output_directory(tmp_path):
+    for target in ('../../escape', 'race.finished'):
+        capture = ProfileCapture(target, 'event', invocations=1)
+        capture.write(tmp_path)
+        for path in capture.files.values():
+            assert str(path).startswith(str(tmp_path))
+    names = sorted(p.name for p in tmp_path.iterdir())
+    assert len(names) == 4
+    # Dots in the target must not eat the stem (and the pid in it)
+    assert all(name.split('.', 1)[1] in ('pstats', 'collapsed') for name in names)
@@ -0,0 +1,120 @@
+import pytest
+from flask_login import LoginManager
+from backend import db
+from backend.game.lobby_directory import LobbyDirectory
+from backend.models.game import Game
+from backend.models.game_session import GameSession
+
+
+def open_lobby(course, user, ship, max_players=4):
+    game = Game(track_id=course.id, status='waiting', max_players=max_players)
+    game.sessions.append(GameSession(user_id=user.id, ship_id=ship.id))
+    db.session.add(game)
+    db.session.commit()
+    return game
+
+
+@pytest.fixture
+def directory(players):
+    directory = LobbyDirectory()
+    directory.load()
+    return directory
+
+
+def test_touched_games_become_diffs(directory, players):
+    (alice, bob), (ship, _), course = players
+    game = open_lobby(course, alice, ship)
+    directory.touch(game.id)
+    assert directory.apply_pending() == [('created', game.id, directory.lobbies[game.id])]
+
+    game.sessions.append(GameSession(user_id=bob.id, ship_id=ship.id))
+    db.session.commit()
+    directory.touch(game.id)
+    changes = directory.apply_pending()
+    assert [(kind, lobby['player_count']) for kind, _, lobby in changes] == [('updated', 2)]
+
+    # A touch without a visible change is not a diff
+    directory.touch(game.id)
+    assert directory.apply_pending() == []
+
+    game.status = 'in_progress'
+    db.session.commit()
+    directory.touch(game.id)
+    assert directory.apply_pending() == [('started', game.id, None)]
+    assert game.id not in directory.lobbies
+
+
+def test_drained_diffs_coalesce_and_carry_versions(directory, players):
+    (alice, bob), (ship, _), course = players
+    kept = open_lobby(course, alice, ship)
+    gone = open_lobby(course, bob, ship)
+    start = directory.version
+    directory.touch(kept.id, gone.id)
+    directory.apply_pending()
+
+    kept.max_players = 6
+    db.session.delete(gone)
+    db.session.commit()
+    directory.touch(kept.id, gone.id)
+
+    diff = directory.drain_changes()
+    assert (diff['from_version'], diff['version']) == (start, directory.version)
+    # Created then updated is still news of a creation; created then
+    # removed was never announced
+    assert [(c['op'], c['id'], c['lobby']['max_players']) for c in diff['changes']] == [
+        ('created', kept.id, 6)
+    ]
+    assert directory.drain_changes() is None
+
+
+def test_serialized_listing_is_cached_per_version(directory, players):
+    (alice, _), (ship, _), course = players
+    version, body = directory.serialized()
+    assert body == b'[]'
+    assert directory.serialized() == (version, body)
+
+    game = open_lobby(course, alice, ship)
+    directory.touch(game.id)
+    new_version, new_body = directory.serialized()
+    assert new_version > version and str(game.id).encode() in new_body
+
+
+def test_query_filters_and_pages(directory, players):
+    (alice, bob), (ship, _), course = players
+    full = open_lobby(course, alice, ship, max_players=1)
+    roomy = open_lobby(course, bob, ship, max_players=8)
+    directory.touch(full.id, roomy.id)
+
+    _, total, lobbies = directory.query(min_free_slots=1)
+    assert total == 1 and lobbies[0]['id'] == roomy.id
+    _, total, lobbies = directory.query(page=2, per_page=1)
+    assert total == 2 and [l['id'] for l in lobbies] == [roomy.id]
+
+
+def test_lobby_listing_honours_etags(app, players):
+    from backend.game.lobby_directory import lobby_directory
+    from backend.routes.api import bp
+
+    app.register_blueprint(bp)
+    app.config['LOGIN_DISABLED'] = True
+    LoginManager(app)
+    lobby_directory.load()
+    client = app.test_client()
+
+    first = client.get('/api/lobbies')
+    assert first.status_code == 200 and first.get_json() == []
+    etag = first.headers['ETag']
+    assert client.get('/api/lobbies', headers={'If-None-Match': etag}).status_code == 304
+
+    (alice, _), (ship, _), course = players
+    game = open_lobby(course, alice, ship)
+    lobby_directory.touch(game.id)
+    changed = client.get('/api/lobbies', headers={'If-None-Match': etag})
+    assert changed.status_code == 200
+    assert changed.headers['ETag'] != etag
+    assert [lobby['id'] for lobby in changed.get_json()] == [game.id]
+
+    filtered = client.get('/api/lobbies?min_free_slots=1')
+    assert filtered.headers['X-Total-Count'] == '1'
+    assert client.get('/api/lobbies?min_free_slots=1',
+                      headers={'If-None-Match': filtered.headers['ETag']}).status_code == 304
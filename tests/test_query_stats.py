@@ -0,0 +1,43 @@
+import pytest
+from flask import Flask
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+from backend.utils.query_stats import RollingHistogram, instrument_engine, request_query_stats
+
+
+@pytest.fixture
+def engine():
+    engine = create_engine('sqlite://')
+    instrument_engine(engine)
+    yield engine
+    engine.dispose()
+
+
+def test_statements_are_counted_per_context(engine):
+    app = Flask(__name__)
+    with app.app_context(), engine.connect() as conn:
+        conn.execute(text('SELECT 1'))
+        conn.execute(text('SELECT 2'))
+        count, db_ms = request_query_stats()
+    assert count == 2
+    assert db_ms >= 0
+
+
+def test_failed_statements_do_not_leave_start_times(engine):
+    with engine.connect() as conn:
+        for _ in range(3):
+            with pytest.raises(OperationalError):
+                conn.execute(text('SELECT * FROM missing_table'))
+            conn.rollback()
+        conn.execute(text('SELECT 1'))
+        assert conn.info.get('query_start') == []
+
+
+def test_rolling_histogram_forgets_old_slots():
+    histogram = RollingHistogram((1, 10, 100), window=60, slots=6)
+    histogram.observe(5, now=0)
+    histogram.observe(50, now=30)
+    assert histogram.snapshot(now=30)['count'] == 2
+    assert histogram.snapshot(now=65)['count'] == 1
+    assert histogram.snapshot(now=65)['p50'] == 100
+    assert histogram.total_count == 2
@@ -0,0 +1,97 @@
+import random
+
+import pytest
+from backend.game.rank_index import FenwickTree, RatingRankIndex
+
+
+def sql_rank(ratings, user_id):
+    """The COUNT(*) rule the index replaces"""
+    return sum(1 for r in ratings.values() if r > ratings[user_id]) + 1
+
+
+def listing(ratings):
+    """Every player as (rank, user_id, rating), best first"""
+    order = sorted(ratings, key=lambda u: (-ratings[u], u))
+    return [(sql_rank(ratings, u), u, ratings[u]) for u in order]
+
+
+@pytest.fixture
+def ratings():
+    rng = random.Random(7)
+    return {user_id: rng.randint(900, 1100) for user_id in range(1, 301)}
+
+
+@pytest.fixture
+def index(ratings):
+    index = RatingRankIndex(min_rating=0, max_rating=2000)
+    index.load(ratings.items())
+    return index
+
+
+def test_fenwick_prefix_sums_and_kth():
+    counts = [3, 0, 2, 5, 0, 1]
+    tree = FenwickTree.from_counts(counts)
+    for i in range(len(counts)):
+        assert tree.prefix_sum(i) == sum(counts[:i + 1])
+    assert [tree.find_kth(k) for k in range(1, 12)] == [0, 0, 0, 2, 2, 3, 3, 3, 3, 3, 5]
+    tree.add(1, 4)
+    assert tree.prefix_sum(1) == 7
+    assert tree.find_kth(4) == 1
+
+
+def test_ranks_match_the_count_rule(index, ratings):
+    for user_id in ratings:
+        assert index.rank_of(user_id) == sql_rank(ratings, user_id)
+    assert index.rank_of(9999) is None
+
+
+def test_top_and_around_follow_the_full_listing(index, ratings):
+    full = listing(ratings)
+    assert index.top(25) == full[:25]
+    assert index.around_rank(40, radius=5) == full[34:45]
+    position = full.index((sql_rank(ratings, 17), 17, ratings[17]))
+    assert index.around_user(17, radius=3) == full[max(0, position - 3):position + 4]
+    assert index.top(1000) == full
+
+
+def test_updates_move_players(index, ratings):
+    rng = random.Random(11)
+    for _ in range(200):
+        user_id = rng.choice(list(ratings))
+        ratings[user_id] = rng.randint(800, 1200)
+        index.update(user_id, ratings[user_id])
+    index.update(1000, 1500)
+    ratings[1000] = 1500
+    assert index.remove(5) and not index.remove(5)
+    del ratings[5]
+
+    assert index.top(len(ratings)) == listing(ratings)
+    assert index.rank_of(1000) == 1
+
+
+def test_ratings_outside_the_range_are_clamped():
+    index = RatingRankIndex(min_rating=0, max_rating=2000)
+    index.load([(1, 5000), (2, 2000), (3, -20), (4, None)])
+    assert index.rank_of(1) == index.rank_of(2) == 1
+    # Missing ratings count as the 1000 default
+    assert (index.rank_of(4), index.rank_of(3)) == (3, 4)
+    assert [user_id for _, user_id, _ in index.top(4)] == [1, 2, 4, 3]
+
+
+def test_updates_before_load_are_ignored():
+    index = RatingRankIndex()
+    index.update(1, 1200)
+    assert not index.loaded and len(index) == 0
+    index.load([(2, 1000)])
+    index.update(1, 1200)
+    assert index.rank_of(1) == 1 and index.rank_of(2) == 2
+
+
+def test_leaderboard_uses_sql_until_the_index_loads(players):
+    from backend.game.rank_index import rank_index
+    from backend.routes.game import _top_entries
+
+    (alice, bob), _, _ = players
+    bob.rating = 1200
+    assert not rank_index.loaded
+    assert _top_entries(10) == [(1, bob.id, 1200), (2, alice.id, 1000)]
@@ -0,0 +1,87 @@
+import json
+import random
+
+import pytest
+from backend.benchmarks import regression
+
+
+def timing(samples):
+    return {'kind': 'timing', 'unit': 'ms', 'samples': samples}
+
+
+def count(samples):
+    return {'kind': 'count', 'unit': 'queries', 'samples': samples}
+
+
+def noisy(median, n=8, seed=0):
+    rng = random.Random(seed)
+    return [median * rng.uniform(0.97, 1.03) for _ in range(n)]
+
+
+def test_clear_slowdown_regresses():
+    result = regression.compare_metric(timing(noisy(10.0)), timing(noisy(13.0, seed=1)), 0.10, 0.05)
+    assert result['status'] == 'REGRESSED'
+    assert result['p_value'] < 0.05
+    assert result['ci'][0] > 1.0
+
+
+def test_noise_within_the_threshold_is_ok():
+    result = regression.compare_metric(timing(noisy(10.0)), timing(noisy(10.2, seed=1)), 0.10, 0.05)
+    assert result['status'] == 'ok'
+
+
+def test_slowdown_needs_significance():
+    # A large median change from two wildly noisy runs is not enough
+    result = regression.compare_metric(timing([10.0, 30.0]), timing([12.0, 35.0]), 0.10, 0.05)
+    assert result['status'] == 'ok'
+
+
+def test_speedup_is_reported_as_improved():
+    result = regression.compare_metric(timing(noisy(10.0)), timing(noisy(7.0, seed=1)), 0.10, 0.05)
+    assert result['status'] == 'improved'
+
+
+def test_counts_regress_on_any_increase():
+    assert regression.compare_metric(count([3, 3]), count([4, 4]), 0.10, 0.05)['status'] == 'REGRESSED'
+    assert regression.compare_metric(count([3, 3]), count([3, 3]), 0.10, 0.05)['status'] == 'ok'
+    assert regression.compare_metric(count([3, 3]), count([2, 2]), 0.10, 0.05)['status'] == 'improved'
+
+
+def test_compare_flags_new_and_missing_metrics():
+    rows = regression.compare({'a': count([1]), 'b': count([1])}, {'b': count([1]), 'c': count([1])},
+                              0.10, 0.05)
+    statuses = {name: result and result['status'] for name, _, result in rows}
+    assert statuses == {'a': 'MISSING', 'b': 'ok', 'c': None}
+
+
+def test_suites_without_baseline():
+    options = {'http_scales': '1000'}
+    metrics = {'http.1000.menu.p50': timing([1.0]), 'physics.100.numpy.tick': timing([1.0])}
+    assert regression.suites_without_baseline(metrics, ['http', 'physics', 'socket'], options) == ['socket']
+    # A baseline recorded at another scale does not cover this run
+    assert regression.suites_without_baseline(metrics, ['http'], {'http_scales': '10000'}) == ['http']
+
+
+def test_check_fails_without_baseline_metrics(tmp_path, monkeypatch):
+    baseline = tmp_path / 'baselines.json'
+    baseline.write_text(json.dumps({'version': 1, 'environment': None, 'repeats': 5, 'metrics': {}}))
+
+    def fail_collect(*args):
+        pytest.fail('suites should not run without a baseline')
+    monkeypatch.setattr(regression, 'collect', fail_collect)
+    assert regression.main(['--suites', 'physics', '--baseline', str(baseline)]) == 1
+
+
+def test_check_writes_the_comparison_report(tmp_path, monkeypatch):
+    baseline = tmp_path / 'baselines.json'
+    report = tmp_path / 'report.json'
+    samples = noisy(10.0)
+    baseline.write_text(json.dumps({'version': 1, 'environment': None, 'repeats': 8,
+                                    'metrics': {'physics.100.numpy.tick': timing(samples)}}))
+    current = {'physics.100.numpy.tick': timing(noisy(10.0, seed=3))}
+    monkeypatch.setattr(regression, 'collect', lambda suites, repeats, options: (current, []))
+
+    code = regression.main(['--suites', 'physics', '--baseline', str(baseline), '--report', str(report)])
+    assert code == 0
+    written = json.loads(report.read_text())
+    assert [row['status'] for row in written['comparison']] == ['ok']
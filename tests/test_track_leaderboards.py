@@ -0,0 +1,131 @@
+from backend import db
+from backend.game.track_leaderboards import ALL_TRACKS, TrackLeaderboards
+from backend.models.course_record import CourseRecord
+from backend.models.game import Game
+from backend.models.game_session import GameSession
+from backend.models.leaderboard import Leaderboard
+from backend.routes.api import _place_finisher
+
+
+def race(course, user, ship, finish_time, position=1):
+    game = Game(track_id=course.id, status='in_progress')
+    session = GameSession(user_id=user.id, ship_id=ship.id,
+                          finish_time=finish_time, position=position)
+    game.sessions.append(session)
+    db.session.add(game)
+    db.session.flush()
+    return game, session
+
+
+def test_results_fold_into_the_players_entry(players):
+    (alice, _), (ship, _), course = players
+    boards = TrackLeaderboards()
+    for finish_time, position in ((70.0, 2), (65.0, 1), (68.0, 1)):
+        game, session = race(course, alice, ship, finish_time, position)
+        boards.record_result(game, session)
+        db.session.commit()
+
+    entry = Leaderboard.query.filter_by(user_id=alice.id, track_id=course.id).one()
+    assert (entry.best_time, entry.total_races, entry.wins) == (65.0, 3, 2)
+
+
+def test_course_record_is_kept_per_ship(players):
+    (alice, _), (fast, slow), course = players
+    boards = TrackLeaderboards()
+    game, session = race(course, alice, fast, 60.0)
+    boards.record_result(game, session)
+    # Slower than Alice's personal best, but the first time flown in this ship
+    game, session = race(course, alice, slow, 75.0)
+    boards.record_result(game, session)
+    db.session.commit()
+
+    records = {r.ship_id: r.best_time for r in CourseRecord.query.all()}
+    assert records == {fast.id: 60.0, slow.id: 75.0}
+
+
+def test_top_is_cached_until_a_result_commits(players):
+    (alice, bob), (ship, _), course = players
+    boards = TrackLeaderboards()
+    game, session = race(course, alice, ship, 70.0)
+    boards.record_result(game, session)
+    db.session.commit()
+
+    first = boards.top(course.id)
+    assert [e['finish_time'] for e in first] == [70.0]
+    assert boards.top(course.id) == first
+
+    game, session = race(course, bob, ship, 65.0)
+    boards.record_result(game, session)
+    # Nothing is invalidated until the result commits
+    assert boards.top(course.id) == first
+    db.session.commit()
+    assert [e['username'] for e in boards.top(course.id)] == ['pilot1', 'pilot0']
+    assert [e['finish_time'] for e in boards.top(ALL_TRACKS)] == [65.0, 70.0]
+
+
+def test_rolled_back_results_do_not_invalidate(players):
+    (alice, _), (ship, _), course = players
+    boards = TrackLeaderboards()
+    boards.top(course.id)
+    boards.top(ALL_TRACKS)
+    version = boards.version(course.id)
+
+    game, session = race(course, alice, ship, 70.0)
+    boards.record_result(game, session)
+    db.session.rollback()
+    assert boards.version(course.id) == version
+
+
+def test_listed_player_races_refresh_their_stats(players):
+    (alice, _), (ship, _), course = players
+    boards = TrackLeaderboards()
+    game, session = race(course, alice, ship, 60.0)
+    boards.record_result(game, session)
+    db.session.commit()
+    assert boards.top(course.id)[0]['total_races'] == 1
+
+    game, session = race(course, alice, ship, 90.0, position=3)
+    boards.record_result(game, session)
+    db.session.commit()
+    assert boards.top(course.id)[0]['total_races'] == 2
+
+
+def test_list_loaded_before_commit_is_not_published(players):
+    (alice, _), (ship, _), course = players
+    boards = TrackLeaderboards(top_k=1)
+    game, session = race(course, alice, ship, 70.0)
+    boards.record_result(game, session)
+    db.session.commit()
+    boards.top(course.id)
+    boards.top(ALL_TRACKS)
+
+    # A reader starts loading, then a faster result commits before it publishes
+    load = boards._load
+    def racing_load(track_id):
+        entries = load(track_id)
+        game, session = race(course, alice, ship, 50.0)
+        boards.record_result(game, session)
+        db.session.commit()
+        return entries
+    boards.invalidate(course.id)
+    boards._load = racing_load
+    assert boards.top(course.id)[0]['finish_time'] == 70.0
+    boards._load = load
+    assert boards.top(course.id)[0]['finish_time'] == 50.0
+
+
+def test_placement_comes_from_finish_times(players):
+    (alice, bob), (ship, _), course = players
+    game = Game(track_id=course.id, status='in_progress')
+    slow = GameSession(user_id=alice.id, ship_id=ship.id, finish_time=80.0)
+    fast = GameSession(user_id=bob.id, ship_id=ship.id)
+    game.sessions.extend([slow, fast])
+    db.session.add(game)
+    db.session.flush()
+
+    _place_finisher(game, slow)
+    assert slow.position == 1
+    # A faster result that arrives later takes first place
+    fast.finish_time = 75.0
+    _place_finisher(game, fast)
+    assert (fast.position, slow.position) == (1, 2)